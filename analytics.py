@@ -0,0 +1,74 @@
+# astrbot_plugin_GroupFS/analytics.py
+
+import heapq
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+
+
+@dataclass
+class UsageBucket:
+    """某个文件夹或上传者名下的文件总大小与数量。"""
+    name: str
+    total_size: int = 0
+    count: int = 0
+
+
+@dataclass
+class StorageStats:
+    total_size: int = 0
+    total_count: int = 0
+    folders: List[UsageBucket] = field(default_factory=list)
+    uploaders: List[UsageBucket] = field(default_factory=list)
+    largest_files: List[Dict] = field(default_factory=list)
+    oldest_files: List[Dict] = field(default_factory=list)
+
+
+def _push_bounded(heap: List[Tuple], item: Tuple, limit: int):
+    """维护一个容量为 limit 的小顶堆，只保留键值最大的 limit 项。"""
+    if len(heap) < limit:
+        heapq.heappush(heap, item)
+    elif item[0] > heap[0][0]:
+        heapq.heapreplace(heap, item)
+
+
+def compute_storage_stats(files: Iterable[Dict], top_n: int = 10) -> StorageStats:
+    """
+    单次遍历文件列表，统计各文件夹/上传者的占用，并用有界堆选出
+    最大的 top_n 个文件与最旧的 top_n 个文件，无需对全量列表排序。
+    """
+    stats = StorageStats()
+    folders: Dict[str, UsageBucket] = {}
+    uploaders: Dict[str, UsageBucket] = {}
+    largest_heap: List[Tuple] = []
+    oldest_heap: List[Tuple] = []
+
+    for seq, file_info in enumerate(files):
+        size = file_info.get('size') or 0
+        stats.total_size += size
+        stats.total_count += 1
+
+        folder_name = file_info.get('parent_folder_name') or '根目录'
+        bucket = folders.get(folder_name)
+        if bucket is None:
+            bucket = folders[folder_name] = UsageBucket(folder_name)
+        bucket.total_size += size
+        bucket.count += 1
+
+        uploader_name = file_info.get('uploader_name') or str(file_info.get('uploader') or '未知')
+        bucket = uploaders.get(uploader_name)
+        if bucket is None:
+            bucket = uploaders[uploader_name] = UsageBucket(uploader_name)
+        bucket.total_size += size
+        bucket.count += 1
+
+        # seq 作为次要键，避免比较到 dict
+        _push_bounded(largest_heap, (size, -seq, file_info), top_n)
+        modify_time = file_info.get('modify_time') or 0
+        if modify_time:
+            _push_bounded(oldest_heap, (-modify_time, -seq, file_info), top_n)
+
+    stats.folders = heapq.nlargest(top_n, folders.values(), key=lambda b: b.total_size)
+    stats.uploaders = heapq.nlargest(top_n, uploaders.values(), key=lambda b: b.total_size)
+    stats.largest_files = [item[2] for item in heapq.nlargest(top_n, largest_heap, key=lambda x: (x[0], x[1]))]
+    stats.oldest_files = [item[2] for item in heapq.nlargest(top_n, oldest_heap, key=lambda x: (x[0], x[1]))]
+    return stats
@@ -0,0 +1,97 @@
+# astrbot_plugin_GroupFS/bench_startup.py
+"""
+插件冷启动基准：在全新的解释器中导入插件并执行构造与 initialize()，报告各阶段耗时，
+以及导入阶段是否加载了应当延迟导入的重量级依赖。需要在装有 AstrBot 的环境中运行：
+
+    python bench_startup.py [--runs N] [--config config.json]
+
+AstrBot 本身会导入 aiohttp 等模块，因此先导入插件依赖的 AstrBot 接口作为基线，
+导入耗时与「已加载的重量级依赖」都只统计插件在基线之上新增的部分。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ("chardet", "aiohttp", "croniter", "apscheduler")
+# 插件 main.py 从宿主导入的模块，在计时前预先导入，作为基线
+BASELINE_MODULES = (
+    "astrbot.api",
+    "astrbot.api.event",
+    "astrbot.api.star",
+    "astrbot.api.message_components",
+    "astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event",
+    "astrbot.core.utils.astrbot_path",
+    "aiocqhttp.exceptions",
+)
+
+_CHILD = r"""
+import asyncio, importlib, json, sys, time
+sys.path.insert(0, {parent!r})
+for name in {baseline!r}:
+    importlib.import_module(name)
+baseline = set(sys.modules)
+started = time.perf_counter()
+module = importlib.import_module({package!r} + ".main")
+imported = time.perf_counter()
+added = set(sys.modules) - baseline
+eager = [m for m in {heavy!r} if any(n == m or n.startswith(m + ".") for n in added)]
+host_loaded = [m for m in {heavy!r} if m in baseline]
+plugin = module.GroupFSPlugin(None, json.loads({config!r}))
+constructed = time.perf_counter()
+asyncio.run(plugin.initialize())
+initialized = time.perf_counter()
+if plugin.scheduler:
+    plugin.scheduler.shutdown(wait=False)
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "construct_ms": (constructed - imported) * 1000,
+    "initialize_ms": (initialized - constructed) * 1000,
+    "eager_modules": eager,
+    "host_modules": host_loaded,
+}}))
+"""
+
+
+def run_once(config: str) -> dict:
+    plugin_dir = os.path.dirname(os.path.abspath(__file__))
+    code = _CHILD.format(
+        parent=os.path.dirname(plugin_dir),
+        package=os.path.basename(plugin_dir),
+        heavy=HEAVY_MODULES,
+        baseline=BASELINE_MODULES,
+        config=config,
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GroupFS 插件冷启动基准")
+    parser.add_argument("--runs", type=int, default=5, help="重复次数，每次都在新进程中运行")
+    parser.add_argument("--config", help="插件配置 JSON 文件，默认使用空配置")
+    args = parser.parse_args()
+
+    config = "{}"
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.dumps(json.load(f))
+
+    samples = [run_once(config) for _ in range(args.runs)]
+    for key in ("import_ms", "construct_ms", "initialize_ms"):
+        values = [s[key] for s in samples]
+        print(f"{key:>14}: 中位数 {statistics.median(values):8.1f}ms  最小 {min(values):8.1f}ms  最大 {max(values):8.1f}ms")
+    eager = sorted({m for s in samples for m in s["eager_modules"]})
+    print(f"插件导入阶段新加载的重量级依赖: {', '.join(eager) if eager else '无'}")
+    host = sorted({m for s in samples for m in s["host_modules"]})
+    if host:
+        print(f"已由 AstrBot 预先加载 (不计入): {', '.join(host)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# astrbot_plugin_GroupFS/botpool.py
+
+import asyncio
+import itertools
+import re
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from astrbot.api import logger
+from aiocqhttp.exceptions import ActionFailed, ApiNotAvailable, NetworkError
+
+# 文件本身已失效，换哪个账号都一样，不做故障转移
+_FILE_LEVEL_RETCODES = {1200}
+# 会修改群文件或发出消息的操作：失败时无法确定是否已经生效，换账号重做可能重复执行
+NON_IDEMPOTENT_ACTIONS = frozenset({
+    'delete_group_file', 'delete_group_folder', 'move_group_file', 'rename_group_file',
+    'create_group_file_folder', 'rename_group_file_folder', 'upload_group_file', 'upload_private_file',
+    'send_group_msg', 'send_private_msg', 'send_group_forward_msg', 'send_private_forward_msg',
+})
+# 错误提示中的限流与超时字样。英文按整词匹配，避免 "operate"、"generate" 之类误判为 rate
+_RATE_LIMIT_PATTERN = re.compile(r'频繁|\b(?:rate[ _-]?limit(?:ed)?|rate|too many|busy)\b', re.IGNORECASE)
+_TIMEOUT_PATTERN = re.compile(r'超时|\b(?:timeout|timed out)\b', re.IGNORECASE)
+
+
+def _error_text(error: BaseException) -> str:
+    result = getattr(error, 'result', None) or {}
+    return f"{result.get('wording', '')} {result.get('message', '')} {result.get('msg', '')}"
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """ActionFailed 的提示表明账号被限流或后端繁忙。"""
+    return isinstance(error, ActionFailed) and bool(_RATE_LIMIT_PATTERN.search(_error_text(error)))
+
+
+def is_backend_timeout(error: BaseException) -> bool:
+    """ActionFailed 的提示表明后端处理超时。"""
+    return isinstance(error, ActionFailed) and bool(_TIMEOUT_PATTERN.search(_error_text(error)))
+
+
+async def _call_as(client: Any, self_id: str, action: str, **params) -> Any:
+    """
+    以指定账号调用。多个账号经同一个 aiocqhttp 适配器连接时共用一个 client，
+    必须带上 self_id 才会路由到该账号的连接；fallback 客户端不指定账号。
+    """
+    if self_id != "fallback":
+        params['self_id'] = int(self_id)
+    return await client.api.call_action(action, **params)
+
+
+class BotPool:
+    """
+    多账号客户端池。
+    记录每个已连接的 OneBot 账号及其所在的群；对某个群的重负载调用
+    （文件夹遍历、链接探测、下载等）在该群的可用账号间轮转分摊，
+    某个账号离线或被限流时暂时冷却，只读调用自动转移到下一个账号；
+    业务错误与非幂等操作（删除、移动、上传、发消息等）不做故障转移。
+    """
+
+    def __init__(self, cooldown_seconds: float = 60):
+        self.cooldown_seconds = cooldown_seconds
+        self._clients: Dict[str, Any] = {}
+        self._groups: Dict[int, Set[str]] = {}
+        self._cooldown_until: Dict[str, float] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._rotation = itertools.count()
+        self._refresh_tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def register(self, self_id: str, client: Any, group_id: Optional[int] = None):
+        """登记一个账号；首次见到某个账号时在后台拉取它所在的群列表。"""
+        self_id = str(self_id)
+        is_new = self_id not in self._clients
+        self._clients[self_id] = client
+        if group_id:
+            self._groups.setdefault(int(group_id), set()).add(self_id)
+        if is_new:
+            logger.info(f"[多账号] 登记账号 {self_id}，当前共 {len(self._clients)} 个账号。")
+            task = asyncio.create_task(self._refresh_groups(self_id, client))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _refresh_groups(self, self_id: str, client: Any):
+        try:
+            groups = await _call_as(client, self_id, 'get_group_list')
+            for group in groups or []:
+                if group_id := group.get('group_id'):
+                    self._groups.setdefault(int(group_id), set()).add(self_id)
+            logger.info(f"[多账号] 账号 {self_id} 所在群数: {len(groups or [])}")
+        except Exception as e:
+            logger.warning(f"[多账号] 获取账号 {self_id} 的群列表失败: {e}")
+
+    def mark_unavailable(self, self_id: str, seconds: Optional[float] = None):
+        self._cooldown_until[self_id] = time.monotonic() + (seconds or self.cooldown_seconds)
+        logger.warning(f"[多账号] 账号 {self_id} 暂时不可用，冷却 {seconds or self.cooldown_seconds:.0f} 秒。")
+
+    def candidates(self, group_id: Optional[int], fallback: Any = None) -> List[Tuple[str, Any]]:
+        """
+        返回该群可用账号的尝试顺序：未冷却的在前，按在途调用数从少到多，
+        同等负载下轮转起点以分摊压力。群内没有已知账号时退回 fallback 或任意账号。
+        """
+        member_ids = list(self._groups.get(int(group_id), ())) if group_id else []
+        member_ids = [i for i in member_ids if i in self._clients]
+        if not member_ids:
+            if fallback is not None:
+                return [("fallback", fallback)]
+            member_ids = list(self._clients)
+        if not member_ids:
+            return []
+        offset = next(self._rotation) % len(member_ids)
+        rotated = member_ids[offset:] + member_ids[:offset]
+        now = time.monotonic()
+        rotated.sort(key=lambda i: (self._cooldown_until.get(i, 0) > now, self._in_flight.get(i, 0)))
+        return [(i, self._clients[i]) for i in rotated]
+
+    async def call(self, group_id: Optional[int], action: str, fallback: Any = None, **params) -> Any:
+        """在群内可用账号间分摊并故障转移地执行一次 API 调用。"""
+        last_error: Optional[BaseException] = None
+        candidates = self.candidates(group_id, fallback)
+        if not candidates:
+            raise ApiNotAvailable()
+        if group_id is not None:
+            params['group_id'] = group_id
+        # 非幂等操作失败后不换账号重做；业务错误（权限、参数等）换账号也一样，同样直接抛出
+        can_fail_over = action not in NON_IDEMPOTENT_ACTIONS and len(candidates) > 1
+        for self_id, client in candidates:
+            self._in_flight[self_id] = self._in_flight.get(self_id, 0) + 1
+            try:
+                return await _call_as(client, self_id, action, **params)
+            except ActionFailed as e:
+                if e.result.get('retcode') in _FILE_LEVEL_RETCODES or not is_rate_limited(e):
+                    raise
+                if self_id != "fallback":
+                    # 被限流的账号冷却后再参与轮转，否则下一次调用会立即再次选中它
+                    self.mark_unavailable(self_id)
+                if not can_fail_over:
+                    raise
+                logger.warning(f"[多账号] 账号 {self_id} 调用 {action} 被限流 (retcode {e.result.get('retcode')})，尝试下一个账号。")
+                last_error = e
+            except (NetworkError, ApiNotAvailable, asyncio.TimeoutError) as e:
+                if self_id != "fallback":
+                    self.mark_unavailable(self_id)
+                if not can_fail_over:
+                    raise
+                last_error = e
+            finally:
+                self._in_flight[self_id] -= 1
+        raise last_error
@@ -0,0 +1,120 @@
+# astrbot_plugin_GroupFS/bulkops.py
+
+import re
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from .records import FileRecord
+
+# QQ 群文件名中不允许出现的字符
+_ILLEGAL_NAME_CHARS = set('\\/:*?"<>|')
+MAX_NAME_LENGTH = 255
+
+
+class BulkOp(NamedTuple):
+    """计划中的一项操作：把文件改名为 new_name，或移动到 target_folder。"""
+    file: FileRecord
+    new_name: str = ""
+    target_folder: str = ""
+
+
+class BulkPlan(NamedTuple):
+    kind: str                           # "rename" 或 "move"
+    pattern: str
+    argument: str                       # 替换模板或目标文件夹名
+    ops: List[BulkOp]
+    skipped: List[Tuple[FileRecord, str]]   # (文件, 跳过原因)
+    target_folder_id: Optional[str]     # 移动的目标文件夹 ID；为 None 表示需要先创建
+    created_at: float
+
+
+def compile_pattern(pattern: str) -> re.Pattern:
+    """编译用户给出的正则；格式错误时抛出 re.error，由调用方提示。"""
+    return re.compile(pattern)
+
+
+def _name_problem(name: str) -> Optional[str]:
+    if not name.strip():
+        return "新文件名为空"
+    if len(name) > MAX_NAME_LENGTH:
+        return "新文件名过长"
+    if any(ch in _ILLEGAL_NAME_CHARS for ch in name):
+        return "新文件名包含非法字符"
+    return None
+
+
+def plan_renames(files: Iterable[FileRecord], pattern: re.Pattern, replacement: str) -> BulkPlan:
+    """
+    对文件名做 re.sub 得到新名字。以下情况跳过而不执行：
+    - 新名字为空、过长或含非法字符；
+    - 同一文件夹中已有同名文件（且该文件不会在本次被改走）；
+    - 本次有多个文件会被改成同一文件夹中的同一个名字。
+    替换模板中的 \\1、\\g<name> 等引用非法时抛出 re.error。
+    """
+    files = list(files)
+    candidates: List[BulkOp] = []
+    skipped: List[Tuple[FileRecord, str]] = []
+    for record in files:
+        if not pattern.search(record.file_name):
+            continue
+        new_name = pattern.sub(replacement, record.file_name)
+        if new_name == record.file_name:
+            continue
+        problem = _name_problem(new_name)
+        if problem:
+            skipped.append((record, problem))
+        else:
+            candidates.append(BulkOp(record, new_name=new_name))
+
+    renamed_ids = {op.file.file_id for op in candidates}
+    # 不参与改名的文件保持原名，占据其所在文件夹中的名字
+    occupied: Set[Tuple[str, str]] = {
+        (record.folder, record.file_name) for record in files if record.file_id not in renamed_ids
+    }
+    claims = Counter((op.file.folder, op.new_name) for op in candidates)
+    ops: List[BulkOp] = []
+    for op in candidates:
+        key = (op.file.folder, op.new_name)
+        if key in occupied:
+            skipped.append((op.file, f"目标「{op.new_name}」已存在"))
+        elif claims[key] > 1:
+            skipped.append((op.file, f"有 {claims[key]} 个文件会被改成「{op.new_name}」"))
+        else:
+            ops.append(op)
+    return BulkPlan("rename", pattern.pattern, replacement, ops, skipped, None, time.monotonic())
+
+
+def plan_moves(files: Iterable[FileRecord], pattern: re.Pattern, target_folder: str,
+               target_folder_id: Optional[str]) -> BulkPlan:
+    """
+    把文件名匹配的文件移动到根目录下的 target_folder（QQ 群文件只有一层文件夹）。
+    已在目标文件夹中的文件忽略；目标文件夹中已有同名文件、或多个匹配文件同名的跳过。
+    target_folder_id 为 None 表示目标文件夹尚不存在，执行时再创建。
+    """
+    files = list(files)
+    existing = {record.file_name for record in files if record.folder == target_folder}
+    candidates = [
+        BulkOp(record, target_folder=target_folder)
+        for record in files
+        if record.folder != target_folder and pattern.search(record.file_name)
+    ]
+    claims = Counter(op.file.file_name for op in candidates)
+    ops: List[BulkOp] = []
+    skipped: List[Tuple[FileRecord, str]] = []
+    for op in candidates:
+        name = op.file.file_name
+        if name in existing:
+            skipped.append((op.file, f"目标文件夹中已有「{name}」"))
+        elif claims[name] > 1:
+            skipped.append((op.file, f"有 {claims[name]} 个同名文件会被移入"))
+        else:
+            ops.append(op)
+    return BulkPlan("move", pattern.pattern, target_folder, ops, skipped, target_folder_id, time.monotonic())
+
+
+def find_root_folder_id(root_folders: Iterable[Dict], folder_name: str) -> Optional[str]:
+    for folder in root_folders:
+        if folder.get('folder_name') == folder_name:
+            return folder.get('folder_id')
+    return None
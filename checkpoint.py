@@ -0,0 +1,155 @@
+# astrbot_plugin_GroupFS/checkpoint.py
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from . import snapshot
+from .records import FileRecord
+
+STATE_SUFFIX = ".json"
+FILES_SUFFIX = ".files" + snapshot.SNAPSHOT_SUFFIX
+
+
+@dataclass
+class ScanCheckpoint:
+    """
+    一次失效文件扫描的进度。文件列表在扫描开始时单独写入一次（快照格式），
+    这里只保存游标与已得到的结果，因此可以频繁落盘。
+    """
+    key: str
+    kind: str
+    group_id: int
+    auto_delete: bool
+    started_at: float
+    cursor: int = 0
+    invalid_ids: List[str] = field(default_factory=list)
+    deleted_ids: List[str] = field(default_factory=list)
+    failed_deletions: List[str] = field(default_factory=list)
+    error_ids: List[str] = field(default_factory=list)   # 探测出错、结果未知的文件
+    budget_calls: int = 0        # 最多调用 API 的次数（探测与删除都计入），0 表示不限
+    api_calls: int = 0           # 已调用 API 的次数
+    budget_seconds: int = 0      # 最长扫描时间，0 表示不限
+    elapsed_seconds: float = 0.0
+    updated_at: float = 0.0
+
+
+class ScanResult(NamedTuple):
+    total_count: int
+    invalid_files: List[Dict]
+    deleted_file_ids: Set[str]
+    failed_deletions: List[str]
+    checked_count: int
+    budget_exhausted: bool
+
+
+def _write_json_atomic(path: str, data) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class CheckpointStore:
+    """把扫描检查点保存在插件数据目录中，插件重启后据此继续未完成的扫描。"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _state_path(self, key: str) -> str:
+        return os.path.join(self.root, key + STATE_SUFFIX)
+
+    def _files_path(self, key: str) -> str:
+        return os.path.join(self.root, key + FILES_SUFFIX)
+
+    def save_files(self, key: str, group_id: int, files: List[Dict]) -> None:
+        snapshot.write_snapshot(self._files_path(key), group_id, files)
+
+    def load_files(self, key: str) -> List[FileRecord]:
+        """按写入顺序读回文件列表，与遍历得到的记录类型一致，以便复用报告格式。"""
+        _, entries = snapshot.read_snapshot(self._files_path(key))
+        folders: Dict[str, str] = {}
+        return [
+            FileRecord(
+                file_id=entry.file_id,
+                file_name=entry.file_name,
+                folder=folders.setdefault(entry.folder, entry.folder),
+                size=entry.size,
+                modify_time=entry.modify_time,
+                uploader=entry.uploader,
+                uploader_name=entry.uploader_name,
+            )
+            for entry in entries.values()
+        ]
+
+    def save(self, state: ScanCheckpoint) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        state.updated_at = time.time()
+        _write_json_atomic(self._state_path(state.key), asdict(state))
+
+    def load(self, key: str) -> Optional[ScanCheckpoint]:
+        try:
+            with open(self._state_path(key), 'r', encoding='utf-8') as f:
+                return ScanCheckpoint(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def list(self) -> List[ScanCheckpoint]:
+        if not os.path.isdir(self.root):
+            return []
+        checkpoints = []
+        for name in sorted(os.listdir(self.root)):
+            if name.endswith(STATE_SUFFIX):
+                state = self.load(name[:-len(STATE_SUFFIX)])
+                if state is not None and os.path.exists(self._files_path(state.key)):
+                    checkpoints.append(state)
+        return checkpoints
+
+    def discard(self, key: str) -> None:
+        for path in (self._state_path(key), self._files_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def load_last_runs(path: str) -> Dict[str, float]:
+    """读取各定时任务上次执行的时间戳，用于判断停机期间错过的执行。"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {str(k): float(v) for k, v in json.load(f).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def save_last_runs(path: str, last_runs: Dict[str, float]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_json_atomic(path, last_runs)
+
+
+def load_pending_deliveries(path: str, max_age_seconds: float) -> Dict[str, Dict]:
+    """
+    读取等待 /gfbr 重发的分卷记录（发送目标 -> 记录）。
+    超过 max_age_seconds 或临时目录已不存在的记录被丢弃。
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(records, dict):
+        return {}
+    now = time.time()
+    return {
+        str(target): record for target, record in records.items()
+        if isinstance(record, dict)
+        and now - float(record.get("created_at", 0)) <= max_age_seconds
+        and os.path.isdir(record.get("job_dir", ""))
+    }
+
+
+def save_pending_deliveries(path: str, deliveries: Dict[str, Dict]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_json_atomic(path, deliveries)
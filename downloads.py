@@ -0,0 +1,119 @@
+# astrbot_plugin_GroupFS/downloads.py
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Tuple
+
+# 优先级：数值越小越先获得下载名额
+PRIORITY_INTERACTIVE = 0   # /sf 预览等用户正在等待的请求
+PRIORITY_SCHEDULED = 1     # 定时任务触发的下载
+PRIORITY_BULK = 2          # /gfb 备份、镜像同步等批量下载
+
+
+class TokenBucket:
+    """
+    全局字节速率限制。采用「欠账」模型：先扣除本次读取的字节，
+    余额为负时等待其恢复到 0 所需的时间，并发的下载因此按到达顺序平分带宽。
+    rate_bytes 为 0 表示不限速。
+    """
+
+    def __init__(self, rate_bytes: float, burst_seconds: float = 1.0):
+        self.rate = rate_bytes
+        self.capacity = rate_bytes * burst_seconds
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def consume(self, nbytes: int, wait: bool = True):
+        if self.rate <= 0:
+            return
+        self._refill()
+        self._tokens -= nbytes
+        if wait and self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+
+class DownloadScheduler:
+    """
+    按优先级分配下载名额，取代原来所有下载共用的 Semaphore(5)：
+    - 有空闲名额时，等待中的请求按优先级（交互预览 > 定时任务 > 批量备份）依次获得名额；
+    - 总有一个名额只留给交互预览，批量下载占满其余名额时预览也不必排队；
+    - per_group 限制同一群非交互下载的并发数，0 表示不限；
+    - 批量与定时下载按全局字节速率限速，为 NapCat 自身的上下行留出带宽。
+      交互预览不等待限速，但其流量同样计入，使批量下载相应放慢。
+    """
+
+    def __init__(self, max_concurrent: int = 5, rate_bytes: float = 0, per_group: int = 0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.reserved = 1 if self.max_concurrent > 1 else 0
+        self.per_group = max(0, per_group)
+        self.bucket = TokenBucket(rate_bytes)
+        self._active = 0
+        self._group_active: Counter = Counter()
+        self._waiters: List[Tuple[int, int, Optional[int], asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    def _can_start(self, priority: int, group_id: Optional[int]) -> bool:
+        limit = self.max_concurrent if priority == PRIORITY_INTERACTIVE else self.max_concurrent - self.reserved
+        if self._active >= limit:
+            return False
+        if priority != PRIORITY_INTERACTIVE and self.per_group and group_id is not None:
+            return self._group_active[group_id] < self.per_group
+        return True
+
+    def _grant(self, priority: int, group_id: Optional[int]):
+        self._active += 1
+        if priority != PRIORITY_INTERACTIVE and group_id is not None:
+            self._group_active[group_id] += 1
+
+    def _release(self, priority: int, group_id: Optional[int]):
+        self._active -= 1
+        if priority != PRIORITY_INTERACTIVE and group_id is not None:
+            self._group_active[group_id] -= 1
+            if self._group_active[group_id] <= 0:
+                del self._group_active[group_id]
+        self._wake()
+
+    def _wake(self):
+        """按优先级顺序放行能开始的请求；某个群已达上限时跳过它，不阻塞其他群。"""
+        remaining = []
+        for entry in sorted(self._waiters):
+            priority, _, group_id, future = entry
+            if future.done():
+                continue
+            if self._can_start(priority, group_id):
+                self._grant(priority, group_id)
+                future.set_result(None)
+            else:
+                remaining.append(entry)
+        heapq.heapify(remaining)
+        self._waiters = remaining
+
+    @asynccontextmanager
+    async def slot(self, priority: int, group_id: Optional[int] = None) -> AsyncIterator[None]:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), group_id, future))
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 已获得名额后才被取消时要归还名额
+            if future.done() and not future.cancelled():
+                self._release(priority, group_id)
+            raise
+        try:
+            yield
+        finally:
+            self._release(priority, group_id)
+
+    async def throttle(self, nbytes: int, priority: int):
+        """每读取一块数据后调用。"""
+        await self.bucket.consume(nbytes, wait=priority != PRIORITY_INTERACTIVE)
@@ -0,0 +1,236 @@
+# astrbot_plugin_GroupFS/epub.py
+
+import codecs
+import posixpath
+import struct
+import zlib
+from html.parser import HTMLParser
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
+# fetch(start, end) -> 数据，读取 [start, end) 字节。可以是 HTTP 范围请求，也可以是本地文件读取
+Fetcher = Callable[[int, int], Awaitable[bytes]]
+
+READ_CHUNK = 64 * 1024
+TAIL_SIZE = 64 * 1024 + 22        # EOCD 最多带 64KB 注释
+MAX_METADATA_BYTES = 1024 * 1024  # container.xml / OPF 的读取上限
+_LOCAL_HEADER_MAX_EXTRA = 1024
+
+
+class EpubError(Exception):
+    pass
+
+
+class ZipMember(NamedTuple):
+    name: str
+    method: int
+    compressed_size: int
+    size: int
+    header_offset: int
+
+
+class RangedZipReader:
+    """
+    基于按范围读取的最小 ZIP 读取器：只读取中央目录和被请求的成员，
+    成员数据分块流式解压，调用方随时可以停止，因此内存与传输量都有上界。
+    不支持 ZIP64 与加密成员。
+    """
+
+    def __init__(self, fetch: Fetcher, total_size: int):
+        self._fetch = fetch
+        self.total_size = total_size
+        self.members: Dict[str, ZipMember] = {}
+
+    async def read_directory(self):
+        tail_start = max(0, self.total_size - TAIL_SIZE)
+        tail = await self._fetch(tail_start, self.total_size)
+        eocd = tail.rfind(b'PK\x05\x06')
+        if eocd == -1 or len(tail) - eocd < 22:
+            raise EpubError("找不到 ZIP 目录结构")
+        _, _, _, _, count, cd_size, cd_offset, _ = struct.unpack('<4s4H2LH', tail[eocd:eocd + 22])
+        if cd_offset == 0xFFFFFFFF or count == 0xFFFF:
+            raise EpubError("暂不支持 ZIP64 格式")
+        if cd_offset >= tail_start:
+            directory = tail[cd_offset - tail_start:cd_offset - tail_start + cd_size]
+        else:
+            directory = await self._fetch(cd_offset, cd_offset + cd_size)
+
+        pos = 0
+        for _ in range(count):
+            if directory[pos:pos + 4] != b'PK\x01\x02':
+                raise EpubError("ZIP 中央目录已损坏")
+            (flags, method, comp_size, size, name_len, extra_len, comment_len, header_offset) = struct.unpack(
+                '<4x2H8x2L3H8xL', directory[pos + 4:pos + 46]
+            )
+            raw_name = directory[pos + 46:pos + 46 + name_len]
+            name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437', errors='replace')
+            if not flags & 0x1:
+                self.members[name] = ZipMember(name, method, comp_size, size, header_offset)
+            pos += 46 + name_len + extra_len + comment_len
+
+    async def iter_member(self, name: str) -> AsyncIterator[bytes]:
+        """流式读取并解压一个成员，逐块产出解压后的数据。"""
+        member = self.members.get(name)
+        if member is None:
+            raise EpubError(f"EPUB 中缺少文件: {name}")
+        if member.method not in (0, 8):
+            raise EpubError(f"不支持的压缩方式: {member.method}")
+
+        first_end = min(self.total_size, member.header_offset + 30 + _LOCAL_HEADER_MAX_EXTRA + min(member.compressed_size, READ_CHUNK))
+        head = await self._fetch(member.header_offset, first_end)
+        if head[:4] != b'PK\x03\x04':
+            raise EpubError("ZIP 本地文件头已损坏")
+        name_len, extra_len = struct.unpack('<2H', head[26:30])
+        data_start = member.header_offset + 30 + name_len + extra_len
+        data_end = data_start + member.compressed_size
+
+        decompressor = zlib.decompressobj(-15) if member.method == 8 else None
+        pending = head[30 + name_len + extra_len:][:member.compressed_size]
+        position = data_start + len(pending)
+        while True:
+            if pending:
+                yield decompressor.decompress(pending) if decompressor else pending
+            if position >= data_end:
+                break
+            next_end = min(data_end, position + READ_CHUNK)
+            pending = await self._fetch(position, next_end)
+            if not pending:
+                break
+            position = next_end
+        if decompressor:
+            rest = decompressor.flush()
+            if rest:
+                yield rest
+
+    async def read_member(self, name: str, limit: int = MAX_METADATA_BYTES) -> bytes:
+        buffer = bytearray()
+        async for chunk in self.iter_member(name):
+            buffer += chunk
+            if len(buffer) >= limit:
+                break
+        return bytes(buffer[:limit])
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class _TextCollector(HTMLParser):
+    """流式提取 XHTML 正文，收集到足够字符后立即停止。"""
+
+    _SKIP_TAGS = {'script', 'style', 'head', 'title'}
+    _BLOCK_TAGS = {'p', 'div', 'br', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'tr', 'section', 'blockquote'}
+
+    def __init__(self, limit: int):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.parts: List[str] = []
+        self.length = 0
+        self._skip_depth = 0
+
+    @property
+    def done(self) -> bool:
+        return self.length >= self.limit
+
+    def _emit(self, text: str):
+        self.parts.append(text)
+        self.length += len(text)
+        if self.done:
+            raise _StopParsing()
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self._BLOCK_TAGS and self.parts and not self.parts[-1].endswith('\n'):
+            self._emit('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self._BLOCK_TAGS and self.parts and not self.parts[-1].endswith('\n'):
+            self._emit('\n')
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        text = ' '.join(data.split())
+        if text:
+            self._emit(text)
+
+    def feed_chunk(self, chunk: str) -> bool:
+        """喂入一段文本，返回是否已收集足够字符。"""
+        try:
+            self.feed(chunk)
+        except _StopParsing:
+            pass
+        return self.done
+
+    def next_document(self):
+        """切换到下一个正文文档：丢弃未闭合的标签状态，并以换行分隔。"""
+        self.reset()
+        self._skip_depth = 0
+        if self.parts and not self.parts[-1].endswith('\n'):
+            self.parts.append('\n')
+
+    def text(self) -> str:
+        return ''.join(self.parts).strip()[:self.limit]
+
+
+def _resolve(base_dir: str, href: str) -> str:
+    return posixpath.normpath(posixpath.join(base_dir, unquote(href.split('#', 1)[0])))
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+async def _find_spine(reader: RangedZipReader) -> tuple[str, List[str]]:
+    """解析 container.xml 与 OPF，返回 (书名, 按阅读顺序排列的正文文件路径)。"""
+    container = ElementTree.fromstring(await reader.read_member('META-INF/container.xml'))
+    opf_path = next((el.get('full-path') for el in container.iter() if _local_name(el.tag) == 'rootfile'), None)
+    if not opf_path:
+        raise EpubError("container.xml 中未找到 OPF 文件")
+    opf = ElementTree.fromstring(await reader.read_member(opf_path))
+    opf_dir = posixpath.dirname(opf_path)
+
+    title = ""
+    manifest: Dict[str, str] = {}
+    spine: List[str] = []
+    for el in opf.iter():
+        tag = _local_name(el.tag)
+        if tag == 'title' and not title and el.text:
+            title = el.text.strip()
+        elif tag == 'item' and el.get('id') and el.get('href'):
+            media_type = el.get('media-type', '')
+            if 'html' in media_type or el.get('href', '').lower().endswith(('.html', '.xhtml', '.htm')):
+                manifest[el.get('id')] = _resolve(opf_dir, el.get('href'))
+        elif tag == 'itemref' and el.get('idref'):
+            spine.append(el.get('idref'))
+    return title, [manifest[idref] for idref in spine if idref in manifest]
+
+
+async def extract_epub_preview(fetch: Fetcher, total_size: int, limit: int, max_documents: int = 10) -> tuple[str, str]:
+    """
+    读取 EPUB 的 OPF 目录与前几个正文文档，返回 (书名, 不超过 limit 个字符的正文预览)。
+    只会请求中央目录、元数据和正文文档的字节，图片等资源一律不读取。
+    """
+    reader = RangedZipReader(fetch, total_size)
+    await reader.read_directory()
+    title, documents = await _find_spine(reader)
+    collector = _TextCollector(limit)
+    for doc_path in documents[:max_documents]:
+        if doc_path not in reader.members:
+            continue
+        text_decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        chunks = reader.iter_member(doc_path)
+        try:
+            async for chunk in chunks:
+                if collector.feed_chunk(text_decoder.decode(chunk)):
+                    break
+        finally:
+            await chunks.aclose()
+        if collector.done:
+            break
+        collector.next_document()
+    return title, collector.text()
@@ -0,0 +1,195 @@
+# astrbot_plugin_GroupFS/gateway.py
+
+import asyncio
+import random
+import time
+from typing import Any, Dict, Optional
+
+from astrbot.api import logger
+from aiocqhttp.exceptions import ActionFailed, ApiNotAvailable, NetworkError
+
+from .botpool import BotPool, is_backend_timeout, is_rate_limited
+from .tracing import span
+
+# 文件已失效等业务错误，重试没有意义
+_PERMANENT_RETCODES = {1200}
+
+
+# 上传动辄数分钟，使用独立的并发限制，不占用查询类调用的全局与群内名额
+UPLOAD_ACTIONS = frozenset({'upload_group_file', 'upload_private_file'})
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，调用被直接拒绝。retry_after 为建议的等待秒数。"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    连续失败达到阈值后打开熔断，冷却期内拒绝所有调用；
+    冷却结束后进入半开状态，放行一次试探调用，成功则恢复，失败则重新打开。
+    """
+
+    def __init__(self, failure_threshold: int = 8, reset_timeout: float = 30, name: str = ""):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    @property
+    def retry_after(self) -> float:
+        """距离下一次可以试探还有多少秒；半开状态下试探正在进行时至少等待 1 秒。"""
+        if self._opened_at is None:
+            return 0.0
+        return max(1.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self._probing or self._failures >= self.failure_threshold:
+            if self._opened_at is None or self._probing:
+                logger.warning(f"[API网关] {self.name}连续 {self._failures} 次调用失败，熔断 {self.reset_timeout:.0f} 秒。")
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self):
+        """
+        试探调用既未记录成功也未记录失败（被取消或抛出其他异常）时释放试探名额，
+        熔断器回到半开状态，由下一次调用重新试探，而不是永久拒绝。
+        """
+        self._probing = False
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """区分可重试的临时错误（网络/超时/限流）与不可重试的业务错误。"""
+    if isinstance(error, (NetworkError, ApiNotAvailable, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, ActionFailed):
+        result = getattr(error, 'result', None) or {}
+        if result.get('retcode') in _PERMANENT_RETCODES:
+            return False
+        # 与 BotPool 共用同一套限流/超时判定
+        return is_rate_limited(error) or is_backend_timeout(error)
+    return False
+
+
+class ApiGateway:
+    """
+    所有 OneBot API 调用的统一入口。
+    - 限制全局与每个群的在途调用数；
+    - 对临时错误按指数退避加随机抖动重试，业务错误原样抛出；
+    - 上传使用独立的并发限制，长时间的上传不会占满查询类调用的名额；
+    - 某个群的调用持续失败时熔断该群，避免在 NapCat 过载时继续施压，其他群不受影响；
+    - 未指定 client 时经由 BotPool 在群内多个账号间分摊并故障转移。
+    """
+
+    def __init__(self, pool: BotPool, max_in_flight: int = 8, per_group_in_flight: int = 3,
+                 max_retries: int = 3, base_delay: float = 1.0, max_delay: float = 30.0, max_uploads: int = 2):
+        self.pool = pool
+        self.per_group_in_flight = max(1, per_group_in_flight)
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._breakers: Dict[Optional[int], CircuitBreaker] = {}
+        self._global_slots = asyncio.Semaphore(max(1, max_in_flight))
+        self._upload_slots = asyncio.Semaphore(max(1, max_uploads))
+        self._group_slots: Dict[int, asyncio.Semaphore] = {}
+
+    def breaker(self, group_id: Optional[int]) -> CircuitBreaker:
+        """每个群一个熔断器；不针对群的调用（如私聊上传、获取登录信息）共用 None 对应的熔断器。"""
+        breaker = self._breakers.get(group_id)
+        if breaker is None:
+            breaker = self._breakers[group_id] = CircuitBreaker(name=f"群 {group_id} " if group_id is not None else "")
+        return breaker
+
+    def _group_semaphore(self, group_id: Optional[int]) -> Optional[asyncio.Semaphore]:
+        if group_id is None:
+            return None
+        semaphore = self._group_slots.get(group_id)
+        if semaphore is None:
+            semaphore = self._group_slots[group_id] = asyncio.Semaphore(self.per_group_in_flight)
+        return semaphore
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _call_once(self, action: str, group_id: Optional[int], client: Any, fallback: Any, params: Dict) -> Any:
+        if action in UPLOAD_ACTIONS:
+            async with self._upload_slots:
+                return await self._dispatch(action, group_id, client, fallback, params)
+        group_slots = self._group_semaphore(group_id)
+        async with self._global_slots:
+            if group_slots is None:
+                return await self._dispatch(action, group_id, client, fallback, params)
+            async with group_slots:
+                return await self._dispatch(action, group_id, client, fallback, params)
+
+    async def _dispatch(self, action: str, group_id: Optional[int], client: Any, fallback: Any, params: Dict) -> Any:
+        if client is not None:
+            if group_id is not None:
+                return await client.api.call_action(action, group_id=group_id, **params)
+            return await client.api.call_action(action, **params)
+        return await self.pool.call(group_id, action, fallback=fallback, **params)
+
+    async def call(self, action: str, group_id: Optional[int] = None, *, client: Any = None,
+                   fallback: Any = None, retry: bool = True, **params) -> Any:
+        """
+        执行一次 API 调用。client 指定时固定使用该账号（如上传、发送消息），
+        否则交给 BotPool 选择账号，fallback 为群内没有已知账号时使用的客户端。
+        retry=False 用于非幂等操作（上传、发消息），只尝试一次。
+        """
+        attempts = self.max_retries + 1 if retry else 1
+        breaker = self.breaker(group_id)
+        for attempt in range(attempts):
+            # 本次调用是否为半开状态下的试探调用；检查与 allow() 之间没有 await，不会被并发调用插入
+            probing = breaker.state == "half_open"
+            if not breaker.allow():
+                raise CircuitOpenError(f"NapCat 当前负载过高，已暂停调用 {action}", breaker.retry_after)
+            try:
+                with span(f"api:{action}", group_id=group_id, attempt=attempt):
+                    result = await self._call_once(action, group_id, client, fallback, params)
+                breaker.record_success()
+                return result
+            except Exception as e:
+                if not is_transient_error(e):
+                    # 业务错误说明后端仍在正常响应
+                    if isinstance(e, ActionFailed):
+                        breaker.record_success()
+                    raise
+                breaker.record_failure()
+                if attempt + 1 >= attempts:
+                    raise
+                error_name = type(e).__name__
+            finally:
+                if probing:
+                    breaker.release_probe()
+            delay = self._backoff(attempt)
+            logger.warning(f"[API网关] 调用 {action} 失败 ({error_name})，{delay:.1f} 秒后第 {attempt + 1} 次重试。")
+            await asyncio.sleep(delay)
@@ -0,0 +1,149 @@
+# astrbot_plugin_GroupFS/jobs.py
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from astrbot.api import logger
+
+from . import utils
+
+Notify = Callable[[str], Awaitable]
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds} 秒"
+    if seconds < 3600:
+        return f"{seconds // 60} 分 {seconds % 60} 秒"
+    return f"{seconds // 3600} 小时 {seconds % 3600 // 60} 分"
+
+
+class Job:
+    """
+    一个长任务（备份、镜像、失效文件扫描）的实时进度。
+    任务分为若干阶段，每个阶段有自己的 已完成/总数 与字节数；
+    吞吐量按最近 RATE_WINDOW 秒内的采样计算，预计剩余时间优先按字节估算。
+    """
+
+    RATE_WINDOW = 60
+
+    def __init__(self, key: str, title: str, group_id: int):
+        self.key = key
+        self.title = title
+        self.group_id = group_id
+        self.started_at = time.time()
+        self.phase = "准备中"
+        self.done = 0
+        self.total: Optional[int] = None
+        self.nbytes = 0
+        self.total_bytes: Optional[int] = None
+        self._samples: deque = deque()
+
+    def set_phase(self, phase: str, total: Optional[int] = None, total_bytes: Optional[int] = None, done: int = 0):
+        self.phase = phase
+        self.total = total
+        self.total_bytes = total_bytes
+        self.done = done
+        self.nbytes = 0
+        self._samples.clear()
+        self._sample()
+
+    def advance(self, count: int = 1, nbytes: int = 0):
+        self.done += count
+        self.nbytes += nbytes
+        if not self._samples or time.monotonic() - self._samples[-1][0] >= 1:
+            self._sample()
+
+    def _sample(self):
+        now = time.monotonic()
+        self._samples.append((now, self.done, self.nbytes))
+        while len(self._samples) > 2 and now - self._samples[1][0] > self.RATE_WINDOW:
+            self._samples.popleft()
+
+    def rates(self) -> tuple[float, float]:
+        """最近一段时间的 (条目/秒, 字节/秒)。"""
+        if not self._samples:
+            return 0.0, 0.0
+        t0, done0, bytes0 = self._samples[0]
+        elapsed = time.monotonic() - t0
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return (self.done - done0) / elapsed, (self.nbytes - bytes0) / elapsed
+
+    def eta_seconds(self) -> Optional[float]:
+        item_rate, byte_rate = self.rates()
+        if self.total_bytes and byte_rate > 0:
+            return max(0.0, (self.total_bytes - self.nbytes) / byte_rate)
+        if self.total and item_rate > 0:
+            return max(0.0, (self.total - self.done) / item_rate)
+        return None
+
+    def describe(self) -> str:
+        lines = [f"⏳ {self.title} (群 {self.group_id})", f"阶段: {self.phase}"]
+        if self.total:
+            lines.append(f"进度: {self.done}/{self.total} ({self.done * 100 // self.total}%)")
+        elif self.done:
+            lines.append(f"已处理: {self.done}")
+        if self.nbytes or self.total_bytes:
+            size = utils.format_bytes(self.nbytes)
+            if self.total_bytes:
+                size += f" / {utils.format_bytes(self.total_bytes)}"
+            lines.append(f"数据量: {size}")
+        item_rate, byte_rate = self.rates()
+        if byte_rate > 0:
+            lines.append(f"速度: {utils.format_bytes(int(byte_rate))}/秒")
+        elif item_rate > 0:
+            lines.append(f"速度: {item_rate:.1f} 项/秒")
+        lines.append(f"已运行: {_format_duration(time.time() - self.started_at)}")
+        eta = self.eta_seconds()
+        if eta is not None:
+            lines.append(f"预计剩余: {_format_duration(eta)}")
+        return "\n".join(lines)
+
+
+class JobRegistry:
+    """
+    登记正在运行的长任务，供 /gfj 随时查询，也用于拦截重复触发的同一任务。
+    指定 notify 时，每隔 notify_seconds 把任务进度发送到发起任务的会话。
+    """
+
+    def __init__(self, notify_seconds: float = 300):
+        self.notify_seconds = notify_seconds
+        self._jobs: Dict[str, Job] = {}
+        self._tickers: Dict[str, asyncio.Task] = {}
+
+    def get(self, key: str) -> Optional[Job]:
+        return self._jobs.get(key)
+
+    def list(self) -> List[Job]:
+        return sorted(self._jobs.values(), key=lambda job: job.started_at)
+
+    def start(self, key: str, title: str, group_id: int, notify: Optional[Notify] = None) -> Job:
+        job = self._jobs[key] = Job(key, title, group_id)
+        if notify and self.notify_seconds > 0:
+            self._tickers[key] = asyncio.create_task(self._tick(job, notify))
+        return job
+
+    def finish(self, job: Job):
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+            ticker = self._tickers.pop(job.key, None)
+            if ticker:
+                ticker.cancel()
+
+    async def _tick(self, job: Job, notify: Notify):
+        while True:
+            await asyncio.sleep(self.notify_seconds)
+            try:
+                await notify(job.describe())
+            except Exception as e:
+                logger.warning(f"[{job.group_id}] 发送任务进度失败: {e}")
+
+    def cancel_all(self):
+        for ticker in self._tickers.values():
+            ticker.cancel()
+        self._tickers.clear()
+        self._jobs.clear()
@@ -1,16 +1,22 @@
 # astrbot_plugin_GroupFS/main.py
 
 # 请确保已安装依赖: pip install croniter aiohttp chardet apscheduler
+# 以上依赖均在首次使用时才导入，以缩短 AstrBot 启动与插件重载的耗时
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import asyncio
+import datetime
+import logging
 import os
-import time
-from typing import List, Dict, Optional
-import chardet
+import re
+import shutil
+import uuid
+from itertools import chain
+from xml.etree import ElementTree
+from collections import deque
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Iterable, List, Dict, Optional, Set, Union
 import subprocess
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-
-import aiohttp
-import croniter
 
 from astrbot.api.event import filter, AstrMessageEvent, MessageChain
 from astrbot.api.star import Context, Star, register
@@ -22,6 +28,33 @@ from aiocqhttp.exceptions import ActionFailed
 from astrbot.core.utils.astrbot_path import get_astrbot_data_path 
 
 from . import utils
+from . import snapshot
+from .tempspace import TempQuotaExceeded, TempSpaceManager
+from .botpool import BotPool
+from .gateway import ApiGateway, CircuitOpenError
+from .singleflight import SingleFlight, StreamFlight
+from .records import FileRecord
+from .query import FileIndex, QueryError, match_name, parse_query
+from .bulkops import BulkOp, BulkPlan, compile_pattern, find_root_folder_id, plan_moves, plan_renames
+from .sessions import SearchSessionStore
+from .settings import PluginSettings
+from .progress import SubsystemLog
+from .jobs import Job, JobRegistry
+from .downloads import DownloadScheduler, PRIORITY_BULK, PRIORITY_INTERACTIVE
+from .streamio import AtomicStreamWriter, StreamLimitExceeded, read_capped
+from .tracing import Tracer, span, traced
+from .mirror import MirrorEntry, load_manifest, plan_mirror, remove_empty_dirs, save_manifest
+from .uploadstats import UPLOAD_FAILED, UPLOAD_OK, UPLOAD_REJECTED, UploadStatsStore
+from .prioritizer import load_history, order_for_probing, save_history
+from .checkpoint import (CheckpointStore, ScanCheckpoint, ScanResult, load_last_runs, load_pending_deliveries,
+                         save_last_runs, save_pending_deliveries)
+from .textpager import PageLayout, PageLayoutCache
+from .epub import EpubError, extract_epub_preview
+from .analytics import compute_storage_stats, StorageStats
+from .report import ReportBuilder, MAX_PLAIN_MESSAGES, PLAIN_CHAR_LIMIT, pack_blocks, paginate, peek_length
+
+if TYPE_CHECKING:
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 @register(
     "astrbot_plugin_GroupFS",
@@ -31,79 +64,153 @@ from . import utils
     "https://github.com/Foolllll-J/astrbot_plugin_GroupFS"
 )
 class GroupFSPlugin(Star):
+    # 服务器不支持 Range 时，分页预览最多顺序读取的字节数
+    MAX_UNRANGED_BYTES = 8 * 1024 * 1024
+    # 后端不支持 start_index 分页时，单个文件夹一次请求的最大条目数
+    MAX_FOLDER_PAGE_SIZE = 32000
+    # 群被熔断时遍历与扫描最多连续暂停等待的次数，超过后放弃（扫描保留检查点，下次启动继续）
+    MAX_CIRCUIT_PAUSES = 10
+
     def __init__(self, context: Context, config: Optional[Dict] = None):
+        init_started = time.perf_counter()
         super().__init__(context)
         self.config = config if config else {}
-        self.group_whitelist: List[int] = [int(g) for g in self.config.get("group_whitelist", [])]
-        self.admin_users: List[int] = [int(u) for u in self.config.get("admin_users", [])]
-        self.preview_length: int = self.config.get("preview_length", 300)
-        self.storage_limits: Dict[int, Dict] = {}
-        self.cron_configs = []
+        self.settings = PluginSettings.from_config(self.config)
+        self.logs = SubsystemLog(
+            self.settings.log_levels,
+            interval_seconds=self.settings.progress_log_seconds,
+            sample_every=self.settings.progress_sample_every,
+        )
         self.bot = None
-        self.forward_threshold: int = self.config.get("forward_threshold", 0)
-        self.scheduler: Optional[AsyncIOScheduler] = None
+        self.bot_pool = BotPool()
+        self.api = ApiGateway(
+            self.bot_pool,
+            max_in_flight=self.settings.api_max_concurrency,
+            per_group_in_flight=self.settings.api_group_concurrency,
+            max_retries=self.settings.api_max_retries,
+        )
+        # 调度器只在配置了定时任务时于 initialize() 中创建
+        self.scheduler: Optional["AsyncIOScheduler"] = None
         
         self.active_tasks = [] 
+        self.plugin_data_dir = os.path.join(get_astrbot_data_path(), 'plugins_data', 'astrbot_plugin_GroupFS')
+        self.temp_space = TempSpaceManager(os.path.join(self.plugin_data_dir, 'temp'), self.settings.temp_quota_mb * 1024 * 1024)
         
-        self.enable_zip_preview: bool = self.config.get("enable_zip_preview", False)
-        self.default_zip_password: str = self.config.get("default_zip_password", "")
-        self.download_semaphore = asyncio.Semaphore(5)
+        self.downloads = DownloadScheduler(
+            max_concurrent=self.settings.download_max_concurrency,
+            rate_bytes=self.settings.download_rate_limit_kb * 1024,
+            per_group=self.settings.download_group_concurrency,
+        )
+        self.page_layouts = PageLayoutCache()
+        self.listing_flight = SingleFlight(reuse_seconds=self.settings.listing_cache_seconds)
+        # 同一群正在进行的流式遍历，/sf 与全量列表请求共享它而不各自发起遍历
+        self.listing_streams = StreamFlight()
+        self.search_sessions = SearchSessionStore(ttl_seconds=self.settings.search_session_ttl_seconds)
+        # 群号 -> (建立时间, 字段索引)。有效期 search_index_ttl_seconds，群文件变化时作废
+        self.file_indexes: Dict[int, tuple[float, FileIndex]] = {}
+        # 后端忽略 start_index 的群，之后遍历时每个文件夹只请求一次
+        self.unpaged_groups: Set[int] = set()
+        self.checkpoints = CheckpointStore(os.path.join(self.plugin_data_dir, 'checkpoints'))
+        self.schedule_state_path = os.path.join(self.plugin_data_dir, 'schedule_state.json')
+        self.running_scans = set()
+        self.jobs = JobRegistry(notify_seconds=self.settings.progress_notify_seconds)
+        self.tracer = Tracer(
+            os.path.join(self.plugin_data_dir, 'traces', 'slow_traces.jsonl'),
+            slow_ms=self.settings.trace_slow_ms,
+            max_bytes=self.settings.trace_file_max_mb * 1024 * 1024,
+            backups=self.settings.trace_file_backups,
+        )
+        self.upload_stats = UploadStatsStore(
+            os.path.join(self.plugin_data_dir, 'upload_stats.json'),
+            default_volume_mb=self.settings.backup_volume_size_mb,
+        )
+        # 发送目标 -> 发送失败、等待 /gfbr 重发的分卷；持久化到磁盘，插件重启后仍可重发
+        self.pending_deliveries: Dict[str, Dict] = {}
+        self.resuming_deliveries: Set[str] = set()   # 正在执行 /gfbr 的会话
+        self.pending_deliveries_path = os.path.join(self.plugin_data_dir, 'pending_deliveries.json')
+        # (群号, 用户) -> 等待 confirm 的批量重命名/移动计划
+        self.bulk_plans: Dict[tuple, BulkPlan] = {}
+        self.deferred_jobs: List[Callable[[], Awaitable]] = []
         
-        self.scheduled_autodelete: bool = self.config.get("scheduled_autodelete", False)
+        logger.info(
+            f"插件 [群文件系统GroupFS] 已加载。"
+            f"(模块导入 {_IMPORT_SECONDS * 1000:.1f}ms, 构造 {(time.perf_counter() - init_started) * 1000:.1f}ms)"
+        )
+
+    def _register_bot(self, event: AstrMessageEvent):
+        """登记事件所属的 bot 账号。首个账号同时作为无事件上下文（如定时任务）时的默认客户端。"""
+        if not self.bot:
+            self.bot = event.bot
+            self._start_deferred_jobs()
+        group_id = event.get_group_id()
+        self.bot_pool.register(event.get_self_id(), event.bot, int(group_id) if group_id else None)
 
-        limit_configs = self.config.get("storage_limits", [])
-        for item in limit_configs:
-            try:
-                group_id_str, count_limit_str, space_limit_str = item.split(':')
-                group_id = int(group_id_str)
-                self.storage_limits[group_id] = { "count_limit": int(count_limit_str), "space_limit_gb": float(space_limit_str) }
-            except ValueError as e:
-                logger.error(f"解析 storage_limits 配置 '{item}' 时出错: {e}，已跳过。")
-        
-        self.backup_zip_password: str = self.config.get("backup_zip_password", "")
-        self.backup_file_size_limit_mb: int = self.config.get("backup_file_size_limit_mb", 0)
-        ext_str: str = self.config.get("backup_file_extensions", "txt,zip")
-        
-        self.backup_file_extensions: List[str] = [
-            ext.strip().lstrip('.').lower()
-            for ext in ext_str.split(',') 
-            if ext.strip()
-        ]
+    def _run_when_bot_ready(self, factory: Callable[[], Awaitable]):
+        """需要 bot 实例的后台任务（检查点恢复、补跑错过的定时任务）：已有 bot 时立即启动，否则等到首个事件。"""
+        if self.bot:
+            self.active_tasks.append(asyncio.create_task(factory()))
+        else:
+            self.deferred_jobs.append(factory)
 
-        cron_configs = self.config.get("scheduled_check_tasks", [])
-        seen_tasks = set()
-        for item in cron_configs:
-            try:
-                group_id_str, cron_str = item.split(':', 1)
-                group_id = int(group_id_str)
-                if not croniter.croniter.is_valid(cron_str):
-                    raise ValueError(f"无效的 cron 表达式: {cron_str}")
-                
-                task_identifier = (group_id, cron_str)
-                if task_identifier in seen_tasks:
-                    logger.warning(f"检测到重复的定时任务配置 '{item}'，已跳过。")
-                    continue
-                
-                self.cron_configs.append({"group_id": group_id, "cron_str": cron_str})
-                seen_tasks.add(task_identifier)
-            except ValueError as e:
-                logger.error(f"解析 scheduled_check_tasks 配置 '{item}' 时出错: {e}，已跳过。")
-        
-        logger.info("插件 [群文件系统GroupFS] 已加载。")
+    def _start_deferred_jobs(self):
+        if self.deferred_jobs:
+            logger.info(f"已捕获 bot 实例，开始执行 {len(self.deferred_jobs)} 个待恢复的后台任务。")
+        jobs, self.deferred_jobs = self.deferred_jobs, []
+        for factory in jobs:
+            self.active_tasks.append(asyncio.create_task(factory()))
 
     async def initialize(self):
-        if self.cron_configs:
-            logger.info("[定时任务] 启动失效文件检查调度器...")
-            self.scheduler = AsyncIOScheduler()
-            self._register_jobs()
-            self.scheduler.start()
-
-    def _register_jobs(self):
-        """根据配置注册定时任务"""
-        for job_config in self.cron_configs:
-            group_id = job_config["group_id"]
-            cron_str = job_config["cron_str"]
-            job_id = f"scheduled_check_{group_id}_{cron_str.replace(' ', '_')}"
+        started = time.perf_counter()
+        # 恢复等待重发的分卷记录，其临时目录在清扫时保留到重发期限
+        resume_seconds = self.settings.backup_resume_hours * 3600
+        self.pending_deliveries = await asyncio.to_thread(load_pending_deliveries, self.pending_deliveries_path, resume_seconds)
+        for delivery in self.pending_deliveries.values():
+            await self.temp_space.adopt(delivery["job_dir"], delivery["created_at"] + resume_seconds - time.time())
+        # 清扫上次异常退出留下的临时文件（包括旧版本使用的临时目录）
+        await self.temp_space.sweep_orphans(extra_paths=[
+            os.path.join(os.getcwd(), 'temp_file_previews'),
+            os.path.join(self.plugin_data_dir, 'temp_backup_cache'),
+        ])
+        await self._resume_checkpointed_scans()
+        if self.settings.scheduled_checks:
+            await self._start_scheduler()
+        logger.info(f"插件 [群文件系统GroupFS] 初始化完成，耗时 {(time.perf_counter() - started) * 1000:.1f}ms。")
+
+    async def _resume_checkpointed_scans(self):
+        """找出上次运行中被中断的扫描，等 bot 可用后从检查点继续；过期的检查点直接丢弃。"""
+        max_age = self.settings.scan_resume_max_age_hours * 3600
+        for state in await asyncio.to_thread(self.checkpoints.list):
+            if max_age <= 0 or time.time() - state.started_at > max_age:
+                logger.info(f"[{state.group_id}] 丢弃过期的扫描检查点 {state.key}。")
+                await asyncio.to_thread(self.checkpoints.discard, state.key)
+                continue
+            logger.info(f"[{state.group_id}] 发现未完成的扫描 {state.key} (进度 {state.cursor})，将在 bot 可用后继续。")
+            if state.kind == "cleanup":
+                self._run_when_bot_ready(lambda state=state: self._perform_batch_check_and_delete(None, resume=state))
+            else:
+                self._run_when_bot_ready(lambda state=state: self._perform_scheduled_check(state.group_id, state.auto_delete, resume=state))
+
+    async def _start_scheduler(self):
+        # apscheduler 与 croniter 只在配置了定时任务时才导入
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
+        logger.info("[定时任务] 启动失效文件检查调度器...")
+        self.scheduler = AsyncIOScheduler()
+        await self._register_jobs()
+        self.scheduler.start()
+
+    async def _register_jobs(self):
+        """根据配置注册定时任务，并补跑停机期间错过的执行。"""
+        import croniter
+        last_runs = await asyncio.to_thread(load_last_runs, self.schedule_state_path)
+        # 已有检查点的群会从检查点继续，不再另行补跑
+        resuming = {state.key for state in await asyncio.to_thread(self.checkpoints.list)}
+        for job_config in self.settings.scheduled_checks:
+            group_id = job_config.group_id
+            cron_str = job_config.cron_str
+            job_id = job_config.job_id
+            if not croniter.croniter.is_valid(cron_str):
+                logger.error(f"解析 scheduled_check_tasks 配置 '{group_id}:{cron_str}' 时出错: 无效的 cron 表达式，已跳过。")
+                continue
             
             if self.scheduler.get_job(job_id):
                 logger.warning(f"任务 {job_id} 已存在，跳过注册。")
@@ -114,201 +221,622 @@ class GroupFSPlugin(Star):
                 minute, hour, day, month, day_of_week = cron_parts
                 
                 self.scheduler.add_job(
-                    self._perform_scheduled_check,
+                    self._run_scheduled_job,
                     "cron",
-                    args=[group_id, self.scheduled_autodelete],
+                    args=[job_id, group_id],
                     minute=minute,
                     hour=hour,
                     day=day,
                     month=month,
                     day_of_week=day_of_week,
-                    id=job_id
+                    id=job_id,
+                    # 事件循环繁忙导致的延迟也照常执行，多次错过只补一次
+                    misfire_grace_time=3600,
+                    coalesce=True,
                 )
                 logger.info(f"成功注册定时任务: group_id={group_id}, cron_str='{cron_str}'")
+                last_run = last_runs.get(job_id)
+                if self.settings.scheduled_catch_up and last_run:
+                    missed_at = croniter.croniter(cron_str, datetime.datetime.fromtimestamp(last_run)).get_next(float)
+                    if missed_at <= time.time() and f"check_{group_id}" not in resuming:
+                        logger.info(f"[{group_id}] [定时任务] 停机期间错过了 {utils.format_timestamp(int(missed_at))} 的执行，将补跑一次。")
+                        self._run_when_bot_ready(lambda job_id=job_id, group_id=group_id: self._run_scheduled_job(job_id, group_id))
             except Exception as e:
                 logger.error(f"注册定时任务 '{cron_str}' 失败: {e}", exc_info=True)
 
-    def _split_text_by_length(self, text: str, max_length: int = 1000) -> List[str]:
-            """
-            将文本按指定长度分割成一个字符串列表。
-            """
-            return [text[i:i + max_length] for i in range(0, len(text), max_length)]
-
-    async def _send_or_forward(self, event: AstrMessageEvent, text: str, name: str = "GroupFS"):
-        total_length = len(text)
-        group_id = event.get_group_id()
-
-        if self.forward_threshold > 0 and total_length > self.forward_threshold:
-            logger.info(f"[{group_id}] 检测到长消息 (长度: {total_length} > {self.forward_threshold})，准备自动合并转发。")
+    async def _send_plain_capped(self, texts: Iterable[str], send_plain, log_tag: str) -> bool:
+        """
+        逐条发送普通消息，最多 MAX_PLAIN_MESSAGES 条；超出的部分不再逐条发送，
+        只统计剩余行数与字数并发送一条摘要，避免超大报告刷屏。返回是否全部发送成功。
+        """
+        texts = iter(texts)
+        for index, text in enumerate(texts):
+            if index >= MAX_PLAIN_MESSAGES:
+                remaining = chain([text], texts)
+                lines = chars = 0
+                for rest in remaining:
+                    lines += rest.count("\n") + 1
+                    chars += len(rest)
+                text = f"⚠️ 报告过长，剩余 {lines} 行 (约 {chars} 字) 未显示。设置 forward_threshold 后将以合并转发发送完整报告。"
+                self.logs.log('send', logging.DEBUG, f"{log_tag} 普通消息已达 {MAX_PLAIN_MESSAGES} 条上限，剩余 {lines} 行以摘要代替。")
             try:
-                split_texts = self._split_text_by_length(text, 4000)
-                forward_nodes = []
-                
-                logger.info(f"[{group_id}] 将消息分割为 {len(split_texts)} 个节点。")
-                for i, part_text in enumerate(split_texts):
-                    node_name = f"{name} ({i+1})" if len(split_texts) > 1 else name
-                    forward_nodes.append(Node(uin=event.get_self_id(), name=node_name, content=[Plain(part_text)]))
-
-                merged_forward_message = Nodes(nodes=forward_nodes)
-                await event.send(MessageChain([merged_forward_message]))
-                logger.info(f"[{group_id}] 成功发送合并转发消息。")
-
+                with span("send:plain", chars=len(text)):
+                    await send_plain(text)
             except Exception as e:
-                logger.error(f"[{group_id}] 合并转发长消息时出错: {e}", exc_info=True)
-                
-                fallback_text = text[:self.forward_threshold] + "... (消息过长且合并转发失败)"
-                await event.send(MessageChain([Comp.Plain(fallback_text)]))
-                logger.info(f"[{group_id}] 合并转发失败，已回退为发送截断的普通消息。")
+                logger.error(f"{log_tag} 发送普通消息时出错: {e}", exc_info=True)
+                return False
+            if index >= MAX_PLAIN_MESSAGES:
+                break
+        return True
+
+    async def _deliver_report(self, report: ReportBuilder, name: str, send_plain, send_nodes, log_tag: str):
+        """
+        按长度决定以普通消息或合并转发发送报告。
+        报告块被惰性消费：只预读到超过转发阈值为止，其余部分在分页时按行边界打包，
+        超长报告会被拆成多条合并转发消息依次发送。
+        以普通消息发送时最多发送 MAX_PLAIN_MESSAGES 条，其余部分以摘要代替。
+        """
+        blocks = report.iter_blocks()
+        if self.settings.forward_threshold > 0:
+            head, exceeded = peek_length(blocks, self.settings.forward_threshold)
         else:
-            logger.info(f"[{group_id}] 消息长度未达阈值 ({total_length} <= {self.forward_threshold})，直接发送普通消息。")
+            head, exceeded = [], False
+
+        if not exceeded:
+            self.logs.log('send', logging.DEBUG, f"{log_tag} 消息长度未达阈值 ({self.settings.forward_threshold})，直接发送普通消息。")
+            if await self._send_plain_capped(pack_blocks(chain(head, blocks), PLAIN_CHAR_LIMIT), send_plain, log_tag):
+                self.logs.log('send', logging.DEBUG, f"{log_tag} 成功发送普通消息。")
+            return
+
+        self.logs.log('send', logging.DEBUG, f"{log_tag} 检测到长消息 (长度 > {self.settings.forward_threshold})，准备自动合并转发。")
+        pages = paginate(chain(head, blocks))
+        current = next(pages, None)
+        node_index = 0
+        message_count = 0
+        while current is not None:
+            upcoming = next(pages, None)
+            numbered = node_index > 0 or upcoming is not None or len(current) > 1
+            names = [f"{name} ({node_index + i + 1})" if numbered else name for i in range(len(current))]
             try:
-                await event.send(MessageChain([Comp.Plain(text)]))
-                logger.info(f"[{group_id}] 成功发送普通消息。")
+                with span("send:forward", nodes=len(current)):
+                    await send_nodes(current, names)
             except Exception as e:
-                logger.error(f"[{group_id}] 发送普通消息时出错: {e}", exc_info=True)
+                logger.error(f"{log_tag} 合并转发长消息时出错: {e}", exc_info=True)
+                # 回退为普通消息发送尚未发出的全部内容（同样受条数上限约束）
+                unsent = chain(current, upcoming or [], chain.from_iterable(pages))
+                await self._send_plain_capped(unsent, send_plain, log_tag)
+                logger.warning(f"{log_tag} 合并转发失败，已回退为普通消息发送剩余内容。")
+                return
+            node_index += len(current)
+            message_count += 1
+            current = upcoming
+        self.logs.log('send', logging.DEBUG, f"{log_tag} 成功发送 {message_count} 条合并转发消息，共 {node_index} 个节点。")
 
-    async def _perform_scheduled_check(self, group_id: int, auto_delete: bool):
-        """统一的定时检查函数，根据auto_delete决定是否删除。"""
-        log_prefix = "[定时任务-自动清理]" if auto_delete else "[定时任务-仅检查]"
-        report_title = "清理报告" if auto_delete else "检查报告"
-        
+    async def _send_or_forward(self, event: AstrMessageEvent, content: Union[str, ReportBuilder], name: str = "GroupFS"):
+        group_id = event.get_group_id()
+        report = content if isinstance(content, ReportBuilder) else ReportBuilder.from_text(content)
+
+        async def send_plain(text: str):
+            await event.send(MessageChain([Comp.Plain(text)]))
+
+        async def send_nodes(texts: List[str], names: List[str]):
+            forward_nodes = [
+                Node(uin=event.get_self_id(), name=node_name, content=[Plain(text)])
+                for text, node_name in zip(texts, names)
+            ]
+            await event.send(MessageChain([Nodes(nodes=forward_nodes)]))
+
+        await self._deliver_report(report, name, send_plain, send_nodes, f"[{group_id}]")
+
+    async def _send_report_to_group(self, bot, group_id: int, report: ReportBuilder, name: str = "GroupFS"):
+        """无事件上下文时（如定时任务）直接通过 API 向群发送报告。"""
+        self_id = None
+
+        async def send_plain(text: str):
+            await self.api.call('send_group_msg', group_id, client=bot, retry=False, message=text)
+
+        async def send_nodes(texts: List[str], names: List[str]):
+            nonlocal self_id
+            if self_id is None:
+                login_info = await self.api.call('get_login_info', client=bot)
+                self_id = str((login_info or {}).get('user_id', ''))
+            messages = [
+                {"type": "node", "data": {"name": node_name, "uin": self_id, "content": text}}
+                for text, node_name in zip(texts, names)
+            ]
+            await self.api.call('send_group_forward_msg', group_id, client=bot, retry=False, messages=messages)
+
+        await self._deliver_report(report, name, send_plain, send_nodes, f"[{group_id}]")
+
+    @staticmethod
+    def _event_notifier(event: AstrMessageEvent) -> Callable[[str], Awaitable]:
+        """长任务的进度推送目标：发起任务的会话。"""
+        async def notify(text: str):
+            await event.send(MessageChain([Comp.Plain(text)]))
+        return notify
+
+    async def _start_job_or_reply(self, event: AstrMessageEvent, key: str, title: str, group_id: int) -> Optional[Job]:
+        """
+        在指令处理中登记任务并返回它，由调用方传给后台任务；同一任务已在运行时回复其当前进度并返回 None，
+        避免重复触发加倍负载。检查与登记之间没有 await，两次并发的触发只有一次能登记成功。
+        """
+        running = self.jobs.get(key)
+        if running is None:
+            return self.jobs.start(key, title, group_id, self._event_notifier(event))
+        await event.send(MessageChain([Comp.Plain(f"⚠️ 该任务已在运行中，无需重复触发。\n{running.describe()}")]))
+        return None
+
+    def _format_file_entry(self, info: Dict, status: Optional[str] = None) -> str:
+        """失效文件报告中的单个条目（两行，不会被分页拆开）。"""
+        title = f"- {info.get('file_name')}" + (f" ({status})" if status else "")
+        folder_name = info.get('parent_folder_name', '未知')
+        modify_time = utils.format_timestamp(info.get('modify_time'))
+        return f"{title}\n  (文件夹: {folder_name} | 时间: {modify_time})"
+
+    async def _probe_scan(self, group_id: int, bot, kind: str, auto_delete: bool, log_prefix: str,
+                          resume: Optional[ScanCheckpoint] = None, budget_calls: int = 0,
+                          budget_seconds: int = 0, notify: Optional[Callable[[str], Awaitable]] = None,
+                          job: Optional[Job] = None) -> Optional[ScanResult]:
+        """
+        定时检查、/cf 与 /cdf 共用的失效文件扫描：逐个请求下载链接，retcode 1200 视为失效，
+        auto_delete 时立即删除。文件按失效可能性从高到低探测（见 prioritizer），
+        设置了 API 调用次数（探测与删除都计入）或时间预算时，预算用尽即停止。文件列表与进度定期写入检查点，
+        扫描被中断（重启、卸载、异常）后可从检查点继续。同一群同一类扫描同时只运行一个，重复触发时返回 None。
+        进度登记在 self.jobs 中（指令触发时由指令处理预先登记并传入 job），指定 notify 时定期推送。
+        """
+        key = f"{kind}_{group_id}"
+        if key in self.running_scans:
+            logger.warning(f"[{group_id}] {log_prefix} 已有同类扫描正在进行，本次跳过。")
+            return None
+        self.running_scans.add(key)
+        if job is None:
+            job = self.jobs.start(key, "失效文件清理" if auto_delete else "失效文件检查", group_id, notify)
         try:
-            if not self.bot:
-                logger.warning(f"[{group_id}] {log_prefix} 无法执行，因为尚未捕获到 bot 实例。请先触发任意一次指令。")
-                return
-            bot = self.bot
-            logger.info(f"[{group_id}] {log_prefix} 开始获取全量文件列表...")
-            all_files = await self._get_all_files_recursive_core(group_id, bot)
-            total_count = len(all_files)
-            logger.info(f"[{group_id}] {log_prefix} 获取到 {total_count} 个文件，准备分批检查。")
-            invalid_files_info = []
-            deleted_files = []
-            failed_deletions = []
-            
-            batch_size = 50
-            for i in range(0, total_count, batch_size):
-                batch = all_files[i:i + batch_size]
-                for file_info in batch:
-                    file_id = file_info.get("file_id")
+            if resume:
+                files = await asyncio.to_thread(self.checkpoints.load_files, key)
+                state = resume
+                logger.info(f"[{group_id}] {log_prefix} 从检查点继续扫描，进度 {state.cursor}/{len(files)}。")
+            else:
+                logger.info(f"[{group_id}] {log_prefix} 开始获取全量文件列表...")
+                job.set_phase("获取文件列表")
+                all_files = await self._get_all_files_recursive_core(group_id, bot)
+                # 按 file_id 去重，保证检查点中的游标与读回的文件列表一一对应
+                files = list({f['file_id']: f for f in all_files if f.get('file_id')}.values())
+                history = await asyncio.to_thread(load_history, self._probe_history_path(group_id))
+                files = order_for_probing(files, history, time.time())
+                state = ScanCheckpoint(
+                    key=key, kind=kind, group_id=group_id, auto_delete=auto_delete, started_at=time.time(),
+                    budget_calls=budget_calls, budget_seconds=budget_seconds,
+                )
+                await asyncio.to_thread(self.checkpoints.save_files, key, group_id, files)
+                await asyncio.to_thread(self.checkpoints.save, state)
+                budget_hint = ""
+                if budget_calls or budget_seconds:
+                    budget_hint = f" (预算: {budget_calls or '不限'} 次 / {budget_seconds or '不限'} 秒)"
+                logger.info(f"[{group_id}] {log_prefix} 获取到 {len(files)} 个文件，按失效可能性排序后开始检查{budget_hint}。")
+
+            total_count = len(files)
+            progress = self.logs.progress('probe', f"[{group_id}] {log_prefix}", total=total_count, done=state.cursor)
+            job.set_phase("探测文件链接", total=min(state.budget_calls, total_count) if state.budget_calls else total_count, done=state.cursor)
+            last_saved = time.monotonic()
+            segment_started = time.monotonic()
+            elapsed_before = state.elapsed_seconds
+            budget_exhausted = False
+            circuit_pauses = 0
+            try:
+                while state.cursor < total_count:
+                    state.elapsed_seconds = elapsed_before + time.monotonic() - segment_started
+                    if (state.budget_calls and state.api_calls >= state.budget_calls) or \
+                            (state.budget_seconds and state.elapsed_seconds >= state.budget_seconds):
+                        budget_exhausted = True
+                        logger.info(f"[{group_id}] {log_prefix} 扫描预算已用尽，已检查 {state.cursor}/{total_count} 个文件。")
+                        break
+                    file_info = files[state.cursor]
+                    file_id = file_info['file_id']
                     file_name = file_info.get("file_name", "未知文件名")
-                    if not file_id: continue
+                    outcome, error = "有效", None
                     try:
-                        await bot.api.call_action('get_group_file_url', group_id=group_id, file_id=file_id)
+                        state.api_calls += 1
+                        await self.api.call('get_group_file_url', group_id, fallback=bot, file_id=file_id)
+                        circuit_pauses = 0
+                    except CircuitOpenError as e:
+                        # 该群被熔断：保存检查点后暂停，恢复后从同一个文件继续；长时间不恢复则中断，下次启动从检查点继续
+                        state.api_calls -= 1
+                        circuit_pauses += 1
+                        await asyncio.to_thread(self.checkpoints.save, state)
+                        last_saved = time.monotonic()
+                        if circuit_pauses > self.MAX_CIRCUIT_PAUSES:
+                            raise
+                        logger.warning(f"[{group_id}] {log_prefix} 该群处于熔断状态，已保存检查点，暂停 {e.retry_after:.0f} 秒后继续 ({state.cursor}/{total_count})。")
+                        await asyncio.sleep(e.retry_after)
+                        continue
                     except ActionFailed as e:
-                        if e.result.get('retcode') == 1200:
-                            invalid_files_info.append(file_info)
+                        if e.result.get('retcode') != 1200:
+                            state.error_ids.append(file_id)
+                            outcome, error = "探测出错", e.result.get('wording') or str(e)
+                        else:
+                            state.invalid_ids.append(file_id)
+                            outcome = "失效"
                             if auto_delete:
-                                logger.warning(f"[{group_id}] {log_prefix} 发现失效文件 '{file_name}'，尝试删除...")
                                 try:
-                                    delete_result = await bot.api.call_action('delete_group_file', group_id=group_id, file_id=file_id)
+                                    state.api_calls += 1
+                                    delete_result = await self.api.call('delete_group_file', group_id, fallback=bot, file_id=file_id)
                                     is_success = False
                                     if delete_result and delete_result.get('transGroupFileResult', {}).get('result', {}).get('retCode') == 0:
                                         is_success = True
                                     if is_success:
-                                        logger.info(f"[{group_id}] {log_prefix} 成功删除失效文件: '{file_name}'")
-                                        deleted_files.append(file_name)
+                                        self.logs.log('delete', logging.DEBUG, f"[{group_id}] {log_prefix} 成功删除失效文件: '{file_name}'")
+                                        state.deleted_ids.append(file_id)
+                                        outcome = "失效并已删除"
                                     else:
                                         logger.error(f"[{group_id}] {log_prefix} 删除失效文件 '{file_name}' 失败，API未返回成功。")
-                                        failed_deletions.append(file_name)
+                                        state.failed_deletions.append(file_name)
                                 except Exception as del_e:
                                     logger.error(f"[{group_id}] {log_prefix} 删除失效文件 '{file_name}' 时发生异常: {del_e}")
-                                    failed_deletions.append(file_name)
+                                    state.failed_deletions.append(file_name)
+                    state.cursor += 1
+                    progress.step(outcome, file_name, error=error)
+                    job.advance()
+                    if time.monotonic() - last_saved >= self.settings.scan_checkpoint_seconds:
+                        await asyncio.to_thread(self.checkpoints.save, state)
+                        last_saved = time.monotonic()
                     await asyncio.sleep(0.2)
-            
+            except BaseException:
+                # 被取消或出错时同步落盘，确保下次启动能从这里继续
+                self.checkpoints.save(state)
+                logger.info(f"[{group_id}] {log_prefix} 扫描中断，已保存检查点 ({state.cursor}/{total_count})。")
+                raise
+
+            progress.finish("预算用尽" if budget_exhausted else "")
+            await asyncio.to_thread(self.checkpoints.discard, key)
+            deleted_file_ids = set(state.deleted_ids)
+            if deleted_file_ids:
+                self._invalidate_listing(group_id, deleted_file_ids)
+            invalid_ids = set(state.invalid_ids)
+            await asyncio.to_thread(self._update_probe_history, group_id, files, state)
+            return ScanResult(
+                total_count=total_count,
+                invalid_files=[f for f in files if f['file_id'] in invalid_ids],
+                deleted_file_ids=deleted_file_ids,
+                failed_deletions=state.failed_deletions,
+                checked_count=state.cursor,
+                budget_exhausted=budget_exhausted,
+            )
+        finally:
+            self.running_scans.discard(key)
+            self.jobs.finish(job)
+
+    def _probe_history_path(self, group_id: int) -> str:
+        return os.path.join(self.plugin_data_dir, 'probe_history', f"{group_id}.json")
+
+    def _update_probe_history(self, group_id: int, files: List[Dict], state: ScanCheckpoint):
+        """记录本次探测结果，供下次扫描排序；已不在群里的文件从历史中移除。"""
+        path = self._probe_history_path(group_id)
+        history = load_history(path)
+        now = time.time()
+        invalid_ids, error_ids = set(state.invalid_ids), set(state.error_ids)
+        for file_info in files[:state.cursor]:
+            file_id = file_info['file_id']
+            if file_id in error_ids:
+                continue
+            history[file_id] = (now, file_id not in invalid_ids)
+        current_ids = {f['file_id'] for f in files} - set(state.deleted_ids)
+        save_history(path, {file_id: entry for file_id, entry in history.items() if file_id in current_ids})
+
+    async def _run_scheduled_job(self, job_id: str, group_id: int):
+        """定时任务入口：先记录本次执行时间，供重启后判断是否错过了执行。"""
+        last_runs = await asyncio.to_thread(load_last_runs, self.schedule_state_path)
+        last_runs[job_id] = time.time()
+        await asyncio.to_thread(save_last_runs, self.schedule_state_path, last_runs)
+        await self._perform_scheduled_check(
+            group_id, self.settings.scheduled_autodelete,
+            budget_calls=self.settings.scheduled_scan_budget_calls,
+            budget_seconds=self.settings.scheduled_scan_budget_seconds,
+        )
+
+    @traced("scheduled_check")
+    async def _perform_scheduled_check(self, group_id: int, auto_delete: bool, resume: Optional[ScanCheckpoint] = None,
+                                       budget_calls: int = 0, budget_seconds: int = 0,
+                                       notify: Optional[Callable[[str], Awaitable]] = None, job: Optional[Job] = None):
+        """统一的定时检查函数，根据auto_delete决定是否删除。job 为指令处理预先登记的任务。"""
+        log_prefix = "[定时任务-自动清理]" if auto_delete else "[定时任务-仅检查]"
+        report_title = "清理报告" if auto_delete else "检查报告"
+        
+        try:
+            if not self.bot:
+                logger.warning(f"[{group_id}] {log_prefix} 无法执行，因为尚未捕获到 bot 实例。请先触发任意一次指令。")
+                return
+            bot = self.bot
+            result = await self._probe_scan(group_id, bot, "check", auto_delete, log_prefix, resume, budget_calls, budget_seconds, notify, job)
+            if result is None:
+                return
+            total_count = result.total_count
+            invalid_files_info = result.invalid_files
+            deleted_file_ids = result.deleted_file_ids
+            failed_deletions = result.failed_deletions
+
             if not invalid_files_info:
                 logger.info(f"[{group_id}] {log_prefix} 检查完成，未发现失效文件。")
                 return 
 
-            report_message = f"🚨 {report_title}\n在 {total_count} 个群文件中，"
-            report_message += f"共发现 {len(invalid_files_info)} 个失效文件。\n"
+            report = ReportBuilder(f"🚨 {report_title}")
+            if result.budget_exhausted:
+                report.add_line(f"按失效可能性优先检查了 {result.checked_count}/{total_count} 个群文件（扫描预算已用尽），共发现 {len(invalid_files_info)} 个失效文件。")
+            else:
+                report.add_line(f"在 {total_count} 个群文件中，共发现 {len(invalid_files_info)} 个失效文件。")
+            report.add_line()
             
             if auto_delete:
-                report_message += f"\n- 成功删除: {len(deleted_files)} 个"
+                report.add_line(f"- 成功删除: {len(deleted_file_ids)} 个")
                 if failed_deletions:
-                    report_message += f"\n- 删除失败: {len(failed_deletions)} 个"
-                if not deleted_files and not failed_deletions:
-                     report_message += f"但未成功删除任何文件。"
-                
-                report_message += "\n" + "-" * 20
-                for info in invalid_files_info:
-                    status = "已删除" if info.get('file_name') in deleted_files else "删除失败"
-                    folder_name = info.get('parent_folder_name', '未知')
-                    modify_time = utils.format_timestamp(info.get('modify_time'))
-                    report_message += f"\n- {info.get('file_name')} ({status})"
-                    report_message += f"\n  (文件夹: {folder_name} | 时间: {modify_time})"
+                    report.add_line(f"- 删除失败: {len(failed_deletions)} 个")
+                if not deleted_file_ids and not failed_deletions:
+                    report.add_line("但未成功删除任何文件。")
+                report.add_separator()
+                report.add_entries(
+                    self._format_file_entry(info, "已删除" if info.get('file_id') in deleted_file_ids else "删除失败")
+                    for info in invalid_files_info
+                )
             else:
-                report_message += "\n" + "-" * 20
-                for info in invalid_files_info:
-                    folder_name = info.get('parent_folder_name', '未知')
-                    modify_time = utils.format_timestamp(info.get('modify_time'))
-                    report_message += f"\n- {info.get('file_name')}"
-                    report_message += f"\n  (文件夹: {folder_name} | 时间: {modify_time})"
-                report_message += "\n" + "-" * 20
-                report_message += "\n建议管理员使用 /cdf 指令进行一键清理。"
+                report.add_separator()
+                report.add_entries(self._format_file_entry(info) for info in invalid_files_info)
+                report.add_separator()
+                report.add_line("建议管理员使用 /cdf 指令进行一键清理。")
             
             logger.info(f"[{group_id}] {log_prefix} 检查全部完成，准备发送报告。")
             if self.bot:
-                await self.bot.api.call_action('send_group_msg', group_id=group_id, message=report_message)
+                await self._send_report_to_group(self.bot, group_id, report, name=f"失效文件{report_title}")
         except Exception as e:
             logger.error(f"[{group_id}] {log_prefix} 执行过程中发生未知异常: {e}", exc_info=True)
             if self.bot:
-                await self.bot.api.call_action('send_group_msg', group_id=group_id, message="❌ 定时任务执行过程中发生内部错误，请检查后台日志。")
+                await self.api.call('send_group_msg', group_id, client=self.bot, retry=False, message="❌ 定时任务执行过程中发生内部错误，请检查后台日志。")
+        finally:
+            # 扫描未能开始（如 bot 不可用）时也要注销预先登记的任务
+            if job:
+                self.jobs.finish(job)
+
+
+    async def _get_all_files_with_path(self, group_id: int, bot) -> List[FileRecord]:
+        """
+        获取群内所有文件（含相对路径）。同一群的并发请求共享同一次遍历，
+        结果在 listing_cache_seconds 内复用。返回的列表被多个调用方共享，不要原地修改。
+        """
+        return await self.listing_flight.do(group_id, lambda: self._walk_group_files(group_id, bot))
+
+    def _invalidate_listing(self, group_id: int, deleted_file_ids: Iterable[str] = ()):
+        """群文件发生变化（如删除）后作废缓存的文件列表，以及引用了已删除文件的搜索会话。"""
+        self.listing_flight.invalidate(group_id)
+        self.listing_streams.invalidate(group_id)
+        self.file_indexes.pop(group_id, None)
+        self.search_sessions.invalidate_files(group_id, deleted_file_ids)
 
+    def _stream_group_files(self, group_id: int, bot) -> AsyncIterator[List[FileRecord]]:
+        """
+        订阅该群共享的流式遍历：已有遍历在进行时重放其已取得的页并跟随后续页，否则发起新的遍历。
+        遍历完整结束后把结果放入 listing_flight，供之后的全量请求复用。
+        """
+        def on_complete(pages: List[List[FileRecord]]):
+            # 全量请求自己也在等待这次遍历时，由它缓存结果，避免产生两个不同的列表对象
+            if not self.listing_flight.in_flight(group_id):
+                self.listing_flight.put(group_id, list(chain.from_iterable(pages)))
 
-    async def _get_all_files_with_path(self, group_id: int, bot) -> List[Dict]:
+        return self.listing_streams.subscribe(group_id, lambda: self._iter_group_files(group_id, bot), on_complete)
+
+    async def _walk_group_files(self, group_id: int, bot) -> List[FileRecord]:
         """递归获取所有文件，并计算其在备份目录中的相对路径。"""
         all_files = []
+        with span("traversal", group_id=group_id) as trace_span:
+            async for page in self._stream_group_files(group_id, bot):
+                all_files.extend(page)
+            if trace_span:
+                trace_span.set(files=len(all_files))
+        return all_files
+
+    async def _call_pausing_when_open(self, action: str, group_id: int, **kwargs) -> Any:
+        """该群被熔断时等到可以试探再继续，而不是让遍历中途失败；连续暂停过多次则抛出 CircuitOpenError。"""
+        for pause in range(self.MAX_CIRCUIT_PAUSES + 1):
+            try:
+                return await self.api.call(action, group_id, **kwargs)
+            except CircuitOpenError as e:
+                if pause >= self.MAX_CIRCUIT_PAUSES:
+                    raise
+                logger.warning(f"[{group_id}] 调用 {action} 时该群处于熔断状态，暂停 {e.retry_after:.0f} 秒后继续。")
+                await asyncio.sleep(e.retry_after)
+
+    async def _fetch_folder_page(self, group_id: int, bot, folder_id: Optional[str], **params) -> Optional[Dict]:
+        if folder_id is None or folder_id == '/':
+            return await self._call_pausing_when_open('get_group_root_files', group_id, fallback=bot, **params)
+        return await self._call_pausing_when_open('get_group_files_by_folder', group_id, fallback=bot, folder_id=folder_id, **params)
+
+    async def _iter_folder_pages(self, group_id: int, bot, folder_id: Optional[str]) -> AsyncIterator[tuple[List[Dict], List[Dict]]]:
+        """
+        分页读取一个文件夹，逐页产出 (文件列表, 子文件夹列表)。
+        页满时用 start_index 请求下一页。start_index 不是 OneBot 标准参数：若后端忽略它（第二页重复返回已见条目），
+        记下该群不支持分页，本文件夹与之后的所有文件夹都改为一次请求 MAX_FOLDER_PAGE_SIZE 条。
+        """
+        page_size = self.settings.listing_page_size
+        start_index = 0
+        seen = set()
+        while True:
+            unpaged = group_id in self.unpaged_groups
+            params = {'file_count': self.MAX_FOLDER_PAGE_SIZE if unpaged else page_size}
+            if start_index:
+                params['start_index'] = start_index
+            result = await self._fetch_folder_page(group_id, bot, folder_id, **params)
+            if not result:
+                return
+
+            files = result.get('files') or []
+            folders = result.get('folders') or []
+            entry_count = len(files) + len(folders)
+            new_files = [f for f in files if f.get('file_id') not in seen]
+            new_folders = [f for f in folders if f.get('folder_id') not in seen]
+            seen.update(f.get('file_id') for f in new_files)
+            seen.update(f.get('folder_id') for f in new_folders)
+
+            if start_index and not new_files and not new_folders:
+                logger.info(f"[{group_id}-群文件遍历] 后端不支持 start_index 分页，本群改为整个文件夹一次读取。")
+                self.unpaged_groups.add(group_id)
+                start_index = 0
+                continue
+
+            yield new_files, new_folders
+            if unpaged:
+                if entry_count >= self.MAX_FOLDER_PAGE_SIZE:
+                    logger.warning(f"[{group_id}-群文件遍历] 文件夹条目超过 {self.MAX_FOLDER_PAGE_SIZE} 且后端不支持分页，结果可能不完整。")
+                return
+            if entry_count < page_size:
+                return
+            start_index += entry_count
+
+    async def _iter_group_files(self, group_id: int, bot) -> AsyncIterator[List[FileRecord]]:
+        """
+        以异步生成器形式遍历群文件：每取得一页就产出该页的文件记录，
+        调用方可以边遍历边处理、随时停止，无需等待或保存整个列表。
+        """
+        failed_folders = []
+        progress = self.logs.progress('traversal', f"[{group_id}-群文件遍历]")
         # 结构: (folder_id, folder_name, relative_path)
-        folders_to_scan = [(None, "根目录", "")] 
+        folders_to_scan = deque([(None, "根目录", "")])
         while folders_to_scan:
-            current_folder_id, current_folder_name, current_relative_path = folders_to_scan.pop(0)
-            
+            current_folder_id, current_folder_name, current_relative_path = folders_to_scan.popleft()
+            progress.note("文件夹")
             try:
-                if current_folder_id is None or current_folder_id == '/':
-                    result = await bot.api.call_action('get_group_root_files', group_id=group_id, file_count=2000)
-                else:
-                    result = await bot.api.call_action('get_group_files_by_folder', group_id=group_id, folder_id=current_folder_id, file_count=2000)
-                
-                if not result: continue
-                
-                if result.get('files'):
-                    for file_info in result['files']:
-                        file_info['relative_path'] = os.path.join(current_relative_path, file_info.get('file_name', ''))
-                        file_info['size'] = file_info.get('size', 0) # 确保有 size 字段
-                        all_files.append(file_info)
-                        
-                if result.get('folders'):
-                    for folder in result['folders']:
+                async for files, folders in self._iter_folder_pages(group_id, bot, current_folder_id):
+                    # 转为紧凑记录，同一文件夹的记录共享 current_relative_path 这一个字符串
+                    records = [FileRecord.from_api(file_info, current_relative_path, current_folder_id or '/') for file_info in files]
+                    for folder in folders:
                         if folder_id := folder.get('folder_id'):
                             new_relative_path = os.path.join(current_relative_path, folder.get('folder_name', ''))
                             folders_to_scan.append((folder_id, folder.get('folder_name', ''), new_relative_path))
-                            
+                    if records:
+                        progress.step("文件", current_folder_name, count=len(records))
+                        yield records
+            except CircuitOpenError:
+                # 熔断长时间不恢复时中止整个遍历，不返回缺失大量文件夹的结果
+                progress.finish("熔断中止")
+                raise
             except Exception as e:
-                logger.error(f"[{group_id}-群文件遍历] 递归获取文件夹 '{current_folder_name}' 内容时出错: {e}")
+                logger.error(f"[{group_id}-群文件遍历] 递归获取文件夹 '{current_folder_name}' 内容时出错 (已重试): {e}")
+                failed_folders.append(current_folder_name)
                 continue
-        return all_files
+        progress.finish(f"{len(failed_folders)} 个文件夹获取失败" if failed_folders else "")
+        if failed_folders:
+            logger.warning(f"[{group_id}-群文件遍历] 有 {len(failed_folders)} 个文件夹获取失败，结果可能不完整: {failed_folders}")
         
-    async def _get_all_files_recursive_core(self, group_id: int, bot) -> List[Dict]:
+    async def _get_all_files_recursive_core(self, group_id: int, bot) -> List[FileRecord]:
         """
-        兼容 /cdf, /cf, /sf, /df 等指令。
+        兼容 /cdf, /cf, /sf, /df 等指令。返回的是 FileRecord，relative_path 与 parent_folder_name 按需计算。
         """
-        all_files_with_path = await self._get_all_files_with_path(group_id, bot)
-        for file_info in all_files_with_path:
-            path_parts = file_info.get('relative_path', '').split(os.path.sep)
-            file_info['parent_folder_name'] = os.path.sep.join(path_parts[:-1]) if len(path_parts) > 1 else '根目录'
-        return all_files_with_path
-    
-    async def _download_and_save_file(self, group_id: int, file_id: str, file_name: str, file_size: int, relative_path: str, root_dir: str, client) -> bool:
+        return await self._get_all_files_with_path(group_id, bot)
+
+    @staticmethod
+    def _match_file_name(file_info: Dict, terms: List[str]) -> bool:
+        return all(match_name(file_info, term) for term in terms)
+
+    @staticmethod
+    def _parse_search_args(message: str, allow_page: bool) -> tuple[str, Optional[str], Optional[str]]:
+        """
+        把 /sf、/df 的参数拆成 (查询, 序号, 页码)。查询可以由多个词与条件组成，
+        末尾的 p<页码> 与其前的数字依次视为页码与序号；查询本身至少保留一个词。
+        """
+        tokens = message.split()[1:]
+        page_str = None
+        if allow_page and len(tokens) >= 3 and tokens[-1][:1].lower() == 'p' and tokens[-2].isdigit():
+            page_str = tokens.pop()
+        index_str = tokens.pop() if len(tokens) >= 2 and tokens[-1].isdigit() else None
+        return " ".join(tokens), index_str, page_str
+
+    async def _get_file_index(self, group_id: int, bot) -> FileIndex:
+        """
+        取得该群的字段索引。索引独立缓存 search_index_ttl_seconds 秒，期间的结构化查询不再遍历群文件；
+        删除、重命名、移动与检测到上传时作废。过期后基于（可能仍在复用期内的）文件列表重建。
+        """
+        cached = self.file_indexes.get(group_id)
+        if cached and time.monotonic() - cached[0] <= self.settings.search_index_ttl_seconds:
+            return cached[1]
+        all_files = await self._get_all_files_recursive_core(group_id, bot)
+        if cached and cached[1].files is all_files:
+            index = cached[1]
+        else:
+            started = time.perf_counter()
+            index = await asyncio.to_thread(FileIndex, all_files)
+            logger.debug(f"[{group_id}] 已为 {len(all_files)} 个文件建立搜索索引，耗时 {(time.perf_counter() - started) * 1000:.0f}ms。")
+        self.file_indexes[group_id] = (time.monotonic(), index)
+        return index
+
+    async def _search_files(self, event: AstrMessageEvent, search_term: str, stop_after: Optional[int] = None,
+                            early_reply: bool = False) -> tuple[List[Dict], int, bool]:
+        """
+        按查询搜索（语法见 query.parse_query）。该用户对同一查询有未过期的搜索会话时直接复用其结果（不遍历，序号不变）；
+        含 uploader:、size>、ext: 等条件的结构化查询在完整文件列表的字段索引上求值；
+        仅含文件名时，若已有可复用或正在进行的全量遍历，使用其结果；
+        否则订阅该群共享的流式遍历（并发的搜索共用同一次遍历）：找到 stop_after 个匹配即停止，
+        early_reply 时在遍历耗时较长后先发送已有匹配。
+        查询语法错误时抛出 QueryError。
+        完整扫描得到的结果会保存为该用户的搜索会话。
+        返回 (匹配的文件, 已扫描的文件数, 是否完整扫描)。
+        """
+        group_id = int(event.get_group_id())
+        user_id = int(event.get_sender_id())
+        session = self.search_sessions.get(group_id, user_id, search_term)
+        if session is not None:
+            logger.debug(f"[{group_id}] 复用用户 {user_id} 的搜索会话「{search_term}」({len(session.files)} 个结果)。")
+            return session.files, 0, True
+
+        query = parse_query(search_term)
+        if query.is_structured:
+            index = await self._get_file_index(group_id, event.bot)
+            found_files = index.search(query)
+            self.search_sessions.put(group_id, user_id, search_term, found_files)
+            return found_files, len(index.files), True
+
+        found_files, scanned, complete = await self._scan_for_matches(event, query.terms, stop_after, early_reply)
+        if complete:
+            self.search_sessions.put(group_id, user_id, search_term, found_files)
+        return found_files, scanned, complete
+
+    async def _scan_for_matches(self, event: AstrMessageEvent, terms: List[str], stop_after: Optional[int],
+                                early_reply: bool) -> tuple[List[Dict], int, bool]:
+        group_id = int(event.get_group_id())
+        if self.listing_flight.peek(group_id) is not None or self.listing_flight.in_flight(group_id):
+            all_files = await self._get_all_files_recursive_core(group_id, event.bot)
+            return [f for f in all_files if self._match_file_name(f, terms)], len(all_files), True
+
+        found_files: List[Dict] = []
+        scanned = 0
+        started = time.monotonic()
+        early_sent = not early_reply or self.settings.search_early_reply_seconds <= 0
+        walker = self._stream_group_files(group_id, event.bot)
+        try:
+            async for page in walker:
+                scanned += len(page)
+                found_files.extend(f for f in page if self._match_file_name(f, terms))
+                if stop_after and len(found_files) >= stop_after:
+                    return found_files, scanned, False
+                if not early_sent and found_files and time.monotonic() - started >= self.settings.search_early_reply_seconds:
+                    early_sent = True
+                    report = ReportBuilder(f"⏳ 搜索仍在进行中，已在 {scanned} 个文件中找到 {len(found_files)} 个匹配：")
+                    report.add_entries(f"[{i}] {f.get('file_name')}" for i, f in enumerate(found_files, 1))
+                    report.add_line("完整结果将在遍历结束后发送，序号保持不变。")
+                    await self._send_or_forward(event, report, name="文件搜索结果 (部分)")
+        finally:
+            await walker.aclose()
+        return found_files, scanned, True
+
+    async def _download_and_save_file(self, group_id: int, file_id: str, file_name: str, file_size: int, relative_path: str, root_dir: str, client,
+                                      priority: int = PRIORITY_BULK, overwrite: bool = False) -> bool:
+        """下载一个群文件到 root_dir/relative_path。overwrite 为 False 时大小一致的已有文件视为已下载。"""
         log_prefix = f"[群文件备份-{group_id}-下载]"
         target_path = os.path.join(root_dir, relative_path)
         os.makedirs(os.path.dirname(target_path), exist_ok=True)
 
-        if os.path.exists(target_path):
+        if not overwrite and os.path.exists(target_path):
             try:
                 # 检查已存在文件的大小是否与目标文件大小匹配
                 existing_size = os.path.getsize(target_path)
                 if existing_size == file_size:
-                    logger.info(f"{log_prefix} 文件 '{file_name}' 已存在 ({utils.format_bytes(file_size)})，跳过下载。")
+                    self.logs.log('download', logging.DEBUG, f"{log_prefix} 文件 '{file_name}' 已存在 ({utils.format_bytes(file_size)})，跳过下载。")
                     return True
                 else:
                     logger.warning(f"{log_prefix} 文件 '{file_name}' 存在但大小不匹配 ({utils.format_bytes(existing_size)} != {utils.format_bytes(file_size)})，重新下载。")
@@ -322,26 +850,29 @@ class GroupFSPlugin(Star):
 
         try:
             # 1. 获取下载链接
-            url_result = await client.api.call_action('get_group_file_url', group_id=group_id, file_id=file_id)
+            url_result = await self.api.call('get_group_file_url', group_id, fallback=client, file_id=file_id)
             if not (url_result and url_result.get('url')):
                 logger.error(f"{log_prefix} 无法获取文件 '{file_name}' 的下载链接或文件已失效。")
                 return False
             url = url_result['url']
 
-            # 2. 下载文件，使用信号量控制并发
-            async with aiohttp.ClientSession() as session:
-                async with self.download_semaphore:
-                    async with session.get(url, timeout=60) as resp:
-                        if resp.status != 200:
-                            logger.error(f"{log_prefix} 下载文件 '{file_name}' 失败 (HTTP: {resp.status})。")
-                            return False
-                        
-                        # 3. 写入文件，注意捕获 OS 异常（如磁盘空间不足）
-                        with open(target_path, 'wb') as f:
-                            async for chunk in resp.content.iter_chunked(8192):
-                                f.write(chunk)
+            # 2. 下载文件，由下载调度器按优先级分配名额并限速
+            import aiohttp
+            with span("download", file=file_name, size=file_size, priority=priority):
+                async with aiohttp.ClientSession() as session:
+                    async with self.downloads.slot(priority, group_id):
+                        async with session.get(url, timeout=60) as resp:
+                            if resp.status != 200:
+                                logger.error(f"{log_prefix} 下载文件 '{file_name}' 失败 (HTTP: {resp.status})。")
+                                return False
+
+                            # 3. 缓冲后在线程中写入临时文件，完成后原子替换；注意捕获 OS 异常（如磁盘空间不足）
+                            async with AtomicStreamWriter(target_path, fsync=self.settings.download_fsync) as writer:
+                                async for chunk in resp.content.iter_chunked(65536):
+                                    await writer.write(chunk)
+                                    await self.downloads.throttle(len(chunk), priority)
             
-            logger.info(f"{log_prefix} 成功下载文件 '{file_name}' ({utils.format_bytes(file_size)}) 到: {target_path}")
+            self.logs.log('download', logging.DEBUG, f"{log_prefix} 成功下载文件 '{file_name}' ({utils.format_bytes(file_size)}) 到: {target_path}")
             return True
         except FileNotFoundError:
             logger.error(f"{log_prefix} 创建目标文件路径失败 (FileNotFoundError)，可能目录创建失败。")
@@ -353,37 +884,12 @@ class GroupFSPlugin(Star):
             logger.error(f"{log_prefix} 下载文件 '{file_name}' 时发生未知异常: {e}", exc_info=True)
             return False
 
-    async def _cleanup_backup_temp(self, backup_dir: str, zip_path: Optional[str]):
-        """异步清理备份目录和生成的 ZIP 文件。"""
-        try:
-            await asyncio.sleep(600)  # 等待10分钟后再清理
-            if os.path.exists(backup_dir):
-                for dirpath, dirnames, filenames in os.walk(backup_dir, topdown=False):
-                    for filename in filenames:
-                        os.remove(os.path.join(dirpath, filename))
-                    for dirname in dirnames:
-                        os.rmdir(os.path.join(dirpath, dirname))
-                os.rmdir(backup_dir)
-                logger.info(f"[群文件备份-清理] 已清理临时目录: {backup_dir}")
-            
-            await asyncio.sleep(5)
-
-            # 删除生成的 ZIP 文件
-            if zip_path and os.path.exists(os.path.dirname(zip_path)):
-                zip_base_name_no_ext = os.path.basename(zip_path).rsplit('.zip', 1)[0]
-                temp_base_dir = os.path.dirname(zip_path)
-                
-                # 遍历所有可能的分卷文件并删除
-                for f in os.listdir(temp_base_dir):
-                    if f.startswith(zip_base_name_no_ext):
-                         file_to_delete = os.path.join(temp_base_dir, f)
-                         os.remove(file_to_delete)
-                         logger.info(f"[群文件备份-清理] 已清理生成的压缩包/分卷: {f}")
-
-        except OSError as e:
-            logger.warning(f"[群文件备份-清理] 删除临时文件或目录失败: {e}")
-
-    async def _upload_and_send_file_via_api(self, event: AstrMessageEvent, file_path: str, file_name: str) -> bool:
+    async def _upload_and_send_file_via_api(self, event: AstrMessageEvent, file_path: str, file_name: str) -> str:
+        """
+        上传并发送一个文件，返回 UPLOAD_OK、UPLOAD_FAILED（调用异常或超时，可以重试）
+        或 UPLOAD_REJECTED（NTQQ 明确拒绝，retcode 1200，重试无益）。
+        无返回值或其他 retcode 时文件大概率已在后台提交，视为成功。
+        """
         log_prefix = f"[群文件备份-上传/发送]"
         client = self.bot or event.client
         target_id = int(event.get_sender_id())
@@ -397,165 +903,177 @@ class GroupFSPlugin(Star):
             if group_id_str:
                 target_group_id = int(group_id_str)
                 logger.info(f"{log_prefix} 调用 /upload_group_file 上传文件到群 {target_group_id}")
-                upload_result = await client.api.call_action('upload_group_file', 
-                                                             group_id=target_group_id,
-                                                             file=file_uri,
-                                                             name=file_name,
-                                                             folder_id='/',
-                                                             timeout=300)
+                upload_result = await self.api.call('upload_group_file', 
+                                                    target_group_id,
+                                                    client=client,
+                                                    retry=False,
+                                                    file=file_uri,
+                                                    name=file_name,
+                                                    folder_id='/',
+                                                    timeout=300)
                 
             else:
                 logger.info(f"{log_prefix} 调用 /upload_private_file 上传文件到私聊 {target_id}")
-                upload_result = await client.api.call_action('upload_private_file', 
-                                                             user_id=target_id,
-                                                             file=file_uri,
-                                                             name=file_name,
-                                                             timeout=300)
+                upload_result = await self.api.call('upload_private_file', 
+                                                    client=client,
+                                                    retry=False,
+                                                    user_id=target_id,
+                                                    file=file_uri,
+                                                    name=file_name,
+                                                    timeout=300)
 
             # 2. 检查 upload_result 是否为 None
             if upload_result is None:
                  logger.warning(f"{log_prefix} 文件 {file_name} 上传时 API 调用返回 NONE。根据测试经验，文件可能已在后台提交。")
-                 return True # 视为成功并继续下一个分卷
+                 return UPLOAD_OK # 视为成功，不重试以免重复上传
             
             # 3. 检查 API 响应状态：status='ok' 且 retcode=0 (正常成功)
             if upload_result.get('status') == 'ok' and upload_result.get('retcode') == 0:
                 logger.info(f"{log_prefix} 文件 {file_name} 上传调用成功。")
-                return True
+                return UPLOAD_OK
             
             # 4. 处理 API 明确返回失败状态
-            else:
-                error_msg = upload_result.get('wording', upload_result.get('errMsg', 'API返回失败'))
-                
-                # 如果返回的错误是 NTQQ 的 "rich media transfer failed" (retcode=1200)
-                if upload_result.get('retcode') == 1200:
-                    logger.error(f"{log_prefix} 文件 {file_name} 上传失败 (NTQQ内部拒绝: {error_msg})。视为致命失败，中断任务。")
-                    # 客户端拒绝，返回 False
-                    return False
-                else:
-                    # 其他非 1200 的失败码
-                    logger.warning(f"{log_prefix} 文件 {file_name} 上传失败 (retcode {upload_result.get('retcode')}). 详情: {error_msg}。容忍并继续。")
-                    return True
+            error_msg = upload_result.get('wording', upload_result.get('errMsg', 'API返回失败'))
+            # 如果返回的错误是 NTQQ 的 "rich media transfer failed" (retcode=1200)
+            if upload_result.get('retcode') == 1200:
+                logger.error(f"{log_prefix} 文件 {file_name} 上传失败 (NTQQ内部拒绝: {error_msg})。")
+                return UPLOAD_REJECTED
+            # 其他非 1200 的失败码
+            logger.warning(f"{log_prefix} 文件 {file_name} 上传失败 (retcode {upload_result.get('retcode')}). 详情: {error_msg}。容忍并继续。")
+            return UPLOAD_OK
 
         except ActionFailed as e:
             # 捕获 ActionFailed
+            if e.result.get('retcode') == 1200:
+                logger.error(f"{log_prefix} 文件 {file_name} 上传失败 (NTQQ内部拒绝)。错误: {e}")
+                return UPLOAD_REJECTED
             logger.warning(f"{log_prefix} 文件 {file_name} 上传时发生 ActionFailed (网络中断/超时)。错误: {e}")
-            return False # 视为失败，中断任务
+            return UPLOAD_FAILED
             
         except Exception as e:
             error_type = type(e).__name__
-            logger.warning(f"{log_prefix} 上传文件 {file_name} 时发生 Python 致命错误 ({error_type})。根据测试经验，文件可能已提交。错误: {e}", exc_info=True)
-            return False
+            logger.warning(f"{log_prefix} 上传文件 {file_name} 时发生 Python 致命错误 ({error_type})。错误: {e}", exc_info=True)
+            return UPLOAD_FAILED
 
     @filter.command("cdf")
+    @traced("/cdf")
     async def on_check_and_delete_command(self, event: AstrMessageEvent):
-        if not self.bot: self.bot = event.bot
+        self._register_bot(event)
         group_id = int(event.get_group_id())
         user_id = int(event.get_sender_id())
         logger.info(f"[{group_id}] 用户 {user_id} 触发 /cdf 失效文件清理指令。")
-        if user_id not in self.admin_users:
+        if user_id not in self.settings.admin_users:
             await event.send(MessageChain([Comp.Plain("⚠️ 您没有执行此操作的权限。")]))
             return
-        await event.send(MessageChain([Comp.Plain("⚠️ 警告：即将开始扫描并自动删除所有失效文件！\n此过程可能需要几分钟，请耐心等待，完成后将发送报告。")]))
-        self.active_tasks.append(asyncio.create_task(self._perform_batch_check_and_delete(event)))
+        budget_calls = self._parse_probe_budget(event.message_str)
+        if budget_calls is None:
+            await event.send(MessageChain([Comp.Plain("❌ 格式错误。用法: /cdf [最多 API 调用次数]")]))
+            return
+        job = await self._start_job_or_reply(event, f"cleanup_{group_id}", "失效文件清理", group_id)
+        if job is None:
+            return
+        await event.send(MessageChain([Comp.Plain("⚠️ 警告：即将开始扫描并自动删除所有失效文件！\n此过程可能需要几分钟，期间会定期发送进度，也可使用 /gfj 查询，完成后将发送报告。")]))
+        self.active_tasks.append(asyncio.create_task(self._perform_batch_check_and_delete(event, budget_calls=budget_calls, job=job)))
         event.stop_event()
 
-    async def _perform_batch_check_and_delete(self, event: AstrMessageEvent):
-        group_id = int(event.get_group_id())
+    @traced("batch_check")
+    async def _perform_batch_check_and_delete(self, event: Optional[AstrMessageEvent], resume: Optional[ScanCheckpoint] = None,
+                                              budget_calls: int = 0, job: Optional[Job] = None):
+        """/cdf 的后台任务。从检查点恢复时没有原始消息事件，报告改为直接发送到群里。job 为指令处理预先登记的任务。"""
+        group_id = int(event.get_group_id()) if event else resume.group_id
+        bot = event.bot if event else self.bot
         try:
-            logger.info(f"[{group_id}] [批量清理] 开始获取全量文件列表...")
-            all_files = await self._get_all_files_recursive_core(group_id, event.bot)
-            total_count = len(all_files)
-            logger.info(f"[{group_id}] [批量清理] 获取到 {total_count} 个文件，准备分批处理。")
-            deleted_files = []
-            failed_deletions = []
-            checked_count = 0
-            batch_size = 50
-            for i in range(0, total_count, batch_size):
-                batch = all_files[i:i + batch_size]
-                logger.info(f"[{group_id}] [批量清理] 正在处理批次 {i//batch_size + 1}/{ -(-total_count // batch_size)}...")
-                for file_info in batch:
-                    file_id = file_info.get("file_id")
-                    file_name = file_info.get("file_name", "未知文件名")
-                    if not file_id: continue
-                    is_invalid = False
-                    try:
-                        await event.bot.api.call_action('get_group_file_url', group_id=group_id, file_id=file_id)
-                    except ActionFailed as e:
-                        if e.result.get('retcode') == 1200:
-                            is_invalid = True
-                    if is_invalid:
-                        logger.warning(f"[{group_id}] [批量清理] 发现失效文件 '{file_name}'，尝试删除...")
-                        try:
-                            delete_result = await event.bot.api.call_action('delete_group_file', group_id=group_id, file_id=file_id)
-                            is_success = False
-                            if delete_result:
-                                trans_result = delete_result.get('transGroupFileResult', {})
-                                result_obj = trans_result.get('result', {})
-                                if result_obj.get('retCode') == 0:
-                                    is_success = True
-                            if is_success:
-                                logger.info(f"[{group_id}] [批量清理] 成功删除失效文件: '{file_name}'")
-                                deleted_files.append(file_name)
-                            else:
-                                logger.error(f"[{group_id}] [批量清理] 删除失效文件 '{file_name}' 失败，API未返回成功。")
-                                failed_deletions.append(file_name)
-                        except Exception as del_e:
-                            logger.error(f"[{group_id}] [批量清理] 删除失效文件 '{file_name}' 时发生异常: {del_e}")
-                            failed_deletions.append(file_name)
-                    checked_count += 1
-                    await asyncio.sleep(0.2)
-                logger.info(f"[{group_id}] [批量清理] 批次处理完毕，已检查 {checked_count}/{total_count} 个文件。")
-            report_message = f"✅ 清理完成！\n共扫描了 {total_count} 个文件。\n\n"
+            notify = self._event_notifier(event) if event else None
+            result = await self._probe_scan(group_id, bot, "cleanup", True, "[批量清理]", resume, budget_calls, notify=notify, job=job)
+            if result is None:
+                if event:
+                    await event.send(MessageChain([Comp.Plain("⚠️ 本群已有失效文件清理任务正在进行，请等待其完成。")]))
+                return
+            deleted_files = [f.get('file_name', '未知文件名') for f in result.invalid_files if f['file_id'] in result.deleted_file_ids]
+            failed_deletions = result.failed_deletions
+            report = ReportBuilder("✅ 清理完成！")
+            if result.budget_exhausted:
+                report.add_line(f"按失效可能性优先扫描了 {result.checked_count}/{result.total_count} 个文件（已达 API 调用上限）。")
+            else:
+                report.add_line(f"共扫描了 {result.total_count} 个文件。")
+            report.add_line()
             if deleted_files:
-                report_message += f"成功删除了 {len(deleted_files)} 个失效文件：\n"
-                report_message += "\n".join(f"- {name}" for name in deleted_files)
+                report.add_line(f"成功删除了 {len(deleted_files)} 个失效文件：")
+                report.add_entries(f"- {name}" for name in deleted_files)
             else:
-                report_message += "未发现或未成功删除任何失效文件。"
+                report.add_line("未发现或未成功删除任何失效文件。")
             if failed_deletions:
-                report_message += f"\n\n🚨 有 {len(failed_deletions)} 个失效文件删除失败，可能需要手动处理：\n"
-                report_message += "\n".join(f"- {name}" for name in failed_deletions)
+                report.add_line()
+                report.add_line(f"🚨 有 {len(failed_deletions)} 个失效文件删除失败，可能需要手动处理：")
+                report.add_entries(f"- {name}" for name in failed_deletions)
             logger.info(f"[{group_id}] [批量清理] 检查全部完成，准备发送报告。")
-            await self._send_or_forward(event, report_message, name="失效文件清理报告")
+            if event:
+                await self._send_or_forward(event, report, name="失效文件清理报告")
+            elif self.bot:
+                await self._send_report_to_group(self.bot, group_id, report, name="失效文件清理报告")
         except Exception as e:
             logger.error(f"[{group_id}] [批量清理] 执行过程中发生未知异常: {e}", exc_info=True)
-            await event.send(MessageChain([Comp.Plain("❌ 在执行批量清理时发生内部错误，请检查后台日志。")]))
+            if event:
+                await event.send(MessageChain([Comp.Plain("❌ 在执行批量清理时发生内部错误，请检查后台日志。")]))
+        finally:
+            if job:
+                self.jobs.finish(job)
+
+    @staticmethod
+    def _parse_probe_budget(message: str) -> Optional[int]:
+        """解析 /cf、/cdf 的可选参数：最多调用 API 的次数，探测与删除都计入 (0 或缺省为不限)。格式错误时返回 None。"""
+        parts = message.split()
+        if len(parts) < 2:
+            return 0
+        return int(parts[1]) if parts[1].isdigit() else None
 
     @filter.command("cf")
+    @traced("/cf")
     async def on_check_files_command(self, event: AstrMessageEvent):
-        if not self.bot: self.bot = event.bot
+        self._register_bot(event)
         group_id = int(event.get_group_id())
         user_id = int(event.get_sender_id())
-        if user_id not in self.admin_users:
+        if user_id not in self.settings.admin_users:
             await event.send(MessageChain([Comp.Plain("⚠️ 您没有执行此操作的权限。")]))
             return
         logger.info(f"[{group_id}] 用户 {user_id} 触发 /cf 失效文件检查指令。")
-        await event.send(MessageChain([Comp.Plain("✅ 已开始扫描群内所有文件，查找失效文件...\n这可能需要几分钟，请耐心等待。\n如果未发现失效文件，将不会发送任何消息。")]))
-        self.active_tasks.append(asyncio.create_task(self._perform_scheduled_check(group_id, False)))
+        budget_calls = self._parse_probe_budget(event.message_str)
+        if budget_calls is None:
+            await event.send(MessageChain([Comp.Plain("❌ 格式错误。用法: /cf [最多 API 调用次数]")]))
+            return
+        job = await self._start_job_or_reply(event, f"check_{group_id}", "失效文件检查", group_id)
+        if job is None:
+            return
+        await event.send(MessageChain([Comp.Plain("✅ 已开始扫描群内所有文件，查找失效文件...\n这可能需要几分钟，请耐心等待，期间会定期发送进度，也可使用 /gfj 查询。\n如果未发现失效文件，将不会发送任何消息。")]))
+        self.active_tasks.append(asyncio.create_task(self._perform_scheduled_check(
+            group_id, False, budget_calls=budget_calls, notify=self._event_notifier(event), job=job)))
         event.stop_event()
     
     @filter.event_message_type(filter.EventMessageType.GROUP_MESSAGE, priority=10)
     async def on_group_file_upload(self, event: AstrMessageEvent):
-        if not self.bot: self.bot = event.bot
+        self._register_bot(event)
         has_file = any(isinstance(seg, Comp.File) for seg in event.get_messages())
         if has_file:
             group_id = int(event.get_group_id())
+            # 群文件已变化，缓存的文件列表与搜索索引不再准确
+            self._invalidate_listing(group_id)
             logger.info(f"[{group_id}] 检测到文件上传事件，将在5秒后触发容量检查。")
             self.active_tasks.append(asyncio.create_task(self._check_storage_and_notify(event)))
 
     async def _check_storage_and_notify(self, event: AstrMessageEvent):
         group_id = int(event.get_group_id())
-        if group_id not in self.storage_limits:
+        if group_id not in self.settings.storage_limits:
             return
         try:
             client = event.bot
-            system_info = await client.api.call_action('get_group_file_system_info', group_id=group_id)
+            system_info = await self.api.call('get_group_file_system_info', group_id, fallback=client)
             if not system_info: return
             file_count = system_info.get('file_count', 0)
             used_space_bytes = system_info.get('used_space', 0)
             used_space_gb = float(utils.format_bytes(used_space_bytes, 'GB'))
-            limits = self.storage_limits[group_id]
-            count_limit = limits['count_limit']
-            space_limit = limits['space_limit_gb']
+            limits = self.settings.storage_limits[group_id]
+            count_limit = limits.count_limit
+            space_limit = limits.space_limit_gb
             notifications = []
             if file_count >= count_limit:
                 notifications.append(f"文件数量已达 {file_count}，接近或超过设定的 {count_limit} 上限！")
@@ -564,51 +1082,127 @@ class GroupFSPlugin(Star):
             if notifications:
                 full_notification = "⚠️ 群文件容量警告 ⚠️\n" + "\n".join(notifications) + "\n请及时清理文件！"
                 logger.warning(f"[{group_id}] 发送容量超限警告: {full_notification}")
-                await event.send(MessageChain([Comp.Plain(full_notification)]))
+                report = ReportBuilder.from_text(full_notification)
+                try:
+                    all_files = await self._get_all_files_recursive_core(group_id, client)
+                    stats = compute_storage_stats(all_files, top_n=5)
+                    report.add_line()
+                    report.add_line("💡 清理建议：")
+                    self._append_storage_sections(report, stats)
+                    report.add_line("使用 /sa 查看完整的空间占用分析。")
+                except Exception as e:
+                    logger.warning(f"[{group_id}] 生成清理建议失败，仅发送容量警告: {e}")
+                await self._send_or_forward(event, report, name="群文件容量警告")
         except ActionFailed as e:
             logger.error(f"[{group_id}] 调用 get_group_file_system_info 失败: {e}")
         except Exception as e:
             logger.error(f"[{group_id}] 处理容量检查时发生未知异常: {e}", exc_info=True)
     
-    def _format_search_results(self, files: List[Dict], search_term: str, for_delete: bool = False) -> str:
-        reply_text = f"🔍 找到了 {len(files)} 个与「{search_term}」相关的结果：\n"
-        reply_text += "-" * 20
-        for i, file_info in enumerate(files, 1):
-            reply_text += (
-                f"\n[{i}] {file_info.get('file_name')}"
-                f"\n  上传者: {file_info.get('uploader_name', '未知')}"
-                f"\n  大小: {utils.format_bytes(file_info.get('size'))}"
-                f"\n  修改时间: {utils.format_timestamp(file_info.get('modify_time'))}"
-            )
-        reply_text += "\n" + "-" * 20
+    def _append_storage_sections(self, report: ReportBuilder, stats: StorageStats):
+        """将空间占用统计追加到报告中。"""
+        def share(size: int) -> str:
+            return f"{size * 100 / stats.total_size:.1f}%" if stats.total_size else "0%"
+
+        report.add_separator()
+        report.add_line("📁 占用最多的文件夹：")
+        report.add_entries(
+            f"- {b.name}: {utils.format_bytes(b.total_size)} ({share(b.total_size)}, {b.count} 个文件)"
+            for b in stats.folders
+        )
+        report.add_line("📦 最大的文件：")
+        report.add_entries(
+            f"- {f.get('file_name')} ({utils.format_bytes(f.get('size'))}, 文件夹: {f.get('parent_folder_name', '根目录')})"
+            for f in stats.largest_files
+        )
+        report.add_line("🕰️ 最旧的文件：")
+        report.add_entries(
+            f"- {f.get('file_name')} ({utils.format_timestamp(f.get('modify_time'))}, {utils.format_bytes(f.get('size'))})"
+            for f in stats.oldest_files
+        )
+        report.add_line("👤 上传最多的成员：")
+        report.add_entries(
+            f"- {b.name}: {utils.format_bytes(b.total_size)} ({share(b.total_size)}, {b.count} 个文件)"
+            for b in stats.uploaders
+        )
+        report.add_separator()
+
+    @filter.command("sa")
+    @traced("/sa")
+    async def on_storage_analytics_command(self, event: AstrMessageEvent):
+        self._register_bot(event)
+        group_id = int(event.get_group_id())
+        user_id = int(event.get_sender_id())
+        if user_id not in self.settings.admin_users:
+            await event.send(MessageChain([Comp.Plain("⚠️ 您没有执行此操作的权限。")]))
+            return
+        command_parts = event.message_str.split()
+        top_n = 10
+        if len(command_parts) > 1:
+            try:
+                top_n = max(1, min(int(command_parts[1]), 100))
+            except ValueError:
+                await event.send(MessageChain([Comp.Plain("❌ 数量必须是一个数字。用法: /sa [数量]")]))
+                return
+        logger.info(f"[{group_id}] 用户 {user_id} 触发 /sa 空间占用分析指令，top_n={top_n}。")
+        try:
+            all_files = await self._get_all_files_recursive_core(group_id, event.bot)
+            stats = compute_storage_stats(all_files, top_n=top_n)
+            report = ReportBuilder("📊 群文件空间占用分析")
+            report.add_line(f"共 {stats.total_count} 个文件，总大小 {utils.format_bytes(stats.total_size)}。")
+            self._append_storage_sections(report, stats)
+            if group_id in self.settings.storage_limits:
+                limits = self.settings.storage_limits[group_id]
+                report.add_line(f"容量上限: {limits.count_limit} 个文件 / {limits.space_limit_gb:.2f}GB")
+            await self._send_or_forward(event, report, name="空间占用分析")
+        except Exception as e:
+            logger.error(f"[{group_id}] 执行空间占用分析时发生未知异常: {e}", exc_info=True)
+            await event.send(MessageChain([Comp.Plain("❌ 执行空间占用分析时发生内部错误，请检查后台日志。")]))
+
+    def _format_search_results(self, files: List[Dict], search_term: str, for_delete: bool = False) -> ReportBuilder:
+        report = ReportBuilder(f"🔍 找到了 {len(files)} 个与「{search_term}」相关的结果：")
+        report.add_separator()
+        report.add_entries(
+            f"[{i}] {file_info.get('file_name')}"
+            f"\n  上传者: {file_info.get('uploader_name', '未知')}"
+            f"\n  大小: {utils.format_bytes(file_info.get('size'))}"
+            f"\n  修改时间: {utils.format_timestamp(file_info.get('modify_time'))}"
+            for i, file_info in enumerate(files, 1)
+        )
+        report.add_separator()
         if for_delete:
-            reply_text += f"\n请使用 /df {search_term} [序号] 来删除指定文件。"
+            report.add_line(f"请使用 /df {search_term} [序号] 来删除指定文件。")
         else:
-            reply_text += f"\n如需删除，请使用 /df {search_term} [序号]"
-        return reply_text
+            report.add_line(f"如需删除，请使用 /df {search_term} [序号]")
+        return report
     
     @filter.command("sf")
+    @traced("/sf")
     async def on_search_file_command(self, event: AstrMessageEvent):
-        if not self.bot: self.bot = event.bot
+        self._register_bot(event)
         group_id = int(event.get_group_id())
         user_id = int(event.get_sender_id())
-        command_parts = event.message_str.split(maxsplit=2)
-        if len(command_parts) < 2 or not command_parts[1]:
-            await event.send(MessageChain([Comp.Plain("❓ 请提供要搜索的文件名。用法: /sf <文件名> [序号]")]))
+        filename_to_find, index_str, page_str = self._parse_search_args(event.message_str, allow_page=True)
+        if not filename_to_find:
+            await event.send(MessageChain([Comp.Plain("❓ 请提供要搜索的文件名或查询条件。用法: /sf <文件名|条件...> [序号] [p页码]")]))
             return
-        filename_to_find = command_parts[1]
-        index_str = command_parts[2] if len(command_parts) > 2 else None
-        logger.info(f"[{group_id}] 用户 {user_id} 触发 /sf, 目标: '{filename_to_find}', 序号: {index_str}")
+        page = None
+        if page_str:
+            if not (page_str[:1].lower() == 'p' and page_str[1:].isdigit() and int(page_str[1:]) >= 1):
+                await event.send(MessageChain([Comp.Plain("❌ 页码格式错误，应为 p<页码>，例如 p2。")]))
+                return
+            page = int(page_str[1:])
+        logger.info(f"[{group_id}] 用户 {user_id} 触发 /sf, 目标: '{filename_to_find}', 序号: {index_str}, 页码: {page}")
         
-        all_files = await self._get_all_files_recursive_core(group_id, event.bot)
-        found_files = []
-        for file_info in all_files:
-            current_filename = file_info.get('file_name', '')
-            base_name, _ = os.path.splitext(current_filename)
-            if filename_to_find in base_name or filename_to_find in current_filename:
-                found_files.append(file_info)
+        # 指定了序号时，找到第 index 个匹配即可停止遍历
+        stop_after = int(index_str) if index_str and index_str.isdigit() and int(index_str) > 0 else None
+        try:
+            found_files, scanned, _ = await self._search_files(event, filename_to_find, stop_after=stop_after, early_reply=not index_str)
+        except QueryError as e:
+            await event.send(MessageChain([Comp.Plain(f"❌ 查询条件有误: {e}")]))
+            return
         
-        logger.info(f"[{group_id}] 在 {len(all_files)} 个文件中，找到 {len(found_files)} 个匹配项。")
+        if scanned:
+            logger.info(f"[{group_id}] 在 {scanned} 个文件中，找到 {len(found_files)} 个匹配项。")
 
         if not found_files:
             await event.send(MessageChain([Comp.Plain(f"❌ 未在群文件中找到与「{filename_to_find}」相关的任何文件。")]))
@@ -623,6 +1217,16 @@ class GroupFSPlugin(Star):
                 await event.send(MessageChain([Comp.Plain(f"❌ 序号错误！找到了 {len(found_files)} 个文件，请输入 1 到 {len(found_files)} 之间的数字。")]))
                 return
             file_to_preview = found_files[index - 1]
+            if page is not None:
+                page_text, page_count, error_msg = await self._get_text_page(event, file_to_preview, page)
+                if error_msg:
+                    await event.send(MessageChain([Comp.Plain(error_msg)]))
+                    return
+                reply_text = f"📄 文件「{file_to_preview.get('file_name')}」{page_text}"
+                if page < page_count:
+                    reply_text += "\n" + "-" * 20 + f"\n下一页: /sf {filename_to_find} {index} p{page + 1}"
+                await self._send_or_forward(event, reply_text, name=f"文件预览：{file_to_preview.get('file_name')}")
+                return
             preview_text, error_msg = await self._get_file_preview(event, file_to_preview)
             if error_msg:
                 await event.send(MessageChain([Comp.Plain(error_msg)]))
@@ -641,30 +1245,28 @@ class GroupFSPlugin(Star):
             await event.send(MessageChain([Comp.Plain("❌ 预览文件时发生内部错误，请检查后台日志。")]))
             
     @filter.command("df")
+    @traced("/df")
     async def on_delete_file_command(self, event: AstrMessageEvent):
-        if not self.bot: self.bot = event.bot
+        self._register_bot(event)
         group_id = int(event.get_group_id())
         user_id = int(event.get_sender_id())
-        command_parts = event.message_str.split(maxsplit=2)
-        if len(command_parts) < 2 or not command_parts[1]:
-            await event.send(MessageChain([Comp.Plain("❓ 请提供要删除的文件名。用法: /df <文件名> [序号]")]))
+        filename_to_find, index_str, _ = self._parse_search_args(event.message_str, allow_page=False)
+        if not filename_to_find:
+            await event.send(MessageChain([Comp.Plain("❓ 请提供要删除的文件名或查询条件。用法: /df <文件名|条件...> [序号]")]))
             return
-        filename_to_find = command_parts[1]
-        index_str = command_parts[2] if len(command_parts) > 2 else None
         logger.info(f"[{group_id}] 用户 {user_id} 触发删除指令 /df, 目标: '{filename_to_find}', 序号: {index_str}")
-        if user_id not in self.admin_users:
+        if user_id not in self.settings.admin_users:
             await event.send(MessageChain([Comp.Plain("⚠️ 您没有执行此操作的权限。")]))
             return
 
-        all_files = await self._get_all_files_recursive_core(group_id, event.bot)
-        found_files = []
-        for file_info in all_files:
-            current_filename = file_info.get('file_name', '')
-            base_name, _ = os.path.splitext(current_filename)
-            if filename_to_find in base_name or filename_to_find in current_filename:
-                found_files.append(file_info)
+        try:
+            found_files, scanned, _ = await self._search_files(event, filename_to_find)
+        except QueryError as e:
+            await event.send(MessageChain([Comp.Plain(f"❌ 查询条件有误: {e}")]))
+            return
 
-        logger.info(f"[{group_id}] 在 {len(all_files)} 个文件中，找到 {len(found_files)} 个匹配项用于删除。")
+        if scanned:
+            logger.info(f"[{group_id}] 在 {scanned} 个文件中，找到 {len(found_files)} 个匹配项用于删除。")
             
         if not found_files:
             await event.send(MessageChain([Comp.Plain(f"❌ 未找到与「{filename_to_find}」相关的任何文件。")]))
@@ -705,7 +1307,7 @@ class GroupFSPlugin(Star):
                 return
             logger.info(f"[{group_id}] 确认删除文件 '{found_filename}', File ID: {file_id_to_delete}...")
             client = event.bot
-            delete_result = await client.api.call_action('delete_group_file', group_id=group_id, file_id=file_id_to_delete)
+            delete_result = await self.api.call('delete_group_file', group_id, fallback=client, file_id=file_id_to_delete)
             is_success = False
             if delete_result:
                 trans_result = delete_result.get('transGroupFileResult', {})
@@ -713,6 +1315,7 @@ class GroupFSPlugin(Star):
                 if result_obj.get('retCode') == 0:
                     is_success = True
             if is_success:
+                self._invalidate_listing(group_id, [file_id_to_delete])
                 await event.send(MessageChain([Comp.Plain(f"✅ 文件「{found_filename}」已成功删除。")]))
                 logger.info(f"[{group_id}] 文件 '{found_filename}' 已成功删除。")
             else:
@@ -722,21 +1325,24 @@ class GroupFSPlugin(Star):
             logger.error(f"[{group_id}] 处理删除流程时发生未知异常: {e}", exc_info=True)
             await event.send(MessageChain([Comp.Plain(f"❌ 处理删除时发生内部错误，请检查后台日志。")]))
 
+    @traced("batch_delete")
     async def _perform_batch_delete(self, event: AstrMessageEvent, files_to_delete: List[Dict]):
         group_id = int(event.get_group_id())
         deleted_files = []
+        deleted_file_ids = []
         failed_deletions = []
         total_count = len(files_to_delete)
         logger.info(f"[{group_id}] [批量删除] 开始处理 {total_count} 个文件的删除任务。")
-        for i, file_info in enumerate(files_to_delete):
+        progress = self.logs.progress('delete', f"[{group_id}] [批量删除]", total=total_count)
+        for file_info in files_to_delete:
             file_id = file_info.get("file_id")
             file_name = file_info.get("file_name", "未知文件名")
             if not file_id:
                 failed_deletions.append(f"{file_name} (缺少File ID)")
+                progress.step("失败", file_name, error="缺少File ID")
                 continue
             try:
-                logger.info(f"[{group_id}] [批量删除] ({i+1}/{total_count}) 正在删除 '{file_name}'...")
-                delete_result = await event.bot.api.call_action('delete_group_file', group_id=group_id, file_id=file_id)
+                delete_result = await self.api.call('delete_group_file', group_id, fallback=event.bot, file_id=file_id)
                 is_success = False
                 if delete_result:
                     trans_result = delete_result.get('transGroupFileResult', {})
@@ -745,26 +1351,225 @@ class GroupFSPlugin(Star):
                         is_success = True
                 if is_success:
                     deleted_files.append(file_name)
+                    deleted_file_ids.append(file_id)
+                    progress.step("已删除", file_name)
                 else:
                     failed_deletions.append(file_name)
+                    progress.step("失败", file_name, error=(delete_result or {}).get('wording', 'API未返回成功状态'))
             except Exception as e:
-                logger.error(f"[{group_id}] [批量删除] 删除 '{file_name}' 时发生异常: {e}")
                 failed_deletions.append(file_name)
+                progress.step("失败", file_name, error=str(e))
             await asyncio.sleep(0.5)
-        report_message = f"✅ 批量删除完成！\n共处理了 {total_count} 个文件。\n\n"
+        progress.finish()
         if deleted_files:
-            report_message += f"成功删除了 {len(deleted_files)} 个失效文件：\n"
-            report_message += "\n".join(f"- {name}" for name in deleted_files)
+            self._invalidate_listing(group_id, deleted_file_ids)
+        report = ReportBuilder("✅ 批量删除完成！")
+        report.add_line(f"共处理了 {total_count} 个文件。")
+        report.add_line()
+        if deleted_files:
+            report.add_line(f"成功删除了 {len(deleted_files)} 个失效文件：")
+            report.add_entries(f"- {name}" for name in deleted_files)
         else:
-            report_message += "未能成功删除任何文件。"
+            report.add_line("未能成功删除任何文件。")
         if failed_deletions:
-            report_message += f"\n\n🚨 有 {len(failed_deletions)} 个文件删除失败：\n"
-            report_message += "\n".join(f"- {name}" for name in failed_deletions)
-        logger.info(f"[{group_id}] [批量删除] 任务完成，准备发送报告。")
-        await self._send_or_forward(event, report_message, name="批量删除报告")
+            report.add_line()
+            report.add_line(f"🚨 有 {len(failed_deletions)} 个文件删除失败：")
+            report.add_entries(f"- {name}" for name in failed_deletions)
+        await self._send_or_forward(event, report, name="批量删除报告")
+
+    def _get_bulk_plan(self, group_id: int, user_id: int) -> Optional[BulkPlan]:
+        plan = self.bulk_plans.get((group_id, user_id))
+        if plan is None:
+            return None
+        if time.monotonic() - plan.created_at > self.settings.bulk_plan_ttl_seconds:
+            del self.bulk_plans[(group_id, user_id)]
+            return None
+        return plan
+
+    async def _get_root_folders(self, group_id: int, bot) -> List[Dict]:
+        folders = []
+        async for _, page_folders in self._iter_folder_pages(group_id, bot, None):
+            folders.extend(page_folders)
+        return folders
+
+    def _format_bulk_preview(self, plan: BulkPlan, command: str) -> ReportBuilder:
+        if plan.kind == "rename":
+            report = ReportBuilder(f"📝 批量重命名预览：「{plan.pattern}」→「{plan.argument}」")
+        else:
+            target = plan.argument or "根目录"
+            suffix = "" if plan.target_folder_id else "（文件夹不存在，执行时将自动创建）"
+            report = ReportBuilder(f"📦 批量移动预览：「{plan.pattern}」→ 文件夹「{target}」{suffix}")
+        report.add_separator()
+        if plan.ops:
+            report.add_line(f"将处理 {len(plan.ops)} 个文件：")
+            if plan.kind == "rename":
+                report.add_entries(
+                    f"[{i}] {op.file.relative_path}\n  → {op.new_name}" for i, op in enumerate(plan.ops, 1)
+                )
+            else:
+                report.add_entries(
+                    f"[{i}] {op.file.relative_path}" for i, op in enumerate(plan.ops, 1)
+                )
+        else:
+            report.add_line("没有可以执行的操作。")
+        if plan.skipped:
+            report.add_line()
+            report.add_line(f"⚠️ 有 {len(plan.skipped)} 个文件因冲突将被跳过：")
+            report.add_entries(f"- {record.relative_path}: {reason}" for record, reason in plan.skipped)
+        if plan.ops:
+            report.add_separator()
+            minutes = max(1, self.settings.bulk_plan_ttl_seconds // 60)
+            report.add_line(f"确认执行请在 {minutes} 分钟内发送 /{command} confirm，取消请发送 /{command} cancel。")
+        return report
+
+    async def _handle_bulk_command(self, event: AstrMessageEvent, command: str, usage: str):
+        """/gfr 与 /gfm 的公共入口：生成预览计划，或确认/取消当前用户待执行的计划。"""
+        self._register_bot(event)
+        group_id = int(event.get_group_id())
+        user_id = int(event.get_sender_id())
+        logger.info(f"[{group_id}] 用户 {user_id} 触发 /{command}: {event.message_str}")
+        if user_id not in self.settings.admin_users:
+            await event.send(MessageChain([Comp.Plain("⚠️ 您没有执行此操作的权限。")]))
+            return
+        command_parts = event.message_str.split(maxsplit=2)
+        action = command_parts[1].lower() if len(command_parts) == 2 else None
+        if action in ("confirm", "cancel"):
+            plan = self._get_bulk_plan(group_id, user_id)
+            if plan is None:
+                await event.send(MessageChain([Comp.Plain("❌ 没有待确认的批量操作，或预览已过期。")]))
+                return
+            # 先取出计划，防止重复确认导致同一批操作执行两次
+            del self.bulk_plans[(group_id, user_id)]
+            if action == "cancel":
+                await event.send(MessageChain([Comp.Plain("✅ 已取消待执行的批量操作。")]))
+                return
+            await event.send(MessageChain([Comp.Plain(f"⏳ 开始执行，共 {len(plan.ops)} 个文件，完成后发送报告。")]))
+            self.active_tasks.append(asyncio.create_task(self._execute_bulk_plan(event, plan)))
+            event.stop_event()
+            return
+        if len(command_parts) < 3:
+            await event.send(MessageChain([Comp.Plain(f"❓ 用法: {usage}")]))
+            return
+        try:
+            pattern = compile_pattern(command_parts[1])
+        except re.error as e:
+            await event.send(MessageChain([Comp.Plain(f"❌ 正则表达式有误: {e}")]))
+            return
+        argument = command_parts[2].strip()
+
+        all_files = await self._get_all_files_with_path(group_id, event.bot)
+        try:
+            if command == "gfr":
+                # 用 "" 表示替换为空，即删除匹配的部分
+                plan = plan_renames(all_files, pattern, "" if argument == '""' else argument)
+            else:
+                target = '' if argument in ('/', '根目录') else argument.strip('/')
+                target_folder_id = '/' if not target else find_root_folder_id(
+                    await self._get_root_folders(group_id, event.bot), target)
+                plan = plan_moves(all_files, pattern, target, target_folder_id)
+        except re.error as e:
+            await event.send(MessageChain([Comp.Plain(f"❌ 替换模板有误: {e}")]))
+            return
+        logger.info(f"[{group_id}] [批量{'重命名' if command == 'gfr' else '移动'}] 在 {len(all_files)} 个文件中生成计划: "
+                    f"{len(plan.ops)} 项待执行, {len(plan.skipped)} 项冲突。")
+        if not plan.ops and not plan.skipped:
+            await event.send(MessageChain([Comp.Plain(f"❌ 没有文件名匹配「{pattern.pattern}」且需要处理的文件。")]))
+            return
+        if plan.ops:
+            self.bulk_plans[(group_id, user_id)] = plan
+        await self._send_or_forward(event, self._format_bulk_preview(plan, command), name="批量操作预览")
+
+    async def _ensure_target_folder(self, event: AstrMessageEvent, group_id: int, folder_name: str) -> Optional[str]:
+        """确保根目录下存在名为 folder_name 的文件夹，返回其 ID；创建失败时返回 None。"""
+        folder_id = find_root_folder_id(await self._get_root_folders(group_id, event.bot), folder_name)
+        if folder_id:
+            return folder_id
+        try:
+            await self.api.call('create_group_file_folder', group_id, fallback=event.bot,
+                                folder_name=folder_name, name=folder_name, parent_id='/')
+        except Exception as e:
+            logger.error(f"[{group_id}] [批量移动] 创建文件夹 '{folder_name}' 失败: {e}")
+            return None
+        # 创建接口不一定返回新文件夹 ID，重新读取根目录获取
+        return find_root_folder_id(await self._get_root_folders(group_id, event.bot), folder_name)
+
+    async def _apply_bulk_op(self, event: AstrMessageEvent, group_id: int, op: BulkOp, target_folder_id: Optional[str],
+                             slots: asyncio.Semaphore) -> Optional[str]:
+        """执行单项操作，成功返回 None，失败返回原因。"""
+        async with slots:
+            error = None
+            try:
+                if op.new_name:
+                    result = await self.api.call(
+                        'rename_group_file', group_id, fallback=event.bot, file_id=op.file.file_id,
+                        current_parent_directory=op.file.folder_id, new_name=op.new_name)
+                else:
+                    result = await self.api.call(
+                        'move_group_file', group_id, fallback=event.bot, file_id=op.file.file_id,
+                        current_parent_directory=op.file.folder_id, target_parent_directory=target_folder_id)
+                if isinstance(result, dict) and result.get('ok') is False:
+                    error = result.get('wording') or 'API未返回成功状态'
+            except Exception as e:
+                logger.error(f"[{group_id}] [批量操作] 处理 '{op.file.relative_path}' 时发生异常: {e}")
+                error = str(e) or type(e).__name__
+            # 在持有并发名额时等待，使整体速率不超过 并发数 / 间隔
+            await asyncio.sleep(self.settings.bulk_op_interval_ms / 1000)
+            return error
+
+    @traced("bulk_plan")
+    async def _execute_bulk_plan(self, event: AstrMessageEvent, plan: BulkPlan):
+        group_id = int(event.get_group_id())
+        label = "批量重命名" if plan.kind == "rename" else "批量移动"
+        logger.info(f"[{group_id}] [{label}] 开始执行 {len(plan.ops)} 项操作。")
+        target_folder_id = plan.target_folder_id
+        if plan.kind == "move" and not target_folder_id:
+            target_folder_id = await self._ensure_target_folder(event, group_id, plan.argument)
+            if not target_folder_id:
+                await event.send(MessageChain([Comp.Plain(f"❌ 无法创建目标文件夹「{plan.argument}」，已取消{label}。")]))
+                return
+        slots = asyncio.Semaphore(max(1, self.settings.bulk_op_concurrency))
+        errors = await asyncio.gather(*(
+            self._apply_bulk_op(event, group_id, op, target_folder_id, slots) for op in plan.ops
+        ))
+        succeeded = [op for op, error in zip(plan.ops, errors) if error is None]
+        failed = [(op, error) for op, error in zip(plan.ops, errors) if error is not None]
+        if succeeded:
+            # 文件 ID 不变但名称或位置已变化，引用这些文件的搜索会话一并作废
+            self._invalidate_listing(group_id, [op.file.file_id for op in succeeded])
+
+        report = ReportBuilder(f"✅ {label}完成！")
+        report.add_line(f"成功 {len(succeeded)} 个，失败 {len(failed)} 个，跳过 {len(plan.skipped)} 个。")
+        if succeeded:
+            report.add_line()
+            report.add_line("成功：")
+            if plan.kind == "rename":
+                report.add_entries(f"- {op.file.relative_path} → {op.new_name}" for op in succeeded)
+            else:
+                report.add_entries(f"- {op.file.relative_path}" for op in succeeded)
+        if failed:
+            report.add_line()
+            report.add_line(f"🚨 有 {len(failed)} 个文件处理失败：")
+            report.add_entries(f"- {op.file.relative_path}: {error}" for op, error in failed)
+        if plan.skipped:
+            report.add_line()
+            report.add_line(f"⚠️ 有 {len(plan.skipped)} 个文件因冲突被跳过：")
+            report.add_entries(f"- {record.relative_path}: {reason}" for record, reason in plan.skipped)
+        logger.info(f"[{group_id}] [{label}] 任务完成: 成功 {len(succeeded)}, 失败 {len(failed)}。")
+        await self._send_or_forward(event, report, name=f"{label}报告")
+
+    @filter.command("gfr")
+    @traced("/gfr")
+    async def on_bulk_rename_command(self, event: AstrMessageEvent):
+        await self._handle_bulk_command(event, "gfr", "/gfr <正则> <替换>，确认 /gfr confirm，取消 /gfr cancel")
+
+    @filter.command("gfm")
+    @traced("/gfm")
+    async def on_bulk_move_command(self, event: AstrMessageEvent):
+        await self._handle_bulk_command(event, "gfm", "/gfm <正则> <目标文件夹>，确认 /gfm confirm，取消 /gfm cancel")
 
     def _get_preview_from_bytes(self, content_bytes: bytes) -> tuple[str, str]:
         """从字节内容中尝试获取文本预览和编码。"""
+        import chardet
         try:
             detection = chardet.detect(content_bytes)
             encoding = detection.get('encoding', 'utf-8') or 'utf-8'
@@ -775,13 +1580,11 @@ class GroupFSPlugin(Star):
         except Exception:
             return "", "未知"
 
-    async def _get_preview_from_zip(self, file_path: str) -> tuple[str, str]:
+    async def _get_preview_from_zip(self, file_path: str, work_dir: str) -> tuple[str, str]:
         """从本地压缩文件中解压并预览第一个文本文件。返回 (预览内容, 错误信息)。
-           使用 7za 命令来支持更多格式。
+           使用 7za 命令来支持更多格式。解压到 work_dir 下，由调用方负责清理。
         """
-        temp_dir = os.path.join(os.getcwd(), 'temp_file_previews')
-        os.makedirs(temp_dir, exist_ok=True)
-        extract_path = os.path.join(temp_dir, f"extract_{int(time.time())}")
+        extract_path = os.path.join(work_dir, "extract")
         os.makedirs(extract_path, exist_ok=True)
         
         preview_text = ""
@@ -790,23 +1593,29 @@ class GroupFSPlugin(Star):
         try:
             logger.info(f"正在尝试无密码解压文件 '{os.path.basename(file_path)}'...")
             command_no_pwd = ["7za", "x", file_path, f"-o{extract_path}", "-y"]
-            process = await asyncio.create_subprocess_exec(
-                *command_no_pwd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
+            with span("7za:extract", file=os.path.basename(file_path)) as trace_span:
+                process = await asyncio.create_subprocess_exec(
+                    *command_no_pwd,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE
+                )
+                stdout, stderr = await process.communicate()
+                if trace_span:
+                    trace_span.set(returncode=process.returncode)
             
             if process.returncode != 0:
-                if self.default_zip_password:
+                if self.settings.default_zip_password:
                     logger.info("无密码解压失败，正在尝试使用默认密码...")
-                    command_with_pwd = ["7za", "x", file_path, f"-o{extract_path}", f"-p{self.default_zip_password}", "-y"]
-                    process = await asyncio.create_subprocess_exec(
-                        *command_with_pwd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE
-                    )
-                    stdout, stderr = await process.communicate()
+                    command_with_pwd = ["7za", "x", file_path, f"-o{extract_path}", f"-p{self.settings.default_zip_password}", "-y"]
+                    with span("7za:extract", file=os.path.basename(file_path), password=True) as trace_span:
+                        process = await asyncio.create_subprocess_exec(
+                            *command_with_pwd,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE
+                        )
+                        stdout, stderr = await process.communicate()
+                        if trace_span:
+                            trace_span.set(returncode=process.returncode)
                     
                     if process.returncode != 0:
                         error_msg = stderr.decode('utf-8').strip()
@@ -832,7 +1641,7 @@ class GroupFSPlugin(Star):
                 return "", "压缩包中没有可预览的文本文件"
             
             with open(preview_file_path, 'rb') as f:
-                content_bytes = f.read(self.preview_length * 4)
+                content_bytes = f.read(self.settings.preview_length * 4)
             
             preview_text_raw, encoding = self._get_preview_from_bytes(content_bytes)
             
@@ -846,48 +1655,20 @@ class GroupFSPlugin(Star):
         except Exception as e:
             logger.error(f"处理ZIP文件时发生未知错误: {e}", exc_info=True)
             error_msg = "处理压缩文件时发生内部错误"
-        finally:
-            if os.path.exists(extract_path):
-                asyncio.create_task(self._cleanup_folder(extract_path))
         
         return preview_text, error_msg
 
-    async def _cleanup_folder(self, path: str):
-        """异步清理文件夹及其内容。"""
-        await asyncio.sleep(5)
-        try:
-            for dirpath, dirnames, filenames in os.walk(path, topdown=False):
-                for filename in filenames:
-                    os.remove(os.path.join(dirpath, filename))
-                for dirname in dirnames:
-                    os.rmdir(os.path.join(dirpath, dirname))
-            os.rmdir(path)
-            logger.info(f"已清理临时文件夹: {path}")
-        except OSError as e:
-            logger.warning(f"删除临时文件夹 {path} 失败: {e}")
-
-    async def _get_file_preview(self, event: AstrMessageEvent, file_info: dict) -> tuple[str, str | None]:
+    async def _get_preview_url(self, event: AstrMessageEvent, file_info: dict) -> tuple[str, str | None]:
+        """获取预览用的下载链接。返回 (链接, 错误信息)。"""
         group_id = int(event.get_group_id())
         file_id = file_info.get("file_id")
         file_name = file_info.get("file_name", "")
-        _, file_extension = os.path.splitext(file_name)
-        
-        is_txt = file_extension.lower() == '.txt'
-        is_zip = self.enable_zip_preview and file_extension.lower() == '.zip'
-        
-        if not (is_txt or is_zip):
-            return "", f"❌ 文件「{file_name}」不是支持的文本或压缩格式，无法预览。"
-            
-        logger.info(f"[{group_id}] 正在为文件 '{file_name}' (ID: {file_id}) 获取预览...")
-        
-        local_file_path = None
-        
         try:
             client = event.bot
-            url_result = await client.api.call_action('get_group_file_url', group_id=group_id, file_id=file_id)
+            url_result = await self.api.call('get_group_file_url', group_id, fallback=client, file_id=file_id)
             if not (url_result and url_result.get('url')):
                 return "", f"❌ 无法获取文件「{file_name}」的下载链接。"
-            url = url_result['url']
+            return url_result['url'], None
         except ActionFailed as e:
             if e.result.get('retcode') == 1200:
                 error_message = (
@@ -898,25 +1679,196 @@ class GroupFSPlugin(Star):
                 return "", error_message
             else:
                 return "", f"❌ 预览失败，API返回错误：{e.result.get('wording', '未知错误')}"
+
+    async def _fetch_byte_range(self, url: str, start: int, end: int) -> tuple[bytes, str | None]:
+        """
+        通过 HTTP Range 请求读取 [start, end) 字节。返回 (数据, 错误信息)。
+        若服务器忽略 Range 返回完整内容，则只读取到 end 为止，且最多读取 MAX_UNRANGED_BYTES。
+        单次 read 可能只返回部分数据，因此循环读取到所需长度；数据不足时视为错误，不返回截断的内容。
+        """
+        if end <= start:
+            return b"", None
+        import aiohttp
+        with span("download:range", start=start, end=end):
+            async with aiohttp.ClientSession() as session:
+                async with self.downloads.slot(PRIORITY_INTERACTIVE):
+                    headers = {'Range': f'bytes={start}-{end - 1}'}
+                    async with session.get(url, headers=headers, timeout=30) as resp:
+                        if resp.status == 206:
+                            content_range = resp.headers.get('Content-Range', '')
+                            if content_range and not content_range.startswith(f'bytes {start}-'):
+                                return b"", f"分段响应范围不符 ({content_range})"
+                            data = await read_capped(resp, end - start)
+                            await self.downloads.throttle(len(data), PRIORITY_INTERACTIVE)
+                            if len(data) < end - start:
+                                return b"", f"分段数据不完整 ({len(data)}/{end - start} 字节)"
+                            return data, None
+                        if resp.status != 200:
+                            return b"", f"HTTP: {resp.status}"
+                        if end > self.MAX_UNRANGED_BYTES:
+                            return b"", "服务器不支持分段下载"
+                        buffer = bytearray()
+                        async for chunk in resp.content.iter_chunked(65536):
+                            buffer += chunk
+                            if len(buffer) >= end:
+                                break
+                        await self.downloads.throttle(len(buffer), PRIORITY_INTERACTIVE)
+                        if len(buffer) < end:
+                            return b"", f"数据不完整 ({max(0, len(buffer) - start)}/{end - start} 字节)"
+                        return bytes(buffer[start:end]), None
+
+    async def _get_text_page(self, event: AstrMessageEvent, file_info: dict, page: int) -> tuple[str, int, str | None]:
+        """
+        分页预览文本文件的第 page 页。只请求该页对应的字节范围；
+        首次访问某个文件时额外读取开头 4KB 用于识别编码，之后分页布局被缓存。
+        返回 (页面文本, 总页数, 错误信息)。
+        """
+        group_id = int(event.get_group_id())
+        file_id = file_info.get("file_id")
+        file_name = file_info.get("file_name", "")
+        file_size = file_info.get("size") or 0
+        if os.path.splitext(file_name)[1].lower() != '.txt':
+            return "", 0, f"❌ 分页预览仅支持 .txt 文件，「{file_name}」不是文本文件。"
+        if file_size <= 0:
+            return "", 0, f"❌ 无法获取文件「{file_name}」的大小，无法分页预览。"
+
+        url, error_msg = await self._get_preview_url(event, file_info)
+        if error_msg:
+            return "", 0, error_msg
+
+        try:
+            cache_key = f"{group_id}:{file_id}"
+            layout = self.page_layouts.get(cache_key)
+            if layout is None or layout.file_size != file_size:
+                probe, error_msg = await self._fetch_byte_range(url, 0, min(file_size, 4096))
+                if error_msg:
+                    return "", 0, f"❌ 下载文件「{file_name}」失败 ({error_msg})。"
+                _, encoding = self._get_preview_from_bytes(probe)
+                layout = PageLayout(encoding if encoding != "未知" else "utf-8", file_size, self.settings.preview_length, head=probe)
+                self.page_layouts.put(cache_key, layout)
+
+            if page > layout.page_count:
+                return "", 0, f"❌ 页码超出范围！文件「{file_name}」共 {layout.page_count} 页。"
+
+            start, end = layout.fetch_range(page)
+            logger.info(f"[{group_id}] 分页预览 '{file_name}' 第 {page}/{layout.page_count} 页，请求字节 {start}-{end - 1}。")
+            data, error_msg = await self._fetch_byte_range(url, start, end)
+            if error_msg:
+                return "", 0, f"❌ 下载文件「{file_name}」失败 ({error_msg})。"
+            try:
+                page_text = layout.extract_page(page, data, start, strict=True)
+            except UnicodeDecodeError:
+                # 编码只按文件开头识别，后文不符时用本页内容重新识别一次
+                _, encoding = self._get_preview_from_bytes(data)
+                relayout = PageLayout(encoding, file_size, self.settings.preview_length) if encoding != "未知" else None
+                if relayout is not None and relayout.encoding != layout.encoding:
+                    logger.info(f"[{group_id}] '{file_name}' 第 {page} 页无法按 {layout.encoding} 解码，改用 {relayout.encoding} 重新分页。")
+                    layout = relayout
+                    self.page_layouts.put(cache_key, layout)
+                    if page > layout.page_count:
+                        return "", 0, f"❌ 页码超出范围！文件「{file_name}」共 {layout.page_count} 页。"
+                    start, end = layout.fetch_range(page)
+                    data, error_msg = await self._fetch_byte_range(url, start, end)
+                    if error_msg:
+                        return "", 0, f"❌ 下载文件「{file_name}」失败 ({error_msg})。"
+                page_text = layout.extract_page(page, data, start)
+            return f"第 {page}/{layout.page_count} 页 (格式 {layout.encoding})\n" + "-" * 20 + f"\n{page_text}", layout.page_count, None
+        except asyncio.TimeoutError:
+            return "", 0, f"❌ 预览文件「{file_name}」超时。"
+        except Exception as e:
+            logger.error(f"[{group_id}] 分页预览文件 '{file_name}' 时发生未知异常: {e}", exc_info=True)
+            return "", 0, f"❌ 预览文件「{file_name}」时发生内部错误。"
+
+    async def _get_preview_from_epub(self, url: str, file_info: dict) -> tuple[str, str | None]:
+        """
+        通过范围请求预览 EPUB：只读取 ZIP 目录、OPF 和前几个正文文档，
+        正文按块解压并流式去除 HTML，收集到 preview_length 个字符即停止。
+        """
+        file_name = file_info.get("file_name", "")
+        file_size = file_info.get("size") or 0
+        if file_size <= 0:
+            return "", f"❌ 无法获取文件「{file_name}」的大小，无法预览。"
+
+        async def fetch(start: int, end: int) -> bytes:
+            data, error_msg = await self._fetch_byte_range(url, start, end)
+            if error_msg:
+                raise EpubError(f"下载失败 ({error_msg})")
+            return data
+
+        try:
+            title, text = await extract_epub_preview(fetch, file_size, self.settings.preview_length)
+        except (EpubError, ElementTree.ParseError) as e:
+            logger.warning(f"预览 EPUB 文件 '{file_name}' 失败: {e}")
+            return "", f"❌ 预览 EPUB 文件「{file_name}」失败：{e}"
+        except asyncio.TimeoutError:
+            return "", f"❌ 预览文件「{file_name}」超时。"
+        except Exception as e:
+            logger.error(f"预览 EPUB 文件 '{file_name}' 时发生未知异常: {e}", exc_info=True)
+            return "", f"❌ 预览文件「{file_name}」时发生内部错误。"
+
+        if not text:
+            return "", f"❌ EPUB 文件「{file_name}」中没有可预览的正文。"
+        if len(text) >= self.settings.preview_length:
+            text += "..."
+        return (f"《{title}》\n{text}" if title else text), None
+
+    async def _get_file_preview(self, event: AstrMessageEvent, file_info: dict) -> tuple[str, str | None]:
+        group_id = int(event.get_group_id())
+        file_id = file_info.get("file_id")
+        file_name = file_info.get("file_name", "")
+        _, file_extension = os.path.splitext(file_name)
+        
+        is_txt = file_extension.lower() == '.txt'
+        is_zip = self.settings.enable_zip_preview and file_extension.lower() == '.zip'
+        is_epub = file_extension.lower() == '.epub'
+        
+        if not (is_txt or is_zip or is_epub):
+            return "", f"❌ 文件「{file_name}」不是支持的文本、EPUB 或压缩格式，无法预览。"
+            
+        logger.info(f"[{group_id}] 正在为文件 '{file_name}' (ID: {file_id}) 获取预览...")
         
+        work_dir = None
+        
+        url, error_msg = await self._get_preview_url(event, file_info)
+        if error_msg:
+            return "", error_msg
+        
+        if is_epub:
+            return await self._get_preview_from_epub(url, file_info)
+        
+        # 压缩包需要完整下载才能解压：已知超过上限的直接拒绝，下载过程中也按上限中止
+        max_zip_bytes = self.settings.preview_max_download_mb * 1024 * 1024
+        file_size = int(file_info.get("size") or 0)
+        if is_zip and max_zip_bytes and file_size > max_zip_bytes:
+            return "", f"❌ 压缩包「{file_name}」({utils.format_bytes(file_size)}) 超过预览下载上限 {utils.format_bytes(max_zip_bytes)}。"
+
+        import aiohttp
         try:
-            async with aiohttp.ClientSession() as session:
-                async with self.download_semaphore:
-                    range_header = None
-                    if is_txt:
-                        read_bytes_limit = self.preview_length * 4
-                        range_header = {'Range': f'bytes=0-{read_bytes_limit - 1}'}
-                    async with session.get(url, headers=range_header, timeout=30) as resp:
-                        if resp.status != 200 and resp.status != 206:
-                            return "", f"❌ 下载文件「{file_name}」失败 (HTTP: {resp.status})。"
-                        
-                        temp_dir = os.path.join(os.getcwd(), 'temp_file_previews')
-                        os.makedirs(temp_dir, exist_ok=True)
-                        local_file_path = os.path.join(temp_dir, f"{file_id}_{file_name}")
+            with span("download:preview", file=file_name, size=file_size):
+                async with aiohttp.ClientSession() as session:
+                    async with self.downloads.slot(PRIORITY_INTERACTIVE, group_id):
+                        range_header = None
+                        if is_txt:
+                            read_bytes_limit = self.settings.preview_length * 4
+                            range_header = {'Range': f'bytes=0-{read_bytes_limit - 1}'}
+                        async with session.get(url, headers=range_header, timeout=30) as resp:
+                            if resp.status != 200 and resp.status != 206:
+                                return "", f"❌ 下载文件「{file_name}」失败 (HTTP: {resp.status})。"
                         
-                        content_bytes = await resp.read()
-                        with open(local_file_path, 'wb') as f:
-                            f.write(content_bytes)
+                            if is_txt:
+                                # 服务器忽略 Range 时也只读取预览所需的字节
+                                content_bytes = await read_capped(resp, read_bytes_limit)
+                                await self.downloads.throttle(len(content_bytes), PRIORITY_INTERACTIVE)
+                            else:
+                                # 下载的压缩包与解压结果同时存在，约需 2 倍大小
+                                work_dir = await self.temp_space.allocate(
+                                    f"preview_{uuid.uuid4().hex[:12]}", expected_bytes=(file_size or max_zip_bytes) * 2
+                                )
+                                local_file_path = os.path.join(work_dir, os.path.basename(file_name) or "preview.zip")
+                                async with AtomicStreamWriter(local_file_path, max_bytes=max_zip_bytes) as writer:
+                                    async for chunk in resp.content.iter_chunked(65536):
+                                        await writer.write(chunk)
+                                        await self.downloads.throttle(len(chunk), PRIORITY_INTERACTIVE)
             
             preview_content = ""
             error_msg = None
@@ -924,32 +1876,31 @@ class GroupFSPlugin(Star):
                 decoded_text, _ = self._get_preview_from_bytes(content_bytes)
                 preview_content = decoded_text
             elif is_zip:
-                preview_text, error_msg = await self._get_preview_from_zip(local_file_path)
+                preview_text, error_msg = await self._get_preview_from_zip(local_file_path, work_dir)
                 if error_msg:
                     return "", error_msg
                 preview_content = preview_text
             
-            if len(preview_content) > self.preview_length:
-                preview_content = preview_content[:self.preview_length] + "..."
+            if len(preview_content) > self.settings.preview_length:
+                preview_content = preview_content[:self.settings.preview_length] + "..."
             
             return preview_content, None
                 
+        except StreamLimitExceeded as e:
+            return "", f"❌ 压缩包「{file_name}」超过预览下载上限 {utils.format_bytes(e.limit)}，已停止下载。"
+        except TempQuotaExceeded as e:
+            return "", f"❌ 临时空间不足，无法预览压缩包「{file_name}」(需要 {utils.format_bytes(e.required)}，可用 {utils.format_bytes(e.available)})，请稍后再试。"
         except asyncio.TimeoutError:
             return "", f"❌ 预览文件「{file_name}」超时。"
         except Exception as e:
             logger.error(f"[{group_id}] 获取文件 '{file_name}' 预览时发生未知异常: {e}", exc_info=True)
             return "", f"❌ 预览文件「{file_name}」时发生内部错误。"
         finally:
-            if local_file_path and os.path.exists(local_file_path):
-                try:
-                    os.remove(local_file_path)
-                    logger.info(f"已清理临时文件: {local_file_path}")
-                except OSError as e:
-                    logger.warning(f"删除临时文件 {local_file_path} 失败: {e}")
-
-    async def _create_zip_archive(self, source_dir: str, target_zip_path: str, password: str) -> bool:
-        """使用外部命令行工具 (7za) 压缩整个目录。"""
-        VOLUME_SIZE = '512m' 
+            await self.temp_space.discard(work_dir)
+
+    async def _create_zip_archive(self, source_dir: str, target_zip_path: str, password: str, volume_size_mb: int) -> bool:
+        """使用外部命令行工具 (7za) 压缩整个目录，按 volume_size_mb 分卷。"""
+        VOLUME_SIZE = f'{volume_size_mb}m'
         try:
             dir_to_zip = os.path.basename(source_dir)
             parent_dir = os.path.dirname(source_dir)
@@ -964,13 +1915,16 @@ class GroupFSPlugin(Star):
             
             logger.info(f"[群文件备份-压缩] 正在执行压缩命令: {' '.join(command)}")
             
-            process = await asyncio.create_subprocess_exec(
-                *command,
-                cwd=parent_dir,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
+            with span("7za:archive", source=dir_to_zip, volume_mb=volume_size_mb) as trace_span:
+                process = await asyncio.create_subprocess_exec(
+                    *command,
+                    cwd=parent_dir,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE
+                )
+                stdout, stderr = await process.communicate()
+                if trace_span:
+                    trace_span.set(returncode=process.returncode)
 
             if process.returncode != 0:
                 error_message = stderr.decode('utf-8', errors='ignore')
@@ -987,17 +1941,177 @@ class GroupFSPlugin(Star):
             logger.error(f"[群文件备份-压缩] 打包时发生未知错误: {e}", exc_info=True)
             return False
 
-    async def _perform_group_file_backup(self, event: AstrMessageEvent, group_id: int):
+    def _select_backup_files(self, all_files_info: List[Dict], log_prefix: str) -> List[Dict]:
+        """按大小和后缀名过滤需要备份的文件。"""
+        size_limit_bytes = self.settings.backup_file_size_limit_mb * 1024 * 1024
+        selected = []
+        for file_info in all_files_info:
+            file_name = file_info.get('file_name', '未知文件')
+            file_size = file_info.get('size', 0)
+            if size_limit_bytes > 0 and file_size > size_limit_bytes:
+                logger.warning(f"{log_prefix} 文件 '{file_name}' ({utils.format_bytes(file_size)}) 超过大小限制 ({self.settings.backup_file_size_limit_mb}MB)，跳过。")
+                continue
+            _, ext = os.path.splitext(file_name)
+            ext = ext[1:].lower()
+            if self.settings.backup_file_extensions and ext not in self.settings.backup_file_extensions:
+                logger.warning(f"{log_prefix} 文件 '{file_name}' (.{ext}) 不在允许的后缀名范围 {self.settings.backup_file_extensions} 内，跳过。")
+                continue
+            selected.append(file_info)
+        return selected
+
+    def _plan_backup_batches(self, files: List[Dict], budget_bytes: int) -> tuple[List[List[Dict]], List[Dict]]:
+        """
+        将待备份文件划分为批次。未设置磁盘预算时只有一个批次；
+        否则每批的原始文件与压缩包同时存在于磁盘，因此单批总大小不超过预算的一半。
+        返回 (批次列表, 因超过单批容量而无法备份的文件)。
+        """
+        if budget_bytes <= 0:
+            return ([files] if files else []), []
+        batch_capacity = budget_bytes // 2
+        batches, oversized = [], []
+        current, current_size = [], 0
+        for file_info in files:
+            file_size = file_info.get('size', 0)
+            if file_size > batch_capacity:
+                oversized.append(file_info)
+                continue
+            if current and current_size + file_size > batch_capacity:
+                batches.append(current)
+                current, current_size = [], 0
+            current.append(file_info)
+            current_size += file_size
+        if current:
+            batches.append(current)
+        return batches, oversized
+
+    async def _replan_backup_batches(self, event: AstrMessageEvent, batches: List[List[Dict]], next_index: int,
+                                     remaining_budget: int, failed_downloads: List[str], log_prefix: str):
+        """
+        有分卷因发送失败被保留时，按扣除保留占用后的剩余预算重新划分尚未处理的批次（原地修改 batches）。
+        剩余预算容不下的文件计入 failed_downloads；预算耗尽时不再继续后续批次。
+        """
+        remaining_files = [f for batch in batches[next_index:] for f in batch]
+        if remaining_budget > 0:
+            new_batches, skipped = self._plan_backup_batches(remaining_files, remaining_budget)
+        else:
+            new_batches, skipped = [], remaining_files
+        batches[next_index:] = new_batches
+        if not skipped:
+            logger.info(f"{log_prefix} 保留待重发的分卷后剩余磁盘预算 {utils.format_bytes(remaining_budget)}，剩余文件重新划分为 {len(new_batches)} 批。")
+            return
+        failed_downloads.extend(f.get('file_name', '未知文件') for f in skipped)
+        logger.warning(f"{log_prefix} 保留待重发的分卷后磁盘预算不足 (剩余 {utils.format_bytes(max(0, remaining_budget))})，跳过 {len(skipped)} 个文件。")
+        await event.send(MessageChain([Comp.Plain(
+            f"⚠️ 为重发保留的分卷占用了磁盘预算，剩余 {len(skipped)} 个文件无法在预算内备份，已跳过。"
+            f"请先使用 /gfbr 重发缺失的分卷，或调大 backup_disk_budget_mb 后重新备份。"
+        )]))
+
+    def _collect_volumes(self, final_zip_path: str, log_prefix: str) -> List[str]:
+        """查找 7za 生成的全部分卷；只有一个分卷时将其重命名为 .zip。"""
+        temp_base_dir = os.path.dirname(final_zip_path)
+        # 基础名：不包含 .zip 部分 (如 'bot测试_备份_20251003_134542')
+        zip_base_name_no_ext = os.path.basename(final_zip_path).rsplit('.zip', 1)[0]
+        all_volumes = []
+        logger.info(f"{log_prefix} 正在查找所有分卷文件，基础名: {zip_base_name_no_ext}，目录: {temp_base_dir}")
+
+        # 查找所有分卷：匹配 '基础名' + '.zip' + '.' + 数字
+        for f in os.listdir(temp_base_dir):
+            logger.debug(f"{log_prefix} 目录项: {f}")
+            f_path = os.path.join(temp_base_dir, f)
+            if f.startswith(zip_base_name_no_ext) and (f.endswith('.zip') or f.split('.')[-1].isdigit()):
+                # 确保我们只添加主文件和分卷文件，排除其他无关文件
+                if f == os.path.basename(final_zip_path) or f.startswith(f"{zip_base_name_no_ext}.zip."):
+                    all_volumes.append(f_path)
+                    try:
+                        file_size = os.path.getsize(f_path)
+                        logger.info(f"{log_prefix} 识别到分卷文件: {f} ({utils.format_bytes(file_size)})")
+                    except Exception as e:
+                        logger.warning(f"{log_prefix} 识别到分卷文件: {f} (获取大小失败: {e})")
+
+        all_volumes.sort() # 确保按顺序发送
+        logger.info(f"{log_prefix} 找到分卷文件数: {len(all_volumes)}")
+
+        if len(all_volumes) == 1:
+            original_path = all_volumes[0]
+            original_name = os.path.basename(original_path)
+            new_volume_name = f"{zip_base_name_no_ext}.zip"
+            new_volume_path = os.path.join(temp_base_dir, new_volume_name)
+            os.rename(original_path, new_volume_path) # 执行重命名
+            all_volumes = [new_volume_path] # 更新列表为新的路径
+            logger.info(f"{log_prefix} [重命名] 单分卷重命名成功: '{original_name}' -> '{new_volume_name}'")
+        return all_volumes
+
+    @staticmethod
+    def _upload_target(event: AstrMessageEvent) -> str:
+        """备份文件的发送目标：群聊中发到群文件，私聊中发给发起者。"""
+        group_id = event.get_group_id()
+        return f"group:{group_id}" if group_id else f"private:{event.get_sender_id()}"
+
+    async def _send_volumes(self, event: AstrMessageEvent, all_volumes: List[str], log_prefix: str,
+                            job: Optional[Job] = None) -> List[str]:
+        """
+        逐个发送分卷文件。单个分卷因调用异常或超时失败时按指数退避重试，仍失败则跳过它继续发送后面的分卷，
+        不浪费已经上传的部分。被 NTQQ 明确拒绝的分卷不重试。
+        每次上传都计入发送目标的统计，用于选择后续的分卷大小。
+        返回发送失败、需保留以便 /gfbr 重发的分卷路径。
+        """
+        target = self._upload_target(event)
+        attempts = self.settings.backup_upload_retries + 1
+        failed_volumes = []
+        if job:
+            job.set_phase("发送分卷", total=len(all_volumes), total_bytes=sum(os.path.getsize(v) for v in all_volumes))
+        for volume_path in all_volumes:
+            volume_name = os.path.basename(volume_path)
+            volume_size = os.path.getsize(volume_path)
+            for attempt in range(attempts):
+                if attempt:
+                    delay = min(120, 10 * 2 ** (attempt - 1))
+                    logger.warning(f"{log_prefix} 分卷 {volume_name} 发送失败，{delay} 秒后第 {attempt} 次重试。")
+                    await asyncio.sleep(delay)
+                logger.info(f"{log_prefix} 正在发送分卷: {volume_name}...")
+                started = time.monotonic()
+                outcome = await self._upload_and_send_file_via_api(event, volume_path, volume_name)
+                await asyncio.to_thread(self.upload_stats.record, target, volume_size, time.monotonic() - started, outcome == UPLOAD_OK)
+                if outcome != UPLOAD_FAILED:
+                    break
+            if outcome == UPLOAD_REJECTED:
+                failed_volumes.append(volume_path)
+                await event.send(MessageChain([Comp.Plain(f"❌ 文件 {volume_name} 被拒绝发送，已跳过，稍后可使用 /gfbr 重新发送。")]))
+            elif outcome == UPLOAD_FAILED:
+                failed_volumes.append(volume_path)
+                await event.send(MessageChain([Comp.Plain(f"❌ 文件 {volume_name} 发送失败，已跳过，稍后可使用 /gfbr 重新发送。")]))
+            if job:
+                job.advance(nbytes=volume_size)
+        return failed_volumes
+
+    def _check_backup_disk_space(self, path: str, total_size: int, budget_bytes: int) -> tuple[bool, int, int]:
+        """
+        备份前的磁盘空间预检。返回 (是否足够, 预计需要的字节数, 可用字节数)。
+        普通模式下原始文件与压缩包会同时存在，约需 2 倍的文件总大小；
+        分批模式下峰值占用不超过磁盘预算。两种模式都额外保留 backup_disk_reserve_mb。
+        """
+        reserve_bytes = self.settings.backup_disk_reserve_mb * 1024 * 1024
+        peak_bytes = total_size * 2
+        if budget_bytes > 0:
+            peak_bytes = min(peak_bytes, budget_bytes)
+        required = peak_bytes + reserve_bytes
+        free = shutil.disk_usage(path).free
+        return free >= required, required, free
+
+    @traced("backup")
+    async def _perform_group_file_backup(self, event: AstrMessageEvent, group_id: int, job: Optional[Job] = None):
         log_prefix = f"[群文件备份-{group_id}]"
-        backup_root_dir = None
-        final_zip_path = None
+        job_dir = None
+        failed_volumes: List[str] = []
+        if job is None:
+            job = self.jobs.start(f"backup_{group_id}", "群文件备份", group_id, self._event_notifier(event))
         
         try:
             client = self.bot or event.bot
             
             # 1. 预通知：获取群文件系统信息
             logger.info(f"{log_prefix} 正在获取群文件系统原始信息...")
-            system_info = await client.api.call_action('get_group_file_system_info', group_id=group_id)
+            system_info = await self.api.call('get_group_file_system_info', group_id, fallback=client)
             
             # 记录原始的系统信息字典
             logger.info(f"{log_prefix} --- 群文件系统原始信息 START ---")
@@ -1014,172 +2128,417 @@ class GroupFSPlugin(Star):
             notification = (
                 f"备份任务已启动，目标群ID: {group_id}。\n"
                 f"该群文件总数: {total_count}。\n"
-                f"备份操作将遍历所有文件，请耐心等待，这可能需要几分钟。"
+                f"备份操作将遍历所有文件，请耐心等待，这可能需要几分钟。期间会定期发送进度，也可使用 /gfj 查询。"
             )
             await event.send(MessageChain([Comp.Plain(notification)]))
             logger.info(f"{log_prefix} 预通知已发送。")
 
             # 2. 准备工作：获取群名、创建本地临时目录
-            group_info = await client.api.call_action('get_group_info', group_id=group_id)
+            group_info = await self.api.call('get_group_info', group_id, fallback=client)
             group_name = group_info.get('group_name', str(group_id))
             timestamp = time.strftime("%Y%m%d_%H%M%S")
             
-            temp_plugin_dir = os.path.join(get_astrbot_data_path(), 'plugins_data', 'astrbot_plugin_GroupFS')
-            temp_base_dir = os.path.join(temp_plugin_dir, 'temp_backup_cache') 
-            
-            # 实际存放文件和最终 zip 的目录
-            backup_root_dir = os.path.join(temp_base_dir, f"{group_name}") 
-            
-            # 创建目录
-            os.makedirs(backup_root_dir, exist_ok=True)
-            logger.info(f"{log_prefix} 本地备份目录: {backup_root_dir}")
+            # 每个备份任务独占一个临时目录，下载的文件和生成的压缩包都在其中
+            job_dir = await self.temp_space.allocate(f"backup_{group_id}_{timestamp}")
+            logger.info(f"{log_prefix} 本地备份目录: {job_dir}")
 
-            # 3. 递归获取所有文件信息
+            # 3. 递归获取所有文件信息并过滤
+            job.set_phase("获取文件列表")
             all_files_info = await self._get_all_files_with_path(group_id, client)
-            
-            # 4. 过滤和下载文件
-            total_file_count_all = len(all_files_info)
-            downloaded_files_count = 0
-            downloaded_files_size = 0
-            failed_downloads = []
-            
-            size_limit_bytes = self.backup_file_size_limit_mb * 1024 * 1024
-            
-            for i, file_info in enumerate(all_files_info):
-                file_name = file_info.get('file_name', '未知文件')
-                file_id = file_info.get('file_id')
-                file_size = file_info.get('size', 0)
-                relative_path = file_info.get('relative_path', '')
-                
-                logger.info(f"{log_prefix} ({i+1}/{total_file_count_all}) 正在检查文件: '{file_name}'")
+            selected_files = self._select_backup_files(all_files_info, log_prefix)
+            selected_size = sum(f.get('size', 0) for f in selected_files)
+            logger.info(f"{log_prefix} 共 {len(all_files_info)} 个文件，符合备份条件 {len(selected_files)} 个 ({utils.format_bytes(selected_size)})。")
 
-                # 4.1. 过滤：大小和后缀名
-                if size_limit_bytes > 0 and file_size > size_limit_bytes:
-                    logger.warning(f"{log_prefix} 文件 '{file_name}' ({utils.format_bytes(file_size)}) 超过大小限制 ({self.backup_file_size_limit_mb}MB)，跳过。")
-                    continue
-                
-                _, ext = os.path.splitext(file_name)
-                ext = ext[1:].lower()
-                if self.backup_file_extensions and ext not in self.backup_file_extensions:
-                    logger.warning(f"{log_prefix} 文件 '{file_name}' (.{ext}) 不在允许的后缀名范围 {self.backup_file_extensions} 内，跳过。")
-                    continue
-                
-                # 4.2. 下载
-                download_success = await self._download_and_save_file(
-                    group_id, file_id, file_name, file_size, relative_path, backup_root_dir, client
-                )
-                
-                if download_success:
-                    downloaded_files_count += 1
-                    downloaded_files_size += file_size
-                else:
-                    failed_downloads.append(file_name)
+            if not selected_files:
+                await event.send(MessageChain([Comp.Plain(f"ℹ️ 备份任务完成。但没有找到符合大小或后缀名限制的任何文件。")]))
+                return
 
-                #await asyncio.sleep(0.5) # 下载间隔
+            # 4. 磁盘空间预检
+            budget_bytes = self.settings.backup_disk_budget_mb * 1024 * 1024
+            enough_space, required, free = self._check_backup_disk_space(job_dir, selected_size, budget_bytes)
+            if not enough_space:
+                logger.error(f"{log_prefix} 磁盘空间不足: 预计需要 {utils.format_bytes(required)}，可用 {utils.format_bytes(free)}。")
+                hint = "请调低 backup_disk_budget_mb。" if budget_bytes > 0 else "可在配置中设置 backup_disk_budget_mb 启用分批备份模式。"
+                await event.send(MessageChain([Comp.Plain(
+                    f"❌ 备份任务已取消：磁盘空间不足。\n"
+                    f"预计需要 {utils.format_bytes(required)}，当前可用 {utils.format_bytes(free)}。\n{hint}"
+                )]))
+                return
 
-            # 5. 压缩整个目录
-            final_zip_name = f"{group_name}_备份_{timestamp}.zip"
-            final_zip_path = os.path.join(temp_base_dir, final_zip_name)
-            
-            logger.info(f"{log_prefix} 文件下载完成，共成功下载 {downloaded_files_count} 个文件，开始压缩...")
+            # 向临时空间登记本任务的峰值占用，配额不足时先回收已结束任务的目录。
+            # 设置了磁盘预算时峰值可控，回收后仍不足则取消；未设置时只回收能回收的部分并告警，不阻止备份
+            if budget_bytes > 0:
+                try:
+                    await self.temp_space.reserve(job_dir, min(selected_size * 2, budget_bytes))
+                except TempQuotaExceeded as e:
+                    logger.error(f"{log_prefix} 临时空间配额不足: 需要 {utils.format_bytes(e.required)}，可用 {utils.format_bytes(e.available)}。")
+                    await event.send(MessageChain([Comp.Plain(
+                        f"❌ 备份任务已取消：临时空间配额不足。\n"
+                        f"预计需要 {utils.format_bytes(e.required)}，当前可用 {utils.format_bytes(e.available)}。\n"
+                        f"请调大 temp_quota_mb，或调低 backup_disk_budget_mb。"
+                    )]))
+                    return
+            elif not await self.temp_space.reserve(job_dir, selected_size * 2, strict=False):
+                logger.warning(f"{log_prefix} 预计峰值占用 {utils.format_bytes(selected_size * 2)} 超过临时空间配额，已回收可回收的目录，继续备份。")
+
+            batches, oversized = self._plan_backup_batches(selected_files, budget_bytes)
+            failed_downloads = [f.get('file_name', '未知文件') for f in oversized]
+            for file_info in oversized:
+                logger.warning(f"{log_prefix} 文件 '{file_info.get('file_name')}' ({utils.format_bytes(file_info.get('size'))}) 超过单批容量，无法在磁盘预算内备份，跳过。")
+            if len(batches) > 1:
+                await event.send(MessageChain([Comp.Plain(
+                    f"ℹ️ 已启用分批备份模式 (磁盘预算 {utils.format_bytes(budget_bytes)})，"
+                    f"共 {len(batches)} 批，每批下载、打包、发送后立即清理。"
+                )]))
+
+            # 5. 逐批下载、压缩、发送
+            downloaded_files_count = 0
+            downloaded_files_size = 0
+            total_volumes = 0
+            volume_size_mb = self.upload_stats.volume_size_mb(self._upload_target(event))
+            logger.info(f"{log_prefix} 根据发送目标的历史上传表现，分卷大小设为 {volume_size_mb}MB。")
+            # 分批模式下为重发保留的失败分卷仍占用磁盘，需从后续批次的预算中扣除
+            retained_bytes = 0
+            batch_index = 0
+            while batch_index < len(batches):
+                batch = batches[batch_index]
+                batch_index += 1
+                batch_prefix = f"{log_prefix} [批次 {batch_index}/{len(batches)}]" if len(batches) > 1 else log_prefix
+                batch_dir = os.path.join(job_dir, f"batch_{batch_index:03d}")
+                backup_root_dir = os.path.join(batch_dir, f"{group_name}")
+                os.makedirs(backup_root_dir, exist_ok=True)
+
+                batch_count = 0
+                batch_size = 0
+                progress = self.logs.progress('download', batch_prefix, total=len(batch))
+                batch_label = f" (批次 {batch_index}/{len(batches)})" if len(batches) > 1 else ""
+                job.set_phase(f"下载文件{batch_label}", total=len(batch), total_bytes=sum(f.get('size', 0) for f in batch))
+                for file_info in batch:
+                    file_name = file_info.get('file_name', '未知文件')
+                    file_size = file_info.get('size', 0)
+                    download_success = await self._download_and_save_file(
+                        group_id, file_info.get('file_id'), file_name, file_size,
+                        file_info.get('relative_path', ''), backup_root_dir, client
+                    )
+                    if download_success:
+                        batch_count += 1
+                        batch_size += file_size
+                        progress.step("已下载", file_name, nbytes=file_size)
+                    else:
+                        failed_downloads.append(file_name)
+                        progress.step("失败", file_name)
+                    job.advance(nbytes=file_size if download_success else 0)
+                progress.finish()
+
+                if batch_count == 0:
+                    logger.warning(f"{batch_prefix} 本批没有成功下载的文件，跳过压缩。")
+                    await self.temp_space.discard(batch_dir)
+                    continue
 
-            zip_success = False
+                zip_base = f"{group_name}_备份_{timestamp}" if len(batches) == 1 else f"{group_name}_备份_{timestamp}_part{batch_index:02d}"
+                final_zip_path = os.path.join(batch_dir, f"{zip_base}.zip")
+                logger.info(f"{batch_prefix} 文件下载完成，共成功下载 {batch_count} 个文件，开始压缩...")
+                job.set_phase(f"压缩{batch_label}")
 
-            if downloaded_files_count > 0:
-                 zip_success = await self._create_zip_archive(backup_root_dir, final_zip_path, self.backup_zip_password)
-            else:
-                logger.warning(f"{log_prefix} 没有符合条件的文件需要备份，跳过压缩。")
-                
-            # 6. 发送和清理
-            if zip_success:
-                
-                temp_base_dir = os.path.dirname(final_zip_path)
-                # 基础名：不包含 .zip 部分 (如 'bot测试_备份_20251003_134542')
-                zip_base_name_no_ext = os.path.basename(final_zip_path).rsplit('.zip', 1)[0]
-                
-                all_volumes = []
-                
-                logger.info(f"{log_prefix} 正在查找所有分卷文件，基础名: {zip_base_name_no_ext}，目录: {temp_base_dir}")
-                
-                # 查找所有分卷：匹配 '基础名' + '.zip' + '.' + 数字
-                for f in os.listdir(temp_base_dir):
-                    logger.debug(f"{log_prefix} 目录项: {f}")
-                    f_path = os.path.join(temp_base_dir, f)
-                    if f.startswith(zip_base_name_no_ext) and (f.endswith('.zip') or f.split('.')[-1].isdigit()):
-                         # 确保我们只添加主文件和分卷文件，排除其他无关文件
-                         if f == os.path.basename(final_zip_path) or f.startswith(f"{zip_base_name_no_ext}.zip."):
-                            all_volumes.append(f_path)
-                            try:
-                                file_size = os.path.getsize(f_path)
-                                logger.info(f"[{log_prefix}] 识别到分卷文件: {f} ({utils.format_bytes(file_size)})")
-                            except Exception as e:
-                                logger.warning(f"[{log_prefix}] 识别到分卷文件: {f} (获取大小失败: {e})")
-
-                all_volumes.sort() # 确保按顺序发送
-                
-                is_single_volume = len(all_volumes) == 1
-                
-                logger.info(f"{log_prefix} 找到分卷文件数: {len(all_volumes)}")
-                
-                if is_single_volume:
-                    original_path = all_volumes[0]
-                    original_name = os.path.basename(original_path)
-                    
-                    new_volume_name = f"{zip_base_name_no_ext}.zip"
-                    new_volume_path = os.path.join(temp_base_dir, new_volume_name)
-                    
-                    os.rename(original_path, new_volume_path) # 执行重命名
-                    all_volumes = [new_volume_path] # 更新列表为新的路径
-                    
-                    logger.info(f"{log_prefix} [重命名] 单分卷重命名成功: '{original_name}' -> '{new_volume_name}'")
+                if not await self._create_zip_archive(backup_root_dir, final_zip_path, self.settings.backup_zip_password, volume_size_mb):
+                    await event.send(MessageChain([Comp.Plain(f"❌ 备份任务失败：压缩文件失败或找不到压缩包。请检查后台日志。")]))
+                    return
 
+                all_volumes = self._collect_volumes(final_zip_path, batch_prefix)
                 if not all_volumes:
                     # 如果压缩成功，但一个文件都没找到，说明路径或匹配有问题
                     await event.send(MessageChain([Comp.Plain(f"❌ 备份压缩成功，但未在目录中找到任何生成的压缩文件！请检查日志。")]))
-                    zip_success = False 
-                    
-                else:
-                    # 构造回复消息
+                    return
+
+                # 构造回复消息
+                if len(batches) == 1:
                     reply_message = (
                         f"✅ 群文件备份完成！\n"
-                        f"成功备份文件数: {downloaded_files_count} 个 (总大小: {utils.format_bytes(downloaded_files_size)})\n"
+                        f"成功备份文件数: {batch_count} 个 (总大小: {utils.format_bytes(batch_size)})\n"
                         f"{'共' if len(all_volumes) > 1 else ''} {len(all_volumes)} 个文件即将发送，请注意接收！"
                     )
                     if failed_downloads:
                         reply_message += f"\n⚠️ 备份失败文件数: {len(failed_downloads)} 个 (详见日志)"
-                    
-                    await event.send(MessageChain([Comp.Plain(reply_message)]))
+                else:
+                    reply_message = (
+                        f"📦 第 {batch_index}/{len(batches)} 批备份完成：{batch_count} 个文件 ({utils.format_bytes(batch_size)})，"
+                        f"{len(all_volumes)} 个文件即将发送。"
+                    )
+                await event.send(MessageChain([Comp.Plain(reply_message)]))
+
+                batch_failed = await self._send_volumes(event, all_volumes, batch_prefix, job)
+                failed_volumes.extend(batch_failed)
+
+                downloaded_files_count += batch_count
+                downloaded_files_size += batch_size
+                total_volumes += len(all_volumes)
+                if len(batches) > 1:
+                    # 分批模式：本批发送完毕后立即清理，控制峰值磁盘占用；发送失败的分卷保留以便重发
+                    if batch_failed:
+                        await asyncio.to_thread(shutil.rmtree, backup_root_dir, True)
+                        for volume_path in set(all_volumes) - set(batch_failed):
+                            await asyncio.to_thread(os.remove, volume_path)
+                        retained_bytes += sum(os.path.getsize(v) for v in batch_failed if os.path.exists(v))
+                        if batch_index < len(batches):
+                            await self._replan_backup_batches(event, batches, batch_index, budget_bytes - retained_bytes,
+                                                              failed_downloads, batch_prefix)
+                    else:
+                        await self.temp_space.discard(batch_dir)
+
+            if downloaded_files_count == 0:
+                await event.send(MessageChain([Comp.Plain(f"❌ 备份任务失败：没有任何文件下载成功。请检查后台日志。")]))
+            elif len(batches) > 1:
+                summary = (
+                    f"✅ 群文件备份完成！\n"
+                    f"成功备份文件数: {downloaded_files_count} 个 (总大小: {utils.format_bytes(downloaded_files_size)})，"
+                    f"分 {len(batches)} 批共发送 {total_volumes} 个文件。"
+                )
+                if failed_downloads:
+                    summary += f"\n⚠️ 备份失败文件数: {len(failed_downloads)} 个 (详见日志)"
+                await event.send(MessageChain([Comp.Plain(summary)]))
 
-                    # 逐个发送分卷文件
-                    all_sent_success = True
-                    for volume_path in all_volumes:
-                        volume_name = os.path.basename(volume_path)
-                        logger.info(f"{log_prefix} 正在发送分卷: {volume_name}...")
-                        
-                        if not await self._upload_and_send_file_via_api(event, volume_path, volume_name):
-                            all_sent_success = False
-                            # 发送失败通知给用户
-                            await event.send(MessageChain([Comp.Plain(f"❌ 文件 {volume_name} 发送失败，请检查 Bot 配置。")]))
-                            break
-                            
-                    if not all_sent_success:
-                        await event.send(MessageChain([Comp.Plain(f"❌ 备份发送中断。请检查日志。")]))
-                    
-                        
-            elif downloaded_files_count == 0:
-                 await event.send(MessageChain([Comp.Plain(f"ℹ️ 备份任务完成。但没有找到符合大小或后缀名限制的任何文件。")]))
-            else:
-                await event.send(MessageChain([Comp.Plain(f"❌ 备份任务失败：压缩文件失败或找不到压缩包。请检查后台日志。")]))
-            
         except Exception as e:
             logger.error(f"{log_prefix} 备份任务执行过程中发生未知异常: {e}", exc_info=True)
             await event.send(MessageChain([Comp.Plain(f"❌ 备份任务执行失败，发生内部错误。请检查后台日志。")]))
         finally:
-             asyncio.create_task(self._cleanup_backup_temp(backup_root_dir, final_zip_path))
+            # 无论正常结束还是在后续批次中途失败，之前批次发送失败的分卷都登记为待重发
+            if failed_volumes:
+                await self._record_pending_delivery(event, group_id, job_dir, failed_volumes, log_prefix)
+            self.jobs.finish(job)
+            # 保留 10 分钟供本地部署用户手动取用（有待重发的分卷时保留更久），超出临时空间配额时会被提前回收
+            keep_for = 600
+            if job_dir and any(d.get("job_dir") == job_dir for d in self.pending_deliveries.values()):
+                keep_for = max(keep_for, self.settings.backup_resume_hours * 3600)
+            await self.temp_space.release(job_dir, keep_for=keep_for)
+
+    async def _record_pending_delivery(self, event: AstrMessageEvent, group_id: int, job_dir: str,
+                                       failed_volumes: List[str], log_prefix: str):
+        """把发送失败的分卷登记为当前会话的待重发项并持久化，随后提示使用 /gfbr。"""
+        self.pending_deliveries[self._upload_target(event)] = {
+            "group_id": group_id,
+            "job_dir": job_dir,
+            "volumes": failed_volumes,
+            "created_at": time.time(),
+        }
+        await self._save_pending_deliveries()
+        try:
+            await event.send(MessageChain([Comp.Plain(
+                f"⚠️ 有 {len(failed_volumes)} 个分卷发送失败，已保留 {self.settings.backup_resume_hours} 小时。\n"
+                f"请在此期间使用 /gfbr 重新发送缺失的分卷。"
+            )]))
+        except Exception as e:
+            logger.warning(f"{log_prefix} 发送待重发提示失败: {e}")
+
+    @filter.command("gfbr")
+    @traced("/gfbr")
+    async def on_group_file_backup_resume_command(self, event: AstrMessageEvent):
+        """重新发送本会话中最近一次备份里发送失败的分卷。"""
+        self._register_bot(event)
+        user_id = int(event.get_sender_id())
+        if user_id not in self.settings.admin_users:
+            await event.send(MessageChain([Comp.Plain("⚠️ 您没有执行群文件备份操作的权限。")]))
+            return
+        target = self._upload_target(event)
+        if target in self.resuming_deliveries:
+            await event.send(MessageChain([Comp.Plain("⚠️ 当前会话的分卷正在重新发送中，无需重复触发。")]))
+            return
+        delivery = self.pending_deliveries.get(target)
+        if not delivery:
+            await event.send(MessageChain([Comp.Plain("ℹ️ 当前会话没有待重新发送的备份分卷。")]))
+            return
+        job_dir = delivery["job_dir"]
+        if not self.temp_space.pin(job_dir):
+            self.pending_deliveries.pop(target, None)
+            await self._save_pending_deliveries()
+            await event.send(MessageChain([Comp.Plain("❌ 备份临时文件已过期被清理，无法重新发送，请重新执行 /gfb。")]))
+            return
+        # 在创建任务前同步占用，两次并发的 /gfbr 不会重复发送同一批分卷
+        self.resuming_deliveries.add(target)
+        self.active_tasks.append(asyncio.create_task(self._resume_backup_delivery(event, target, delivery)))
+        event.stop_event()
+
+    async def _save_pending_deliveries(self):
+        try:
+            await asyncio.to_thread(save_pending_deliveries, self.pending_deliveries_path, dict(self.pending_deliveries))
+        except OSError as e:
+            logger.warning(f"[群文件备份] 保存待重发分卷记录失败: {e}")
+
+    @traced("backup_resume")
+    async def _resume_backup_delivery(self, event: AstrMessageEvent, target: str, delivery: Dict):
+        log_prefix = f"[群文件备份-{delivery['group_id']}-重发]"
+        job_dir = delivery["job_dir"]
+        try:
+            volumes = [v for v in delivery["volumes"] if os.path.exists(v)]
+            missing = len(delivery["volumes"]) - len(volumes)
+            if missing:
+                logger.warning(f"{log_prefix} 有 {missing} 个分卷已不在临时目录中，无法重发。")
+            await event.send(MessageChain([Comp.Plain(f"🔄 开始重新发送 {len(volumes)} 个分卷...")]))
+            failed_volumes = await self._send_volumes(event, volumes, log_prefix)
+            if failed_volumes:
+                delivery["volumes"] = failed_volumes
+                delivery["created_at"] = time.time()
+                await self._save_pending_deliveries()
+                await event.send(MessageChain([Comp.Plain(f"⚠️ 仍有 {len(failed_volumes)} 个分卷发送失败，可稍后再次使用 /gfbr 重试。")]))
+            else:
+                self.pending_deliveries.pop(target, None)
+                await self._save_pending_deliveries()
+                await event.send(MessageChain([Comp.Plain("✅ 缺失的分卷已全部重新发送。" + (f" ({missing} 个分卷已过期)" if missing else ""))]))
+        except Exception as e:
+            logger.error(f"{log_prefix} 重新发送分卷时发生未知异常: {e}", exc_info=True)
+            await event.send(MessageChain([Comp.Plain("❌ 重新发送分卷失败，发生内部错误。请检查后台日志。")]))
+        finally:
+            self.resuming_deliveries.discard(target)
+            keep_for = self.settings.backup_resume_hours * 3600 if target in self.pending_deliveries else 600
+            await self.temp_space.release(job_dir, keep_for=keep_for)
+
+    def _mirror_root(self, group_id: int) -> str:
+        base_dir = self.settings.backup_mirror_dir or os.path.join(self.plugin_data_dir, 'mirror')
+        return os.path.join(base_dir, str(group_id))
+
+    @traced("mirror")
+    async def _perform_group_file_mirror(self, event: AstrMessageEvent, group_id: int, prune: bool, job: Optional[Job] = None):
+        """
+        镜像模式：把群文件按 relative_path 同步到持久的本地目录。
+        依据清单只下载新增或变化的文件，改名/移动的文件在本地移动，不压缩也不上传。
+        """
+        log_prefix = f"[群文件镜像-{group_id}]"
+        root = self._mirror_root(group_id)
+        if job is None:
+            job = self.jobs.start(f"mirror_{group_id}", "群文件镜像同步", group_id, self._event_notifier(event))
+        try:
+            client = self.bot or event.bot
+            await event.send(MessageChain([Comp.Plain(f"🔄 镜像同步已启动，目标群ID: {group_id}。\n只会下载新增或变化的文件，完成后将发送汇总。")]))
+            job.set_phase("获取文件列表")
+
+            all_files_info = await self._get_all_files_with_path(group_id, client)
+            selected_files = self._select_backup_files(all_files_info, log_prefix)
+            manifest = await asyncio.to_thread(load_manifest, root)
+            all_file_ids = {f.get('file_id') for f in all_files_info if f.get('file_id')}
+            plan = await asyncio.to_thread(plan_mirror, root, selected_files, all_file_ids, manifest)
+            delta_size = sum(int(f.get('size') or 0) for f, _ in plan.downloads)
+            logger.info(
+                f"{log_prefix} 清单 {len(manifest)} 项，本次需下载 {len(plan.downloads)} 个 ({utils.format_bytes(delta_size)})，"
+                f"移动 {len(plan.moves)} 个，未变化 {len(plan.unchanged)} 个，群内已删除 {len(plan.stale)} 个。"
+            )
+
+            os.makedirs(root, exist_ok=True)
+            reserve_bytes = self.settings.backup_disk_reserve_mb * 1024 * 1024
+            free = shutil.disk_usage(root).free
+            if free < delta_size + reserve_bytes:
+                await event.send(MessageChain([Comp.Plain(
+                    f"❌ 镜像同步已取消：磁盘空间不足。\n"
+                    f"预计需要 {utils.format_bytes(delta_size + reserve_bytes)}，当前可用 {utils.format_bytes(free)}。"
+                )]))
+                return
+
+            # 1. 本地移动：先全部挪到临时名，再放到新位置，避免互换名称时相互覆盖。
+            #    单个文件移动失败（被占用、权限等）不影响其他文件，改为重新下载到新位置
+            def apply_moves() -> List[tuple[Dict, str]]:
+                moved, fallback = [], []
+                for file_info, old_path, new_path in plan.moves:
+                    src = os.path.join(root, old_path)
+                    tmp = src + ".groupfs-move"
+                    try:
+                        os.replace(src, tmp)
+                    except OSError as e:
+                        logger.warning(f"{log_prefix} 移动 '{old_path}' 失败 ({e})，改为重新下载。")
+                        fallback.append((file_info, new_path))
+                        continue
+                    moved.append((file_info, src, tmp, new_path))
+                for file_info, src, tmp, new_path in moved:
+                    dst = os.path.join(root, new_path)
+                    try:
+                        os.makedirs(os.path.dirname(dst), exist_ok=True)
+                        os.replace(tmp, dst)
+                    except OSError as e:
+                        logger.warning(f"{log_prefix} 移动到 '{new_path}' 失败 ({e})，改为重新下载。")
+                        try:
+                            os.replace(tmp, src)
+                        except OSError:
+                            pass
+                        fallback.append((file_info, new_path))
+                        continue
+                    manifest[file_info['file_id']] = MirrorEntry(new_path, int(file_info.get('size') or 0), int(file_info.get('modify_time') or 0))
+                return fallback
+            failed_moves = await asyncio.to_thread(apply_moves)
+            downloads = plan.downloads + failed_moves
+            delta_size += sum(int(f.get('size') or 0) for f, _ in failed_moves)
+
+            # 2. 下载新增或变化的文件：AtomicStreamWriter 先写临时文件再原子替换，中断时不会留下半个文件，
+            #    内容变化但大小相同的文件也要覆盖，因此不跳过已存在的同名文件
+            target_paths = {path for _, path in downloads} | {new_path for _, _, new_path in plan.moves}
+            target_paths |= {manifest[f['file_id']].relative_path for f in plan.unchanged}
+            failed_downloads = []
+            downloaded_size = 0
+            progress = self.logs.progress('download', log_prefix, total=len(downloads))
+            job.set_phase("同步文件", total=len(downloads), total_bytes=delta_size)
+            for i, (file_info, relative_path) in enumerate(downloads, 1):
+                file_id = file_info['file_id']
+                file_name = file_info.get('file_name', '未知文件')
+                file_size = int(file_info.get('size') or 0)
+                if await self._download_and_save_file(group_id, file_id, file_name, file_size, relative_path, root, client, overwrite=True):
+                    old_entry = manifest.get(file_id)
+                    if old_entry and old_entry.relative_path not in target_paths:
+                        await asyncio.to_thread(self._remove_mirror_file, root, old_entry.relative_path)
+                    manifest[file_id] = MirrorEntry(relative_path, file_size, int(file_info.get('modify_time') or 0))
+                    downloaded_size += file_size
+                    progress.step("已同步", file_name, nbytes=file_size)
+                    job.advance(nbytes=file_size)
+                else:
+                    failed_downloads.append(file_name)
+                    progress.step("失败", file_name)
+                    job.advance()
+                if i % 50 == 0:
+                    await asyncio.to_thread(save_manifest, root, group_id, manifest)
+            progress.finish()
+
+            # 3. 清单中已从群里删除的文件：本地路径被新文件占用的直接移出清单，prune 时删除其余本地文件
+            claimed = {entry.relative_path for file_id, entry in manifest.items() if file_id not in plan.stale}
+            pruned = 0
+            for file_id, entry in plan.stale.items():
+                if entry.relative_path in claimed:
+                    manifest.pop(file_id, None)
+                elif prune:
+                    await asyncio.to_thread(self._remove_mirror_file, root, entry.relative_path)
+                    manifest.pop(file_id, None)
+                    pruned += 1
+            if pruned:
+                await asyncio.to_thread(remove_empty_dirs, root)
+            await asyncio.to_thread(save_manifest, root, group_id, manifest)
+
+            summary = (
+                f"✅ 镜像同步完成！\n"
+                f"新增/更新: {len(downloads) - len(failed_downloads)} 个 ({utils.format_bytes(downloaded_size)})\n"
+                f"本地移动: {len(plan.moves) - len(failed_moves)} 个\n"
+                f"未变化: {len(plan.unchanged)} 个"
+            )
+            if failed_moves:
+                summary += f"\n⚠️ 本地移动失败、已改为重新下载: {len(failed_moves)} 个 (详见日志)"
+            if prune:
+                summary += f"\n已清除群内删除的文件: {pruned} 个"
+            elif plan.stale:
+                summary += f"\n群内已删除但本地保留: {len(plan.stale)} 个 (使用 /gfb mirror prune 清除)"
+            if failed_downloads:
+                summary += f"\n⚠️ 同步失败: {len(failed_downloads)} 个 (详见日志，下次同步会重试)"
+            summary += f"\n镜像目录: {root}"
+            await event.send(MessageChain([Comp.Plain(summary)]))
+        except Exception as e:
+            logger.error(f"{log_prefix} 镜像同步过程中发生未知异常: {e}", exc_info=True)
+            await event.send(MessageChain([Comp.Plain(f"❌ 镜像同步失败，发生内部错误。请检查后台日志。")]))
+        finally:
+            self.jobs.finish(job)
+
+    @staticmethod
+    def _remove_mirror_file(root: str, relative_path: str):
+        try:
+            os.remove(os.path.join(root, relative_path))
+        except FileNotFoundError:
+            pass
 
     @filter.command("gfb")
+    @traced("/gfb")
     async def on_group_file_backup_command(self, event: AstrMessageEvent):
-        if not self.bot: self.bot = event.bot
+        self._register_bot(event)
         
         # 1. 解析目标群ID
         group_id_str = event.get_group_id()
@@ -1187,13 +2546,17 @@ class GroupFSPlugin(Star):
         
         command_parts = event.message_str.split()
         target_group_id: Optional[int] = None
+        # 可选参数：mirror 切换为镜像模式，prune 同时清除群内已删除的文件
+        options = {part.lower() for part in command_parts[1:] if not part.isdigit()}
+        group_args = [part for part in command_parts[1:] if part.isdigit()]
+        mirror_mode = 'mirror' in options
+        prune = 'prune' in options
+        if options - {'mirror', 'prune'} or (prune and not mirror_mode):
+            await event.send(MessageChain([Comp.Plain("❌ 格式错误。用法: /gfb [群号] [mirror [prune]]")]))
+            return
         
-        if len(command_parts) > 1:
-            try:
-                target_group_id = int(command_parts[1])
-            except ValueError:
-                await event.send(MessageChain([Comp.Plain("❌ 格式错误：请提供有效的群号。用法: /gfb [群号]")]))
-                return
+        if group_args:
+            target_group_id = int(group_args[0])
         elif group_id_str:
             # 群聊中且没有参数，备份当前群
             target_group_id = int(group_id_str)
@@ -1205,20 +2568,140 @@ class GroupFSPlugin(Star):
         logger.info(f"用户 {user_id} 触发 /gfb 备份指令，目标群ID: {target_group_id}")
 
         # 2. 权限和白名单校验
-        if user_id not in self.admin_users:
+        if user_id not in self.settings.admin_users:
             await event.send(MessageChain([Comp.Plain("⚠️ 您没有执行群文件备份操作的权限。")]))
             return
         
-        if self.group_whitelist and target_group_id not in self.group_whitelist:
+        if self.settings.group_whitelist and target_group_id not in self.settings.group_whitelist:
             await event.send(MessageChain([Comp.Plain("⚠️ 目标群聊不在插件配置的白名单中，操作已拒绝。")]))
             return
 
-        # 3. 启动异步备份任务
-        self.active_tasks.append(asyncio.create_task(
-            self._perform_group_file_backup(event, target_group_id)
-        ))
+        # 3. 启动异步备份任务；同一群的备份/镜像已在运行时只回复进度
+        if mirror_mode:
+            job = await self._start_job_or_reply(event, f"mirror_{target_group_id}", "群文件镜像同步", target_group_id)
+            task = self._perform_group_file_mirror(event, target_group_id, prune, job) if job else None
+        else:
+            job = await self._start_job_or_reply(event, f"backup_{target_group_id}", "群文件备份", target_group_id)
+            task = self._perform_group_file_backup(event, target_group_id, job) if job else None
+        if task is None:
+            return
+        self.active_tasks.append(asyncio.create_task(task))
         event.stop_event()
 
+    @filter.command("gfj")
+    @traced("/gfj")
+    async def on_job_status_command(self, event: AstrMessageEvent):
+        """查询正在运行的长任务（备份、镜像、失效文件扫描）的进度。"""
+        self._register_bot(event)
+        user_id = int(event.get_sender_id())
+        if user_id not in self.settings.admin_users:
+            await event.send(MessageChain([Comp.Plain("⚠️ 您没有执行此操作的权限。")]))
+            return
+        jobs = self.jobs.list()
+        if not jobs:
+            await event.send(MessageChain([Comp.Plain("ℹ️ 当前没有正在运行的长任务。")]))
+            return
+        report = ReportBuilder(f"📊 正在运行的任务 ({len(jobs)} 个)：")
+        report.add_entries("-" * 20 + "\n" + job.describe() for job in jobs)
+        await self._send_or_forward(event, report, name="任务进度")
+
+    def _snapshot_dir(self, group_id: int) -> str:
+        return os.path.join(self.plugin_data_dir, 'snapshots', str(group_id))
+
+    @filter.command("gfs")
+    @traced("/gfs")
+    async def on_group_file_snapshot_command(self, event: AstrMessageEvent):
+        self._register_bot(event)
+        group_id = int(event.get_group_id())
+        user_id = int(event.get_sender_id())
+        if user_id not in self.settings.admin_users:
+            await event.send(MessageChain([Comp.Plain("⚠️ 您没有执行此操作的权限。")]))
+            return
+        command_parts = event.message_str.split()
+        snapshot_dir = self._snapshot_dir(group_id)
+
+        if len(command_parts) > 1 and command_parts[1] == "list":
+            names = snapshot.list_snapshots(snapshot_dir)
+            if not names:
+                await event.send(MessageChain([Comp.Plain("ℹ️ 本群还没有任何文件快照。使用 /gfs 创建一份。")]))
+                return
+            report = ReportBuilder(f"🗂️ 本群共有 {len(names)} 份文件快照 (1 为最新)：")
+            report.add_entries(f"[{i}] {name}" for i, name in enumerate(names, 1))
+            report.add_line("使用 /gfsd <快照A> <快照B> 比较两份快照。")
+            await self._send_or_forward(event, report, name="文件快照列表")
+            return
+
+        logger.info(f"[{group_id}] 用户 {user_id} 触发 /gfs 文件快照指令。")
+        try:
+            all_files = await self._get_all_files_with_path(group_id, event.bot)
+            name = time.strftime("%Y%m%d_%H%M%S")
+            path = snapshot.snapshot_path(snapshot_dir, name)
+            count = await asyncio.to_thread(snapshot.write_snapshot, path, group_id, all_files)
+            size = os.path.getsize(path)
+            logger.info(f"[{group_id}] 文件快照已保存: {path} ({count} 个文件, {utils.format_bytes(size)})")
+            await event.send(MessageChain([Comp.Plain(f"✅ 已保存文件快照「{name}」，共 {count} 个文件 ({utils.format_bytes(size)})。")]))
+        except Exception as e:
+            logger.error(f"[{group_id}] 保存文件快照时发生未知异常: {e}", exc_info=True)
+            await event.send(MessageChain([Comp.Plain("❌ 保存文件快照时发生内部错误，请检查后台日志。")]))
+
+    @filter.command("gfsd")
+    @traced("/gfsd")
+    async def on_group_file_snapshot_diff_command(self, event: AstrMessageEvent):
+        self._register_bot(event)
+        group_id = int(event.get_group_id())
+        user_id = int(event.get_sender_id())
+        if user_id not in self.settings.admin_users:
+            await event.send(MessageChain([Comp.Plain("⚠️ 您没有执行此操作的权限。")]))
+            return
+        snapshot_dir = self._snapshot_dir(group_id)
+        command_parts = event.message_str.split()
+        refs = command_parts[1:3]
+        # 缺省时比较最近的两份快照；只给一个参数时与最新快照比较
+        if len(refs) == 0:
+            refs = ["2", "1"]
+        elif len(refs) == 1:
+            refs.append("1")
+
+        old_name = snapshot.resolve_snapshot(snapshot_dir, refs[0])
+        new_name = snapshot.resolve_snapshot(snapshot_dir, refs[1])
+        if not old_name or not new_name:
+            await event.send(MessageChain([Comp.Plain("❌ 找不到指定的快照。使用 /gfs list 查看可用快照。用法: /gfsd <快照A> <快照B>")]))
+            return
+        if old_name > new_name:
+            old_name, new_name = new_name, old_name
+
+        try:
+            _, old_entries = await asyncio.to_thread(snapshot.read_snapshot, snapshot.snapshot_path(snapshot_dir, old_name))
+            _, new_entries = await asyncio.to_thread(snapshot.read_snapshot, snapshot.snapshot_path(snapshot_dir, new_name))
+            diff = snapshot.diff_snapshots(old_entries, new_entries)
+        except Exception as e:
+            logger.error(f"[{group_id}] 比较文件快照时发生未知异常: {e}", exc_info=True)
+            await event.send(MessageChain([Comp.Plain("❌ 读取或比较快照时发生内部错误，请检查后台日志。")]))
+            return
+
+        def path_of(entry: snapshot.SnapshotEntry) -> str:
+            return os.path.join(entry.folder, entry.file_name) if entry.folder else entry.file_name
+
+        report = ReportBuilder(f"📊 文件快照对比：{old_name} → {new_name}")
+        report.add_line(f"文件数: {len(old_entries)} → {len(new_entries)}")
+        report.add_line(
+            f"新增 {len(diff.added)} | 删除 {len(diff.removed)} | 改名 {len(diff.renamed)} | "
+            f"移动 {len(diff.moved)} | 大小变化 {len(diff.resized)}"
+        )
+        sections = [
+            ("➕ 新增", diff.added, lambda e: f"- {path_of(e)} ({utils.format_bytes(e.size)})"),
+            ("➖ 删除", diff.removed, lambda e: f"- {path_of(e)} ({utils.format_bytes(e.size)})"),
+            ("✏️ 改名", diff.renamed, lambda p: f"- {p[0].file_name} → {p[1].file_name}"),
+            ("📁 移动", diff.moved, lambda p: f"- {p[1].file_name}: {p[0].folder or '根目录'} → {p[1].folder or '根目录'}"),
+            ("📐 大小变化", diff.resized, lambda p: f"- {path_of(p[1])}: {utils.format_bytes(p[0].size)} → {utils.format_bytes(p[1].size)}"),
+        ]
+        for title, items, fmt in sections:
+            if items:
+                report.add_separator()
+                report.add_line(f"{title} ({len(items)})")
+                report.add_entries(map(fmt, items))
+        await self._send_or_forward(event, report, name="文件快照对比")
+
     async def terminate(self):
         logger.info("插件 [群文件系统GroupFS] 正在卸载，取消所有任务...")
 
@@ -1229,6 +2712,10 @@ class GroupFSPlugin(Star):
             except Exception as e:
                 logger.error(f"停止 APScheduler 时发生错误: {e}")
 
+        self.listing_flight.cancel_all()
+        self.listing_streams.cancel_all()
+        self.jobs.cancel_all()
+        self.deferred_jobs.clear()
         for task in self.active_tasks:
             if not task.done():
                 task.cancel()
@@ -1237,5 +2724,11 @@ class GroupFSPlugin(Star):
             await asyncio.gather(*self.active_tasks, return_exceptions=True)
         except asyncio.CancelledError:
             pass
+
+        await self.temp_space.close()
+        self.tracer.close()
         
-        logger.info("插件 [群文件系统GroupFS] 已卸载。")
\ No newline at end of file
+        logger.info("插件 [群文件系统GroupFS] 已卸载。")
+
+
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
@@ -0,0 +1,93 @@
+# astrbot_plugin_GroupFS/mirror.py
+
+import json
+import os
+from typing import Dict, List, NamedTuple, Set, Tuple
+
+MANIFEST_NAME = ".groupfs_manifest.json"
+MANIFEST_VERSION = 1
+
+
+class MirrorEntry(NamedTuple):
+    """清单中的一条记录：某个群文件在本地镜像中的位置与同步时的版本。"""
+    relative_path: str
+    size: int
+    modify_time: int
+
+
+class MirrorPlan(NamedTuple):
+    downloads: List[Tuple[Dict, str]]   # (文件信息, 本地相对路径)，新增或内容已变化
+    moves: List[Tuple[Dict, str, str]]  # (文件信息, 旧相对路径, 新相对路径)，仅改名或移动
+    unchanged: List[Dict]
+    stale: Dict[str, MirrorEntry]       # 群里已不存在的文件
+
+
+def load_manifest(root: str) -> Dict[str, MirrorEntry]:
+    try:
+        with open(os.path.join(root, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {file_id: MirrorEntry(*entry) for file_id, entry in data.get("files", {}).items()}
+    except (OSError, ValueError, TypeError):
+        return {}
+
+
+def save_manifest(root: str, group_id: int, manifest: Dict[str, MirrorEntry]) -> None:
+    """先写临时文件再原子替换，中断时清单要么是旧的要么是新的。"""
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    data = {"version": MANIFEST_VERSION, "group_id": group_id, "files": {k: list(v) for k, v in manifest.items()}}
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def _safe_relative_path(relative_path: str) -> str:
+    """去掉可能越出镜像根目录的路径成分。"""
+    parts = [p for p in relative_path.replace('\\', '/').split('/') if p not in ('', '.', '..')]
+    return os.path.join(*parts) if parts else "unnamed"
+
+
+def _disambiguate(relative_path: str, file_id: str, claimed: Set[str]) -> str:
+    """同一文件夹内允许同名文件，后出现的加上 file_id 前缀区分。"""
+    if relative_path not in claimed:
+        return relative_path
+    base, ext = os.path.splitext(relative_path)
+    return f"{base} ({file_id.strip('/')[:8]}){ext}"
+
+
+def plan_mirror(root: str, files: List[Dict], all_file_ids: Set[str], manifest: Dict[str, MirrorEntry]) -> MirrorPlan:
+    """
+    对比群文件与清单，得出本次同步要做的事。
+    files 为符合备份条件的文件；all_file_ids 为群内全部文件的 ID，用于判断哪些清单条目已从群里删除。
+    大小与修改时间都未变且本地文件仍在的视为未变化；只有路径变化的在本地移动，不重新下载。
+    """
+    downloads, moves, unchanged = [], [], []
+    claimed: Set[str] = set()
+    for file_info in files:
+        file_id = file_info.get('file_id')
+        if not file_id:
+            continue
+        relative_path = _disambiguate(_safe_relative_path(file_info.get('relative_path', '')), file_id, claimed)
+        claimed.add(relative_path)
+        entry = manifest.get(file_id)
+        size = int(file_info.get('size') or 0)
+        modify_time = int(file_info.get('modify_time') or 0)
+        if entry is None or entry.size != size or entry.modify_time != modify_time:
+            downloads.append((file_info, relative_path))
+            continue
+        local_path = os.path.join(root, entry.relative_path)
+        if not os.path.isfile(local_path) or os.path.getsize(local_path) != size:
+            downloads.append((file_info, relative_path))
+        elif entry.relative_path != relative_path:
+            moves.append((file_info, entry.relative_path, relative_path))
+        else:
+            unchanged.append(file_info)
+    stale = {file_id: entry for file_id, entry in manifest.items() if file_id not in all_file_ids}
+    return MirrorPlan(downloads, moves, unchanged, stale)
+
+
+def remove_empty_dirs(root: str) -> None:
+    for dirpath, _, _ in sorted(os.walk(root), key=lambda item: len(item[0]), reverse=True):
+        if dirpath != root and not os.listdir(dirpath):
+            os.rmdir(dirpath)
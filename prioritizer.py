@@ -0,0 +1,57 @@
+# astrbot_plugin_GroupFS/prioritizer.py
+
+import json
+import math
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DAY = 86400
+
+# 历史探测结果：file_id -> (上次探测时间, 上次是否有效)
+ProbeHistory = Dict[str, Tuple[float, bool]]
+
+
+def load_history(path: str) -> ProbeHistory:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {file_id: (float(ts), bool(ok)) for file_id, (ts, ok) in json.load(f).items()}
+    except (OSError, ValueError, TypeError):
+        return {}
+
+
+def save_history(path: str, history: ProbeHistory) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({file_id: [ts, ok] for file_id, (ts, ok) in history.items()}, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def probe_priority(file_info: Dict, last_probe: Optional[Tuple[float, bool]], now: float) -> float:
+    """
+    估计一个文件已失效的可能性，分数越高越先探测。
+    - 列表中的 dead_time 已过期的排在最前，即将过期的次之；
+    - 其余按上传/修改时间计算的文件年龄（对数尺度）排序，越旧越可能失效；
+    - 最近探测过且有效的文件降权，降权幅度随时间衰减；从未探测过的文件略微提前。
+    """
+    dead_time = int(file_info.get('dead_time') or 0)
+    if dead_time:
+        if dead_time <= now:
+            return 1000.0
+        if dead_time - now <= DAY:
+            return 500.0
+    born = max(int(file_info.get('upload_time') or 0), int(file_info.get('modify_time') or 0))
+    age_days = max(0.0, (now - born) / DAY) if born else 365.0
+    score = math.log1p(age_days) * 10
+    if last_probe is None:
+        score += 5
+    else:
+        probed_at, was_valid = last_probe
+        if was_valid:
+            # 刚确认有效的文件降权最多，约一个月后基本恢复
+            score -= 30 * math.exp(-max(0.0, now - probed_at) / (30 * DAY))
+    return score
+
+
+def order_for_probing(files: Iterable[Dict], history: ProbeHistory, now: float) -> List[Dict]:
+    return sorted(files, key=lambda f: probe_priority(f, history.get(f.get('file_id')), now), reverse=True)
@@ -0,0 +1,118 @@
+# astrbot_plugin_GroupFS/progress.py
+
+import logging
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from astrbot.api import logger
+
+from . import utils
+
+# 子系统名称：遍历、探测、删除、下载、消息发送
+SUBSYSTEMS = ('traversal', 'probe', 'delete', 'download', 'send')
+
+LEVEL_NAMES = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+}
+
+
+class SubsystemLog:
+    """
+    按子系统过滤日志。每个子系统有独立的级别阈值，低于阈值的消息直接丢弃；
+    通过阈值的 DEBUG 消息按 INFO 输出，这样只为某个子系统打开明细时，
+    不需要把整个 AstrBot 的日志级别调到 DEBUG。
+    """
+
+    def __init__(self, levels: Optional[Dict[str, int]] = None, interval_seconds: float = 15, sample_every: int = 100):
+        self.levels = levels or {}
+        self.interval_seconds = interval_seconds
+        self.sample_every = max(1, sample_every)
+
+    def enabled(self, subsystem: str, level: int) -> bool:
+        return level >= self.levels.get(subsystem, logging.INFO)
+
+    def log(self, subsystem: str, level: int, message: str):
+        if self.enabled(subsystem, level):
+            logger.log(max(level, logging.INFO), message)
+
+    def progress(self, subsystem: str, prefix: str, total: Optional[int] = None, done: int = 0,
+                 unit: str = "个文件") -> "ProgressLog":
+        return ProgressLog(self, subsystem, prefix, total=total, done=done, unit=unit)
+
+
+class ProgressLog:
+    """
+    热循环中的聚合进度日志。循环每处理一项调用一次 step()，
+    每隔 interval_seconds 输出一条汇总（进度、速率、预计剩余时间、各结果计数、最近的错误），
+    逐项明细每 sample_every 项抽样一条，以 DEBUG 级别输出。
+    出错的项目前 MAX_ERROR_LINES 条逐条以 WARNING 输出，之后只计入汇总，避免刷屏。
+    """
+
+    MAX_ERROR_LINES = 20
+
+    def __init__(self, sink: SubsystemLog, subsystem: str, prefix: str, total: Optional[int] = None,
+                 done: int = 0, unit: str = "个文件"):
+        self.sink = sink
+        self.subsystem = subsystem
+        self.prefix = prefix
+        self.total = total
+        self.unit = unit
+        self.done = done
+        self.counts: Counter = Counter()
+        self.errors = 0
+        self.last_error = ""
+        self.nbytes = 0
+        self._started_done = done
+        self._started = time.monotonic()
+        self._last_summary = self._started
+
+    def step(self, outcome: str = "完成", detail: str = "", count: int = 1, nbytes: int = 0,
+             error: Optional[str] = None):
+        """记录处理完的 count 项。outcome 为汇总中的分类名，error 非空时计为出错。"""
+        self.done += count
+        self.counts[outcome] += count
+        self.nbytes += nbytes
+        if error is not None:
+            self.errors += 1
+            self.last_error = f"{detail}: {error}" if detail else error
+            if self.errors <= self.MAX_ERROR_LINES:
+                self.sink.log(self.subsystem, logging.WARNING, f"{self.prefix} {outcome} {self.last_error}")
+                if self.errors == self.MAX_ERROR_LINES:
+                    self.sink.log(self.subsystem, logging.WARNING, f"{self.prefix} 错误较多，后续错误只计入汇总。")
+        elif detail and self.done % self.sink.sample_every < count:
+            self.sink.log(self.subsystem, logging.DEBUG, f"{self.prefix} ({self._position()}) {outcome}: {detail}")
+        if time.monotonic() - self._last_summary >= self.sink.interval_seconds:
+            self._summarize("进度")
+
+    def note(self, outcome: str, count: int = 1):
+        """只计数、不推进进度，例如遍历时的文件夹数。"""
+        self.counts[outcome] += count
+
+    def finish(self, note: str = ""):
+        self._summarize("完成" + (f" ({note})" if note else ""))
+
+    def _position(self) -> str:
+        return f"{self.done}/{self.total}" if self.total is not None else str(self.done)
+
+    def _summarize(self, label: str):
+        now = time.monotonic()
+        self._last_summary = now
+        elapsed = max(now - self._started, 1e-6)
+        rate = (self.done - self._started_done) / elapsed
+        text = f"{self.prefix} {label}: {self._position()} {self.unit}"
+        if self.total:
+            text += f" ({self.done * 100 // self.total}%)"
+        text += f"，耗时 {elapsed:.0f} 秒，速率 {rate:.1f} {self.unit}/秒"
+        if self.nbytes:
+            text += f"，共 {utils.format_bytes(self.nbytes)} ({utils.format_bytes(int(self.nbytes / elapsed))}/秒)"
+        if self.total and rate > 0 and self.done < self.total:
+            text += f"，预计剩余 {(self.total - self.done) / rate:.0f} 秒"
+        if self.counts:
+            text += "；" + "，".join(f"{name} {count}" for name, count in self.counts.items())
+        if self.errors:
+            text += f"；出错 {self.errors} 次，最近: {self.last_error}"
+        self.sink.log(self.subsystem, logging.INFO, text)
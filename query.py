@@ -0,0 +1,219 @@
+# astrbot_plugin_GroupFS/query.py
+
+import bisect
+import datetime
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .records import FileRecord
+
+_SIZE_RE = re.compile(r'^size(>=|<=|>|<)([\d.]+)\s*([kmgt]?i?b?)$', re.IGNORECASE)
+_SIZE_UNITS = {'': 1024 ** 2, 'b': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+_SORT_KEYS = {'size': 'size', 'time': 'modify_time', 'name': 'file_name'}
+
+
+class QueryError(ValueError):
+    """查询语法错误，消息直接展示给用户。"""
+
+
+@dataclass
+class FileQuery:
+    """
+    /sf 与 /df 的结构化查询。不含任何 key:value 条件时退化为原来的文件名子串匹配。
+    数值范围均为左闭右开：min_size <= size < max_size，after <= modify_time < before。
+    """
+    terms: List[str] = field(default_factory=list)
+    uploader: Optional[str] = None
+    extensions: Tuple[str, ...] = ()
+    folder: Optional[str] = None
+    min_size: Optional[int] = None
+    max_size: Optional[int] = None
+    after: Optional[int] = None
+    before: Optional[int] = None
+    sort_key: Optional[str] = None
+    sort_desc: bool = False
+
+    @property
+    def is_structured(self) -> bool:
+        return any(value is not None for value in (
+            self.uploader, self.folder, self.min_size, self.max_size, self.after, self.before, self.sort_key,
+        )) or bool(self.extensions)
+
+
+def _parse_size(number: str, unit: str) -> int:
+    """单位为 B、K/KB/KiB、M/MB/MiB 等（不区分大小写，均按 1024 进制），不写单位时为 MB。"""
+    try:
+        value = float(number)
+    except ValueError:
+        raise QueryError(f"无法识别的大小「{number}{unit}」")
+    unit = unit.lower()
+    prefix, suffix = (unit, '') if unit in ('', 'b') else (unit[:1], unit[1:])
+    if prefix not in _SIZE_UNITS or suffix not in ('', 'b', 'ib'):
+        raise QueryError(f"无法识别的大小单位「{unit}」，可用 B、KB、MB、GB、TB")
+    return int(value * _SIZE_UNITS[prefix])
+
+
+def _parse_date(text: str) -> Tuple[datetime.datetime, datetime.datetime]:
+    """解析 YYYY、YYYY-MM 或 YYYY-MM-DD，返回该时间段的 [起点, 终点)。"""
+    parts = text.replace('/', '-').split('-')
+    try:
+        if len(parts) == 1:
+            start = datetime.datetime(int(parts[0]), 1, 1)
+            return start, start.replace(year=start.year + 1)
+        if len(parts) == 2:
+            start = datetime.datetime(int(parts[0]), int(parts[1]), 1)
+            end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+            return start, end
+        if len(parts) == 3:
+            start = datetime.datetime(int(parts[0]), int(parts[1]), int(parts[2]))
+            return start, start + datetime.timedelta(days=1)
+    except ValueError:
+        pass
+    raise QueryError(f"无法识别的日期「{text}」，应为 2024、2024-01 或 2024-01-31")
+
+
+def parse_query(text: str) -> FileQuery:
+    """
+    解析查询字符串。支持的条件（可任意组合，不带条件的词按文件名匹配，多个词需同时命中）：
+    uploader:<昵称或QQ号>  ext:<扩展名[,扩展名]>  folder:<文件夹>（/ 表示根目录）
+    size>100MB  size<=1.5GB（不写单位时为 MB）  before:<日期>  after:<日期>
+    sort:size|time|name（前加 - 为降序，如 sort:-size）
+    """
+    query = FileQuery()
+    for token in text.split():
+        size_match = _SIZE_RE.match(token)
+        if size_match:
+            op, number, unit = size_match.groups()
+            value = _parse_size(number, unit)
+            if op == '>':
+                query.min_size = value + 1
+            elif op == '>=':
+                query.min_size = value
+            elif op == '<':
+                query.max_size = value
+            else:
+                query.max_size = value + 1
+            continue
+        if token[:5].lower() in ('size>', 'size<'):
+            raise QueryError(f"无法识别的大小条件「{token}」，例如 size>100MB、size<=1.5GB")
+        key, sep, value = token.partition(':')
+        key = key.lower()
+        if not sep or key not in ('uploader', 'ext', 'folder', 'before', 'after', 'sort'):
+            query.terms.append(token)
+            continue
+        if not value:
+            raise QueryError(f"条件「{token}」缺少取值")
+        if key == 'uploader':
+            query.uploader = value
+        elif key == 'ext':
+            query.extensions = tuple(ext.strip().lstrip('.').lower() for ext in value.split(',') if ext.strip())
+        elif key == 'folder':
+            query.folder = value
+        elif key == 'before':
+            query.before = int(_parse_date(value)[0].timestamp())
+        elif key == 'after':
+            query.after = int(_parse_date(value)[0].timestamp())
+        else:
+            desc = value.startswith('-')
+            sort_key = _SORT_KEYS.get(value.lstrip('-').lower())
+            if sort_key is None:
+                raise QueryError(f"不支持的排序字段「{value}」，可选 size、time、name")
+            query.sort_key, query.sort_desc = sort_key, desc
+    if query.min_size is not None and query.max_size is not None and query.min_size >= query.max_size:
+        raise QueryError("大小范围为空")
+    return query
+
+
+def match_name(file_info, term: str) -> bool:
+    file_name = file_info.get('file_name', '')
+    base_name, _ = os.path.splitext(file_name)
+    return term in base_name or term in file_name
+
+
+class FileIndex:
+    """
+    一次群文件列表上的字段索引：扩展名、上传者、文件夹为哈希索引，大小与修改时间为排序索引（二分查找取区间）。
+    查询时从候选最少的索引出发，其余条件只在这些候选上逐个校验，组合条件的耗时与最小候选集成正比。
+    索引与其列表绑定，列表更新（重新遍历）后应重建。
+    """
+
+    def __init__(self, files: Sequence[FileRecord]):
+        self.files = files
+        self._by_ext: Dict[str, List[int]] = defaultdict(list)
+        self._by_uploader: Dict[int, List[int]] = defaultdict(list)
+        self._by_folder: Dict[str, List[int]] = defaultdict(list)
+        self._uploader_names: Dict[int, str] = {}
+        for i, record in enumerate(files):
+            self._by_ext[os.path.splitext(record.file_name)[1].lstrip('.').lower()].append(i)
+            self._by_uploader[record.uploader].append(i)
+            self._by_folder[record.folder].append(i)
+            if record.uploader_name:
+                self._uploader_names[record.uploader] = record.uploader_name
+        self._size_order, self._size_keys = self._sorted_index('size')
+        self._time_order, self._time_keys = self._sorted_index('modify_time')
+
+    def _sorted_index(self, attr: str) -> Tuple[List[int], List[int]]:
+        order = sorted(range(len(self.files)), key=lambda i: getattr(self.files[i], attr))
+        return order, [getattr(self.files[i], attr) for i in order]
+
+    @staticmethod
+    def _range(order: List[int], keys: List[int], low: Optional[int], high: Optional[int]) -> List[int]:
+        start = bisect.bisect_left(keys, low) if low is not None else 0
+        end = bisect.bisect_left(keys, high) if high is not None else len(keys)
+        return order[start:end]
+
+    def _uploader_ids(self, uploader: str) -> List[int]:
+        needle = uploader.lower()
+        ids = [uid for uid, name in self._uploader_names.items() if needle in name.lower()]
+        if uploader.isdigit() and int(uploader) in self._by_uploader:
+            ids.append(int(uploader))
+        return ids
+
+    def _folders(self, folder: str) -> List[str]:
+        if folder in ('/', '根目录'):
+            return ['']
+        needle = folder.strip('/').lower()
+        return [path for path in self._by_folder if path and needle in path.lower()]
+
+    def search(self, query: FileQuery) -> List[FileRecord]:
+        # 每个条件给出 (候选位置, 逐项校验函数)
+        criteria: List[Tuple[Sequence[int], Callable[[FileRecord], bool]]] = []
+        if query.extensions:
+            exts = set(query.extensions)
+            criteria.append((
+                [i for ext in exts for i in self._by_ext.get(ext, ())],
+                lambda r: os.path.splitext(r.file_name)[1].lstrip('.').lower() in exts,
+            ))
+        if query.uploader is not None:
+            ids = set(self._uploader_ids(query.uploader))
+            criteria.append(([i for uid in ids for i in self._by_uploader[uid]], lambda r: r.uploader in ids))
+        if query.folder is not None:
+            folders = set(self._folders(query.folder))
+            criteria.append(([i for path in folders for i in self._by_folder[path]], lambda r: r.folder in folders))
+        if query.min_size is not None or query.max_size is not None:
+            low, high = query.min_size, query.max_size
+            criteria.append((
+                self._range(self._size_order, self._size_keys, low, high),
+                lambda r: (low is None or r.size >= low) and (high is None or r.size < high),
+            ))
+        if query.after is not None or query.before is not None:
+            low, high = query.after, query.before
+            criteria.append((
+                self._range(self._time_order, self._time_keys, low, high),
+                lambda r: (low is None or r.modify_time >= low) and (high is None or r.modify_time < high),
+            ))
+
+        if criteria:
+            criteria.sort(key=lambda item: len(item[0]))
+            (positions, _), checks = criteria[0], [check for _, check in criteria[1:]]
+            # 无排序要求时按位置排序，保持与普通搜索一致的遍历顺序
+            positions = sorted(i for i in positions if all(check(self.files[i]) for check in checks))
+        else:
+            positions = range(len(self.files))
+        matched = [self.files[i] for i in positions if all(match_name(self.files[i], t) for t in query.terms)]
+        if query.sort_key:
+            matched.sort(key=lambda r: getattr(r, query.sort_key), reverse=query.sort_desc)
+        return matched
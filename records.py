@@ -0,0 +1,90 @@
+# astrbot_plugin_GroupFS/records.py
+
+import os
+import sys
+from typing import Any, Dict, Iterator
+
+_MISSING = object()
+
+
+class FileRecord:
+    """
+    群文件列表中的一条紧凑记录。
+    OneBot 返回的每个文件都是一个完整的字典，遍历时再加上 relative_path 等字段，
+    十万级文件的群一次遍历就要数百 MB。这里只保留插件用到的字段，使用 __slots__ 存储，
+    所在文件夹路径按文件夹共享同一个字符串对象，上传者昵称做驻留 (intern)，
+    relative_path 与 parent_folder_name 在读取时才拼接。
+    同时提供只读的字典式访问 (get / [])，沿用原有的 file_info.get('...') 写法。
+    """
+
+    __slots__ = (
+        'file_id', 'file_name', 'folder', 'folder_id', 'size', 'modify_time', 'upload_time',
+        'dead_time', 'uploader', 'uploader_name', 'busid', 'download_times',
+    )
+
+    def __init__(self, file_id: str, file_name: str, folder: str, folder_id: str = '/', size: int = 0, modify_time: int = 0,
+                 upload_time: int = 0, dead_time: int = 0, uploader: int = 0, uploader_name: str = '',
+                 busid: int = 0, download_times: int = 0):
+        self.file_id = file_id
+        self.file_name = file_name
+        self.folder = folder
+        self.folder_id = folder_id
+        self.size = size
+        self.modify_time = modify_time
+        self.upload_time = upload_time
+        self.dead_time = dead_time
+        self.uploader = uploader
+        self.uploader_name = uploader_name
+        self.busid = busid
+        self.download_times = download_times
+
+    @classmethod
+    def from_api(cls, file_info: Dict, folder: str, folder_id: str = '/') -> "FileRecord":
+        """
+        由 get_group_root_files / get_group_files_by_folder 返回的文件字典构造。
+        folder 与 folder_id 为所在文件夹的路径与 ID，应传入该文件夹共享的字符串对象。
+        """
+        return cls(
+            file_id=file_info.get('file_id') or '',
+            file_name=file_info.get('file_name') or '',
+            folder=folder,
+            folder_id=folder_id,
+            size=int(file_info.get('size') or 0),
+            modify_time=int(file_info.get('modify_time') or 0),
+            upload_time=int(file_info.get('upload_time') or 0),
+            dead_time=int(file_info.get('dead_time') or 0),
+            uploader=int(file_info.get('uploader') or 0),
+            uploader_name=sys.intern(file_info.get('uploader_name') or ''),
+            busid=int(file_info.get('busid') or 0),
+            download_times=int(file_info.get('download_times') or 0),
+        )
+
+    @property
+    def relative_path(self) -> str:
+        return os.path.join(self.folder, self.file_name)
+
+    @property
+    def parent_folder_name(self) -> str:
+        return self.folder or '根目录'
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = getattr(self, key, _MISSING) if key in _KEYS else _MISSING
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return key in _KEYS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_KEYS)
+
+    def __repr__(self) -> str:
+        return f"FileRecord({self.file_id!r}, {self.relative_path!r}, size={self.size})"
+
+
+_KEYS = frozenset(FileRecord.__slots__) | {'relative_path', 'parent_folder_name'}
@@ -0,0 +1,119 @@
+# astrbot_plugin_GroupFS/report.py
+
+from itertools import chain
+from typing import Iterable, Iterator, List
+
+# --- 常量：报告分页的默认限制 ---
+NODE_CHAR_LIMIT = 3000       # 单个合并转发节点的最大字符数
+NODES_PER_MESSAGE = 30       # 单条合并转发消息的最大节点数
+MESSAGE_CHAR_LIMIT = 60000   # 单条合并转发消息的最大总字符数
+PLAIN_CHAR_LIMIT = 4000      # 单条普通消息的最大字符数
+MAX_PLAIN_MESSAGES = 5       # 以普通消息发送时最多发送的条数，其余部分只给出摘要
+
+
+class ReportBuilder:
+    """
+    流式报告构建器。
+    报告由若干「块」组成：块可以是单行文本，也可以是包含多行的条目。
+    条目以可迭代对象（通常是生成器）惰性提供，只在渲染时才被消费；
+    分页时按块/行边界打包，保证条目不会在中间被截断。
+    """
+
+    def __init__(self, title: str = ""):
+        self._parts: List[Iterable[str]] = []
+        if title:
+            self._parts.append([title])
+
+    @classmethod
+    def from_text(cls, text: str) -> "ReportBuilder":
+        """将一段已有的文本包装为报告，每行作为一个块。"""
+        builder = cls()
+        builder._parts.append(text.split("\n"))
+        return builder
+
+    def add_line(self, line: str = "") -> "ReportBuilder":
+        self._parts.append([line])
+        return self
+
+    def add_separator(self, width: int = 20) -> "ReportBuilder":
+        return self.add_line("-" * width)
+
+    def add_entries(self, entries: Iterable[str]) -> "ReportBuilder":
+        """追加一组条目。entries 可以是生成器，渲染前不会被消费。"""
+        self._parts.append(entries)
+        return self
+
+    def iter_blocks(self) -> Iterator[str]:
+        return chain.from_iterable(self._parts)
+
+    def render(self) -> str:
+        """渲染为完整文本（线性时间）。"""
+        return "\n".join(self.iter_blocks())
+
+
+def _split_oversized_block(block: str, limit: int) -> Iterator[str]:
+    """将超过单节点上限的块按行拆开；单行仍超限时才按长度硬切。"""
+    for line in block.split("\n"):
+        if len(line) <= limit:
+            yield line
+        else:
+            for i in range(0, len(line), limit):
+                yield line[i:i + limit]
+
+
+def pack_blocks(blocks: Iterable[str], node_limit: int = NODE_CHAR_LIMIT) -> Iterator[str]:
+    """
+    将块按顺序打包为不超过 node_limit 字符的节点文本。
+    每个块只被拼接一次，整体为线性时间。
+    """
+    buffer: List[str] = []
+    buffer_len = 0
+    for block in blocks:
+        pieces = [block] if len(block) <= node_limit else _split_oversized_block(block, node_limit)
+        for piece in pieces:
+            extra = len(piece) + (1 if buffer else 0)
+            if buffer and buffer_len + extra > node_limit:
+                yield "\n".join(buffer)
+                buffer, buffer_len = [], 0
+                extra = len(piece)
+            buffer.append(piece)
+            buffer_len += extra
+    if buffer:
+        yield "\n".join(buffer)
+
+
+def paginate(
+    blocks: Iterable[str],
+    node_limit: int = NODE_CHAR_LIMIT,
+    nodes_per_message: int = NODES_PER_MESSAGE,
+    message_limit: int = MESSAGE_CHAR_LIMIT,
+) -> Iterator[List[str]]:
+    """
+    将块分页为多条消息，每条消息是一个节点文本列表，
+    同时满足单节点字符上限、单消息节点数上限和单消息总字符上限。
+    """
+    page: List[str] = []
+    page_len = 0
+    for node in pack_blocks(blocks, node_limit):
+        if page and (len(page) >= nodes_per_message or page_len + len(node) > message_limit):
+            yield page
+            page, page_len = [], 0
+        page.append(node)
+        page_len += len(node)
+    if page:
+        yield page
+
+
+def peek_length(blocks: Iterator[str], threshold: int) -> tuple[List[str], bool]:
+    """
+    从块迭代器中读取块，直到累计长度超过 threshold 或迭代结束。
+    返回 (已读取的块, 是否超过阈值)。未读取的部分仍留在迭代器中。
+    """
+    head: List[str] = []
+    total = 0
+    for block in blocks:
+        head.append(block)
+        total += len(block) + (1 if len(head) > 1 else 0)
+        if total > threshold:
+            return head, True
+    return head, False
@@ -0,0 +1,64 @@
+# astrbot_plugin_GroupFS/sessions.py
+
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class SearchSession(NamedTuple):
+    search_term: str
+    files: List[Dict]
+    created_at: float
+
+
+class SearchSessionStore:
+    """
+    按 (群号, 用户) 保存最近一次搜索的有序结果。
+    后续的 /sf <文件名> <序号> 与 /df <文件名> <序号> 直接按该结果解析序号，
+    既不需要重新遍历，序号也不会在两次指令之间变化。
+    """
+
+    def __init__(self, ttl_seconds: float = 600, max_sessions: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: Dict[Tuple[int, int], SearchSession] = {}
+
+    def get(self, group_id: int, user_id: int, search_term: str) -> Optional[SearchSession]:
+        """返回同一搜索词且未过期的会话；没有则返回 None。"""
+        key = (group_id, user_id)
+        session = self._sessions.get(key)
+        if session is None:
+            return None
+        if time.monotonic() - session.created_at > self.ttl_seconds:
+            del self._sessions[key]
+            return None
+        return session if session.search_term == search_term else None
+
+    def put(self, group_id: int, user_id: int, search_term: str, files: List[Dict]):
+        if self.ttl_seconds <= 0:
+            return
+        key = (group_id, user_id)
+        self._sessions.pop(key, None)
+        self._sessions[key] = SearchSession(search_term, files, time.monotonic())
+        self._evict()
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [key for key, session in self._sessions.items() if now - session.created_at > self.ttl_seconds]
+        for key in expired:
+            del self._sessions[key]
+        # 字典按插入顺序排列，超出上限时丢弃最早的会话
+        while len(self._sessions) > self.max_sessions:
+            del self._sessions[next(iter(self._sessions))]
+
+    def invalidate_files(self, group_id: int, file_ids: Iterable[str]):
+        """文件被删除后，作废该群中引用了这些文件的会话，避免序号指向已不存在的文件。"""
+        file_ids = set(file_ids)
+        if not file_ids:
+            return
+        stale = [
+            key for key, session in self._sessions.items()
+            if key[0] == group_id and any(f.get('file_id') in file_ids for f in session.files)
+        ]
+        for key in stale:
+            del self._sessions[key]
+
@@ -0,0 +1,194 @@
+# astrbot_plugin_GroupFS/settings.py
+
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Tuple
+
+from astrbot.api import logger
+
+from .progress import LEVEL_NAMES, SUBSYSTEMS
+
+
+@dataclass(frozen=True)
+class StorageLimit:
+    count_limit: int
+    space_limit_gb: float
+
+
+@dataclass(frozen=True)
+class ScheduledCheck:
+    group_id: int
+    cron_str: str
+
+    @property
+    def job_id(self) -> str:
+        return f"scheduled_check_{self.group_id}_{self.cron_str.replace(' ', '_')}"
+
+
+def _int(config: Dict, key: str, default: int) -> int:
+    value = config.get(key, default)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        logger.error(f"配置项 {key} 的值 '{value}' 不是整数，已使用默认值 {default}。")
+        return default
+
+
+def _parse_log_levels(items: List[str]) -> Dict[str, int]:
+    """解析 "子系统:级别" 形式的日志级别配置，例如 "download:warning"。"""
+    levels: Dict[str, int] = {}
+    for item in items:
+        subsystem, _, level_name = item.partition(':')
+        subsystem, level_name = subsystem.strip().lower(), level_name.strip().lower()
+        if subsystem not in SUBSYSTEMS or level_name not in LEVEL_NAMES:
+            logger.error(
+                f"解析 log_levels 配置 '{item}' 时出错: 子系统应为 {'/'.join(SUBSYSTEMS)}，"
+                f"级别应为 {'/'.join(LEVEL_NAMES)}，已跳过。"
+            )
+            continue
+        levels[subsystem] = LEVEL_NAMES[level_name]
+    return levels
+
+
+def _parse_storage_limits(items: List[str]) -> Dict[int, StorageLimit]:
+    limits: Dict[int, StorageLimit] = {}
+    for item in items:
+        try:
+            group_id_str, count_limit_str, space_limit_str = item.split(':')
+            limits[int(group_id_str)] = StorageLimit(int(count_limit_str), float(space_limit_str))
+        except ValueError as e:
+            logger.error(f"解析 storage_limits 配置 '{item}' 时出错: {e}，已跳过。")
+    return limits
+
+
+def _parse_scheduled_checks(items: List[str]) -> Tuple[ScheduledCheck, ...]:
+    """
+    只做格式检查（群号 + 5 段 cron），不导入 croniter；
+    表达式本身的合法性在调度器首次启动时校验。
+    """
+    checks: List[ScheduledCheck] = []
+    seen = set()
+    for item in items:
+        try:
+            group_id_str, cron_str = item.split(':', 1)
+            cron_str = ' '.join(cron_str.split())
+            if len(cron_str.split()) != 5:
+                raise ValueError(f"cron 表达式应为 5 段: {cron_str}")
+            check = ScheduledCheck(int(group_id_str), cron_str)
+        except ValueError as e:
+            logger.error(f"解析 scheduled_check_tasks 配置 '{item}' 时出错: {e}，已跳过。")
+            continue
+        if check in seen:
+            logger.warning(f"检测到重复的定时任务配置 '{item}'，已跳过。")
+            continue
+        seen.add(check)
+        checks.append(check)
+    return tuple(checks)
+
+
+@dataclass(frozen=True)
+class PluginSettings:
+    """插件配置的类型化快照。在插件构造时从原始配置字典解析一次，之后只读。"""
+    group_whitelist: FrozenSet[int] = frozenset()
+    admin_users: FrozenSet[int] = frozenset()
+    preview_length: int = 300
+    forward_threshold: int = 0
+    enable_zip_preview: bool = False
+    default_zip_password: str = ""
+    listing_page_size: int = 2000
+    listing_cache_seconds: int = 15
+    search_early_reply_seconds: int = 8
+    search_session_ttl_seconds: int = 600
+    storage_limits: Dict[int, StorageLimit] = field(default_factory=dict)
+    scheduled_checks: Tuple[ScheduledCheck, ...] = ()
+    scheduled_autodelete: bool = False
+    scheduled_catch_up: bool = True
+    scan_checkpoint_seconds: int = 30
+    scan_resume_max_age_hours: int = 24
+    scheduled_scan_budget_calls: int = 0
+    scheduled_scan_budget_seconds: int = 0
+    backup_zip_password: str = ""
+    backup_file_size_limit_mb: int = 0
+    backup_file_extensions: Tuple[str, ...] = ('txt', 'zip')
+    backup_disk_budget_mb: int = 0
+    backup_disk_reserve_mb: int = 1024
+    backup_mirror_dir: str = ""
+    backup_volume_size_mb: int = 512
+    backup_upload_retries: int = 2
+    backup_resume_hours: int = 6
+    temp_quota_mb: int = 5120
+    download_max_concurrency: int = 5
+    download_group_concurrency: int = 0
+    download_rate_limit_kb: int = 0
+    download_fsync: bool = False
+    preview_max_download_mb: int = 50
+    trace_slow_ms: int = 10000
+    trace_file_max_mb: int = 10
+    trace_file_backups: int = 3
+    search_index_ttl_seconds: int = 600
+    bulk_op_concurrency: int = 2
+    bulk_op_interval_ms: int = 500
+    bulk_plan_ttl_seconds: int = 600
+    api_max_concurrency: int = 8
+    api_group_concurrency: int = 3
+    api_max_retries: int = 3
+    log_levels: Dict[str, int] = field(default_factory=dict)
+    progress_log_seconds: int = 15
+    progress_sample_every: int = 100
+    progress_notify_seconds: int = 300
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "PluginSettings":
+        ext_str = config.get("backup_file_extensions", "txt,zip")
+        return cls(
+            group_whitelist=frozenset(int(g) for g in config.get("group_whitelist", [])),
+            admin_users=frozenset(int(u) for u in config.get("admin_users", [])),
+            preview_length=_int(config, "preview_length", 300),
+            forward_threshold=_int(config, "forward_threshold", 0),
+            enable_zip_preview=bool(config.get("enable_zip_preview", False)),
+            default_zip_password=config.get("default_zip_password", ""),
+            listing_page_size=_int(config, "listing_page_size", 2000),
+            listing_cache_seconds=_int(config, "listing_cache_seconds", 15),
+            search_early_reply_seconds=_int(config, "search_early_reply_seconds", 8),
+            search_session_ttl_seconds=_int(config, "search_session_ttl_seconds", 600),
+            storage_limits=_parse_storage_limits(config.get("storage_limits", [])),
+            scheduled_checks=_parse_scheduled_checks(config.get("scheduled_check_tasks", [])),
+            scheduled_autodelete=bool(config.get("scheduled_autodelete", False)),
+            scheduled_catch_up=bool(config.get("scheduled_catch_up", True)),
+            scan_checkpoint_seconds=_int(config, "scan_checkpoint_seconds", 30),
+            scan_resume_max_age_hours=_int(config, "scan_resume_max_age_hours", 24),
+            scheduled_scan_budget_calls=_int(config, "scheduled_scan_budget_calls", 0),
+            scheduled_scan_budget_seconds=_int(config, "scheduled_scan_budget_seconds", 0),
+            backup_zip_password=config.get("backup_zip_password", ""),
+            backup_file_size_limit_mb=_int(config, "backup_file_size_limit_mb", 0),
+            backup_file_extensions=tuple(
+                ext.strip().lstrip('.').lower()
+                for ext in ext_str.split(',')
+                if ext.strip()
+            ),
+            backup_disk_budget_mb=_int(config, "backup_disk_budget_mb", 0),
+            backup_disk_reserve_mb=_int(config, "backup_disk_reserve_mb", 1024),
+            backup_mirror_dir=config.get("backup_mirror_dir", ""),
+            backup_volume_size_mb=_int(config, "backup_volume_size_mb", 512),
+            backup_upload_retries=_int(config, "backup_upload_retries", 2),
+            backup_resume_hours=_int(config, "backup_resume_hours", 6),
+            temp_quota_mb=_int(config, "temp_quota_mb", 5120),
+            download_max_concurrency=_int(config, "download_max_concurrency", 5),
+            download_group_concurrency=_int(config, "download_group_concurrency", 0),
+            download_rate_limit_kb=_int(config, "download_rate_limit_kb", 0),
+            download_fsync=bool(config.get("download_fsync", False)),
+            preview_max_download_mb=_int(config, "preview_max_download_mb", 50),
+            trace_slow_ms=_int(config, "trace_slow_ms", 10000),
+            trace_file_max_mb=_int(config, "trace_file_max_mb", 10),
+            trace_file_backups=_int(config, "trace_file_backups", 3),
+            search_index_ttl_seconds=_int(config, "search_index_ttl_seconds", 600),
+            bulk_op_concurrency=_int(config, "bulk_op_concurrency", 2),
+            bulk_op_interval_ms=_int(config, "bulk_op_interval_ms", 500),
+            bulk_plan_ttl_seconds=_int(config, "bulk_plan_ttl_seconds", 600),
+            api_max_concurrency=_int(config, "api_max_concurrency", 8),
+            api_group_concurrency=_int(config, "api_group_concurrency", 3),
+            api_max_retries=_int(config, "api_max_retries", 3),
+            log_levels=_parse_log_levels(config.get("log_levels", [])),
+            progress_log_seconds=_int(config, "progress_log_seconds", 15),
+            progress_sample_every=_int(config, "progress_sample_every", 100),
+            progress_notify_seconds=_int(config, "progress_notify_seconds", 300),
+        )
@@ -0,0 +1,149 @@
+# astrbot_plugin_GroupFS/singleflight.py
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class SingleFlight:
+    """
+    按键合并并发请求：同一个键同时只有一次真正的执行，其他调用者共享其结果。
+    执行成功后的结果在 reuse_seconds 内继续复用，以吸收突发的重复请求；失败不缓存。
+    """
+
+    def __init__(self, reuse_seconds: float = 15):
+        self.reuse_seconds = reuse_seconds
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def peek(self, key: Hashable) -> Any:
+        """返回仍在复用窗口内的结果；没有则返回 None。"""
+        cached = self._results.get(key)
+        if cached and time.monotonic() - cached[0] <= self.reuse_seconds:
+            return cached[1]
+        return None
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        cached = self.peek(key)
+        if cached is not None:
+            return cached
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t, k=key: self._on_done(k, t))
+        # shield：某个调用者被取消时不影响其他共享该结果的调用者
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is not task:
+            # 执行期间被 invalidate 作废，结果只交给已在等待的调用者，不再缓存
+            return
+        del self._in_flight[key]
+        if not task.cancelled() and task.exception() is None:
+            self._results[key] = (time.monotonic(), task.result())
+
+    def put(self, key: Hashable, value: Any):
+        self._results[key] = (time.monotonic(), value)
+
+    def invalidate(self, key: Hashable):
+        """作废缓存结果；正在执行的那次也不会再被新的调用者复用。"""
+        self._results.pop(key, None)
+        self._in_flight.pop(key, None)
+
+    def cancel_all(self):
+        for task in self._in_flight.values():
+            task.cancel()
+        self._results.clear()
+
+
+class _SharedStream:
+    __slots__ = ('items', 'done', 'error', 'changed', 'subscribers', 'task')
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Event()
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class StreamFlight:
+    """
+    按键共享一个异步生成器：同一个键同时只有一个生产者任务在迭代，
+    后来的订阅者先重放已产出的条目，再跟随后续条目，直到生产结束。
+    所有订阅者都提前退出时取消生产者，保留「找够即停」的行为。
+    生产正常结束且期间未被 invalidate 时，以全部条目调用 on_complete。
+    """
+
+    def __init__(self):
+        self._streams: Dict[Hashable, _SharedStream] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._streams
+
+    async def subscribe(self, key: Hashable, factory: Callable[[], AsyncIterator[Any]],
+                        on_complete: Optional[Callable[[List[Any]], None]] = None) -> AsyncIterator[Any]:
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = _SharedStream()
+            stream.task = asyncio.create_task(self._pump(key, stream, factory(), on_complete))
+        stream.subscribers += 1
+        try:
+            index = 0
+            while True:
+                while index < len(stream.items):
+                    yield stream.items[index]
+                    index += 1
+                if stream.done:
+                    if stream.error is not None:
+                        raise stream.error
+                    return
+                await stream.changed.wait()
+        finally:
+            stream.subscribers -= 1
+            if stream.subscribers <= 0 and not stream.done:
+                stream.task.cancel()
+                if self._streams.get(key) is stream:
+                    del self._streams[key]
+
+    @staticmethod
+    def _notify(stream: _SharedStream):
+        # 换一个新的 Event 再唤醒旧的，等待者无需 clear，也不会错过通知
+        changed, stream.changed = stream.changed, asyncio.Event()
+        changed.set()
+
+    async def _pump(self, key: Hashable, stream: _SharedStream, source: AsyncIterator[Any],
+                    on_complete: Optional[Callable[[List[Any]], None]]):
+        completed = False
+        try:
+            async for item in source:
+                stream.items.append(item)
+                self._notify(stream)
+            completed = True
+        except asyncio.CancelledError:
+            stream.error = asyncio.CancelledError()
+        except Exception as e:
+            stream.error = e
+        finally:
+            stream.done = True
+            self._notify(stream)
+            current = self._streams.get(key) is stream
+            if current:
+                del self._streams[key]
+            if completed and current and on_complete:
+                on_complete(stream.items)
+
+    def invalidate(self, key: Hashable):
+        """正在进行的生产继续服务已有的订阅者，但不再接受新订阅者，结束时也不调用 on_complete。"""
+        self._streams.pop(key, None)
+
+    def cancel_all(self):
+        for stream in self._streams.values():
+            if stream.task:
+                stream.task.cancel()
+        self._streams.clear()
@@ -0,0 +1,122 @@
+# astrbot_plugin_GroupFS/snapshot.py
+
+import gzip
+import json
+import os
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".jsonl.gz"
+
+
+class SnapshotEntry(NamedTuple):
+    """快照中的一条文件记录（按列存储为 JSON 数组，以节省空间）。"""
+    file_id: str
+    file_name: str
+    folder: str
+    size: int
+    modify_time: int
+    uploader: int
+    uploader_name: str
+
+
+def _entry_from_file_info(file_info: Dict) -> SnapshotEntry:
+    relative_path = file_info.get('relative_path', '') or ''
+    return SnapshotEntry(
+        file_id=file_info.get('file_id', ''),
+        file_name=file_info.get('file_name', ''),
+        folder=os.path.dirname(relative_path),
+        size=int(file_info.get('size') or 0),
+        modify_time=int(file_info.get('modify_time') or 0),
+        uploader=int(file_info.get('uploader') or 0),
+        uploader_name=file_info.get('uploader_name', '') or '',
+    )
+
+
+def write_snapshot(path: str, group_id: int, files: Iterable[Dict]) -> int:
+    """
+    将文件列表写入 gzip 压缩的 JSON Lines 快照。
+    第一行为头部信息，其余每行是一个 SnapshotEntry 数组。返回写入的文件数。
+    先写入临时文件再原子替换，避免中断时留下半个快照。
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    rows = [_entry_from_file_info(f) for f in files if f.get('file_id')]
+    header = {"version": SNAPSHOT_VERSION, "group_id": group_id, "created_at": int(time.time()), "count": len(rows)}
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + "\n")
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+def read_snapshot(path: str) -> Tuple[Dict, Dict[str, SnapshotEntry]]:
+    """读取快照，返回 (头部信息, {file_id: SnapshotEntry})。"""
+    entries: Dict[str, SnapshotEntry] = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline() or "{}")
+        for line in f:
+            if not line.strip():
+                continue
+            entry = SnapshotEntry(*json.loads(line))
+            entries[entry.file_id] = entry
+    return header, entries
+
+
+def list_snapshots(snapshot_dir: str) -> List[str]:
+    """按时间从新到旧列出快照名（不含后缀）。"""
+    if not os.path.isdir(snapshot_dir):
+        return []
+    names = [f[:-len(SNAPSHOT_SUFFIX)] for f in os.listdir(snapshot_dir) if f.endswith(SNAPSHOT_SUFFIX)]
+    return sorted(names, reverse=True)
+
+
+def resolve_snapshot(snapshot_dir: str, ref: str) -> Optional[str]:
+    """
+    将用户输入解析为快照名。支持：
+    - 完整快照名，如 20250101_030000
+    - 列表序号（1 为最新），如 2
+    - 日期前缀，如 20250101（匹配当天最早的一份）
+    """
+    names = list_snapshots(snapshot_dir)
+    if ref in names:
+        return ref
+    if ref.isdigit() and len(ref) <= 4:
+        index = int(ref)
+        return names[index - 1] if 1 <= index <= len(names) else None
+    matches = [n for n in names if n.startswith(ref)]
+    return matches[-1] if matches else None
+
+
+def snapshot_path(snapshot_dir: str, name: str) -> str:
+    return os.path.join(snapshot_dir, name + SNAPSHOT_SUFFIX)
+
+
+class SnapshotDiff(NamedTuple):
+    added: List[SnapshotEntry]
+    removed: List[SnapshotEntry]
+    renamed: List[Tuple[SnapshotEntry, SnapshotEntry]]
+    moved: List[Tuple[SnapshotEntry, SnapshotEntry]]
+    resized: List[Tuple[SnapshotEntry, SnapshotEntry]]
+
+
+def diff_snapshots(old: Dict[str, SnapshotEntry], new: Dict[str, SnapshotEntry]) -> SnapshotDiff:
+    """以 file_id 为键比较两份快照，线性时间。同一文件可能同时出现在改名/移动/大小变化中。"""
+    diff = SnapshotDiff([], [], [], [], [])
+    for file_id, new_entry in new.items():
+        old_entry = old.get(file_id)
+        if old_entry is None:
+            diff.added.append(new_entry)
+            continue
+        if old_entry.file_name != new_entry.file_name:
+            diff.renamed.append((old_entry, new_entry))
+        if old_entry.folder != new_entry.folder:
+            diff.moved.append((old_entry, new_entry))
+        if old_entry.size != new_entry.size:
+            diff.resized.append((old_entry, new_entry))
+    for file_id, old_entry in old.items():
+        if file_id not in new:
+            diff.removed.append(old_entry)
+    return diff
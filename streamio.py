@@ -0,0 +1,95 @@
+# astrbot_plugin_GroupFS/streamio.py
+
+import asyncio
+import os
+import uuid
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+
+class StreamLimitExceeded(Exception):
+    """写入的数据超过了 max_bytes。"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"数据超过上限 {limit} 字节")
+        self.limit = limit
+
+
+class AtomicStreamWriter:
+    """
+    把网络流写入文件而不阻塞事件循环：
+    - 数据先在内存中攒到 buffer_size 再整块交给线程写出，事件循环里只做内存拷贝；
+    - 写入同目录下的临时文件，commit() 时（可选 fsync 后）原子替换为目标文件，
+      中途失败或取消时删除临时文件，目标路径上不会出现写了一半的文件；
+    - max_bytes 大于 0 时，累计写入超过该值立即抛出 StreamLimitExceeded。
+    用作 async with：正常退出时提交，异常退出时放弃。
+    """
+
+    def __init__(self, path: str, buffer_size: int = DEFAULT_BUFFER_SIZE, fsync: bool = False, max_bytes: int = 0):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.fsync = fsync
+        self.max_bytes = max_bytes
+        self.written = 0
+        self._tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        self._buffer = bytearray()
+        self._file = None
+
+    async def __aenter__(self) -> "AtomicStreamWriter":
+        self._file = await asyncio.to_thread(open, self._tmp_path, 'wb')
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.commit()
+        else:
+            await self.abort()
+
+    async def write(self, chunk: bytes):
+        self.written += len(chunk)
+        if self.max_bytes and self.written > self.max_bytes:
+            raise StreamLimitExceeded(self.max_bytes)
+        self._buffer += chunk
+        if len(self._buffer) >= self.buffer_size:
+            await self._flush()
+
+    async def _flush(self):
+        if self._buffer:
+            data, self._buffer = bytes(self._buffer), bytearray()
+            await asyncio.to_thread(self._file.write, data)
+
+    def _finish(self):
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp_path, self.path)
+
+    async def commit(self):
+        await self._flush()
+        await asyncio.to_thread(self._finish)
+
+    def _discard(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+    async def abort(self):
+        self._buffer.clear()
+        # 被取消时也要清理临时文件，这里同步执行，不再等待线程
+        self._discard()
+
+
+async def read_capped(resp, limit: int, chunk_size: int = 65536) -> bytes:
+    """读取响应体的前 limit 字节；服务器忽略 Range 返回完整内容时不会把整个文件读进内存。"""
+    buffer = bytearray()
+    async for chunk in resp.content.iter_chunked(chunk_size):
+        buffer += chunk
+        if len(buffer) >= limit:
+            break
+    return bytes(buffer[:limit])
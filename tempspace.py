@@ -0,0 +1,207 @@
+# astrbot_plugin_GroupFS/tempspace.py
+
+import asyncio
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from astrbot.api import logger
+
+
+@dataclass
+class TempEntry:
+    path: str
+    last_used: float
+    pinned: bool = True           # 仍在使用中，不会被回收
+    expires_at: float = 0.0       # 释放后保留到此时间点，之后可被回收
+    size: int = 0                 # 最近一次（登记或释放时）测得的占用字节数
+    reserved: int = 0             # 使用中预计占用的字节数，尚未写满时按此计入配额
+
+
+class TempQuotaExceeded(Exception):
+    """回收所有可回收的目录后，临时空间配额仍不足以容纳新任务。"""
+
+    def __init__(self, required: int, available: int):
+        super().__init__(f"临时空间配额不足: 需要 {required} 字节，可用 {available} 字节")
+        self.required = required
+        self.available = available
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+
+def _remove_path(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+class TempSpaceManager:
+    """
+    统一的临时空间管理器。
+    所有临时目录都分配在同一个根目录下；使用中的目录被固定 (pinned)，释放后按
+    保留时间与字节配额以 LRU 顺序回收。分配时可声明预计占用的字节数，
+    使用中的目录按 max(已测得占用, 预计占用) 计入配额，空间不足时先回收再分配，仍不足则拒绝；
+    各目录的占用只在登记和释放时测量一次并缓存，配额计算不遍历文件系统；
+    删除操作在线程池中执行，不阻塞事件循环；
+    启动时清扫根目录，回收上次异常退出留下的残余。
+    """
+
+    JANITOR_INTERVAL = 60
+
+    def __init__(self, root: str, quota_bytes: int = 0):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self._entries: Dict[str, TempEntry] = {}
+        self._janitor: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def sweep_orphans(self, extra_paths: Optional[List[str]] = None):
+        """启动清扫：删除根目录下所有未登记的内容，以及旧版本遗留的临时目录。"""
+        os.makedirs(self.root, exist_ok=True)
+        leftovers = [os.path.join(self.root, name) for name in os.listdir(self.root)]
+        leftovers = [p for p in leftovers if p not in self._entries]
+        leftovers += [p for p in (extra_paths or []) if os.path.exists(p)]
+        for path in leftovers:
+            await asyncio.to_thread(_remove_path, path)
+        if leftovers:
+            logger.info(f"[临时空间] 启动清扫完成，回收了 {len(leftovers)} 个残留项。")
+
+    async def allocate(self, name: str, expected_bytes: int = 0) -> str:
+        """
+        分配一个新的临时目录并固定它。expected_bytes 为预计写入的字节数，
+        超出配额时按 LRU 回收已释放的目录，仍不足则抛出 TempQuotaExceeded。
+        """
+        path = os.path.join(self.root, name)
+        os.makedirs(path, exist_ok=True)
+        self._entries[path] = TempEntry(path=path, last_used=time.time())
+        try:
+            await self.reserve(path, expected_bytes)
+        except TempQuotaExceeded:
+            await self.discard(path)
+            raise
+        return path
+
+    async def reserve(self, path: str, nbytes: int, strict: bool = True) -> bool:
+        """
+        更新使用中目录的预计占用（如备份任务得知文件总大小后），规则同 allocate。
+        strict 为 False 时只回收能回收的部分，配额仍不足也保留登记并返回 False，不抛出异常。
+        """
+        entry = self._entries.get(path)
+        if entry is None or self.quota_bytes <= 0:
+            return True
+        async with self._lock:
+            previous, entry.reserved = entry.reserved, nbytes
+            usage = await self._make_room()
+            if usage <= self.quota_bytes:
+                return True
+            if not strict:
+                return False
+            entry.reserved = previous
+            raise TempQuotaExceeded(nbytes, max(0, self.quota_bytes - (usage - max(nbytes, entry.size))))
+
+    async def adopt(self, path: str, keep_for: float):
+        """
+        在启动清扫前登记上次运行留下、仍需保留的目录（如等待 /gfbr 重发的分卷），
+        作为已释放的目录保留 keep_for 秒，清扫时不会删除它。
+        """
+        if not os.path.isdir(path) or keep_for <= 0:
+            return
+        now = time.time()
+        size = await asyncio.to_thread(_dir_size, path)
+        self._entries[path] = TempEntry(path=path, last_used=now, pinned=False, expires_at=now + keep_for, size=size)
+        self._ensure_janitor()
+
+    def pin(self, path: str) -> bool:
+        """重新固定一个已释放但尚未回收的目录，返回它是否仍然存在。"""
+        entry = self._entries.get(path)
+        if entry is None or not os.path.isdir(path):
+            return False
+        entry.pinned = True
+        entry.last_used = time.time()
+        return True
+
+    def touch(self, path: str):
+        entry = self._entries.get(path)
+        if entry:
+            entry.last_used = time.time()
+
+    async def release(self, path: Optional[str], keep_for: float = 0):
+        """
+        释放目录。keep_for 为 0 时立即删除；否则保留指定秒数，
+        期间只有在超出配额时才会被提前回收。
+        """
+        if not path:
+            return
+        entry = self._entries.get(path)
+        if entry is None:
+            return
+        if keep_for <= 0:
+            await self.discard(path)
+            return
+        entry.pinned = False
+        entry.last_used = time.time()
+        entry.expires_at = entry.last_used + keep_for
+        entry.size = await asyncio.to_thread(_dir_size, path)
+        self._ensure_janitor()
+        await self.enforce_quota()
+
+    async def discard(self, path: Optional[str]):
+        """立即（非阻塞地）删除目录并注销。"""
+        if not path:
+            return
+        self._entries.pop(path, None)
+        try:
+            await asyncio.to_thread(_remove_path, path)
+            logger.debug(f"[临时空间] 已清理: {path}")
+        except OSError as e:
+            logger.warning(f"[临时空间] 删除 {path} 失败: {e}")
+
+    async def enforce_quota(self, incoming_bytes: int = 0):
+        """回收过期目录；若总占用超过配额，按 LRU 顺序回收已释放的目录。"""
+        async with self._lock:
+            await self._make_room(incoming_bytes)
+
+    async def _make_room(self, incoming_bytes: int = 0) -> int:
+        """需持有 _lock。回收过期与超额的已释放目录，返回回收后的（计入预计占用的）总占用。"""
+        now = time.time()
+        for entry in [e for e in self._entries.values() if not e.pinned and e.expires_at <= now]:
+            await self.discard(entry.path)
+        if self.quota_bytes <= 0:
+            return 0
+        usage = sum(max(e.size, e.reserved) if e.pinned else e.size for e in self._entries.values())
+        candidates = sorted((e for e in self._entries.values() if not e.pinned), key=lambda e: e.last_used)
+        for entry in candidates:
+            if usage + incoming_bytes <= self.quota_bytes:
+                break
+            logger.info(f"[临时空间] 超出配额，提前回收: {entry.path}")
+            usage -= entry.size
+            await self.discard(entry.path)
+        return usage
+
+    def _ensure_janitor(self):
+        if self._janitor is None or self._janitor.done():
+            self._janitor = asyncio.create_task(self._janitor_loop())
+
+    async def _janitor_loop(self):
+        while any(not e.pinned for e in self._entries.values()):
+            await asyncio.sleep(self.JANITOR_INTERVAL)
+            try:
+                await self.enforce_quota()
+            except Exception as e:
+                logger.warning(f"[临时空间] 定期回收时出错: {e}")
+
+    async def close(self):
+        if self._janitor and not self._janitor.done():
+            self._janitor.cancel()
@@ -0,0 +1,147 @@
+# astrbot_plugin_GroupFS/textpager.py
+
+import codecs
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# 各类编码下平均每个字符占用的字节数，用于把「每页字符数」换算成「每页字节数」
+_BYTES_PER_CHAR = {
+    'utf-8': 3,
+    'utf-16': 2, 'utf-16-le': 2, 'utf-16-be': 2,
+    'gb2312': 2, 'gbk': 2, 'gb18030': 2, 'big5': 2, 'euc-jp': 2, 'shift_jis': 2, 'euc-kr': 2,
+    'ascii': 1,
+}
+
+# 在名义起点之后多少字节内寻找换行符作为页边界
+ALIGN_WINDOW = 512
+
+
+def _normalize_encoding(encoding: str, head: bytes = b'') -> str:
+    """
+    规范化编码名。探测样本全是 ASCII 时后文仍可能出现多字节字符，按 utf-8 处理；
+    不带字节序的 utf-16 按文件开头的 BOM 确定字节序（无 BOM 时按小端），
+    这样文件中间的页也能正确解码和寻找换行。
+    """
+    try:
+        name = codecs.lookup(encoding).name
+    except LookupError:
+        return 'utf-8'
+    if name in ('ascii', 'utf-8-sig'):
+        return 'utf-8'
+    if name == 'utf-16':
+        return 'utf-16-be' if head.startswith(codecs.BOM_UTF16_BE) else 'utf-16-le'
+    return name
+
+
+class PageLayout:
+    """
+    一个文本文件的分页布局（字节偏移表）。
+    第 k 页的名义起点为 (k-1) * page_bytes；实际起点是名义起点之后 ALIGN_WINDOW 字节内的
+    第一个换行之后，找不到换行时退而对齐到字符边界。相邻两页用同一规则对齐，
+    因此只需一次覆盖 [名义起点_k, 名义起点_k+1 + ALIGN_WINDOW) 的范围请求即可得到完整的一页。
+    已算出的实际起点会被缓存，之后可以只请求精确范围。
+    """
+
+    def __init__(self, encoding: str, file_size: int, page_chars: int, head: bytes = b''):
+        self.encoding = _normalize_encoding(encoding, head)
+        self.file_size = file_size
+        # 每页字节数按探测到的编码估算（ASCII 样本按 1 字节/字符，页面宁短勿长）
+        try:
+            detected = codecs.lookup(encoding).name
+        except LookupError:
+            detected = self.encoding
+        self.page_bytes = max(256, page_chars * _BYTES_PER_CHAR.get(detected, _BYTES_PER_CHAR.get(self.encoding, 3)))
+        self.offsets: Dict[int, int] = {1: 0}
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-self.file_size // self.page_bytes))
+
+    def _nominal_start(self, page: int) -> int:
+        return (page - 1) * self.page_bytes
+
+    def fetch_range(self, page: int) -> Tuple[int, int]:
+        """返回渲染第 page 页需要请求的字节范围 [start, end)。"""
+        start = self.offsets.get(page, self._nominal_start(page))
+        if page + 1 in self.offsets:
+            end = self.offsets[page + 1]
+        else:
+            end = self._nominal_start(page + 1) + ALIGN_WINDOW
+        return start, min(end, self.file_size)
+
+    def _is_char_start(self, data: bytes, pos: int) -> bool:
+        if pos >= len(data):
+            return True
+        if self.encoding == 'utf-8':
+            return (data[pos] & 0xC0) != 0x80
+        if self.encoding.startswith('utf-16'):
+            return pos % 2 == 0
+        return True
+
+    def _align(self, data: bytes, data_start: int, nominal: int) -> int:
+        """在 data 中把名义偏移 nominal 对齐到换行或字符边界，返回绝对偏移。"""
+        if nominal <= 0:
+            return 0
+        if nominal >= self.file_size:
+            return self.file_size
+        rel = nominal - data_start
+        if rel < 0 or rel > len(data):
+            return nominal
+        newline = {'utf-16-le': b'\n\x00', 'utf-16-be': b'\x00\n'}.get(self.encoding, b'\n')
+        found = data.find(newline, rel, rel + ALIGN_WINDOW)
+        while found != -1 and len(newline) == 2 and (data_start + found) % 2:
+            # 双字节换行必须落在字符边界上，跨越两个字符的匹配不算
+            found = data.find(newline, found + 1, rel + ALIGN_WINDOW)
+        if found != -1:
+            return data_start + found + len(newline)
+        pos = rel
+        if self.encoding.startswith('utf-16'):
+            pos += pos % 2
+        else:
+            while pos < len(data) and pos - rel < 4 and not self._is_char_start(data, pos):
+                pos += 1
+            if self.encoding not in ('utf-8', 'ascii') and pos == rel:
+                # 双字节编码无法从字节本身判断字符起点，选择能严格解码的那个偏移
+                for candidate in (rel, rel + 1):
+                    try:
+                        data[candidate:candidate + 64].decode(self.encoding)
+                        pos = candidate
+                        break
+                    except UnicodeDecodeError:
+                        continue
+        return data_start + pos
+
+    def extract_page(self, page: int, data: bytes, data_start: int, strict: bool = False) -> str:
+        """
+        从覆盖 fetch_range(page) 的数据中切出第 page 页并解码，同时记录页边界。
+        strict 为 True 时遇到无法解码的字节抛出 UnicodeDecodeError，供调用方重新识别编码。
+        """
+        if page not in self.offsets:
+            self.offsets[page] = self._align(data, data_start, self._nominal_start(page))
+        if page + 1 not in self.offsets:
+            next_start = self._nominal_start(page + 1)
+            self.offsets[page + 1] = self._align(data, data_start, next_start) if next_start < self.file_size else self.file_size
+        start, end = self.offsets[page], self.offsets[page + 1]
+        chunk = data[max(0, start - data_start):max(0, end - data_start)]
+        text = chunk.decode(self.encoding, errors='strict' if strict else 'ignore')
+        return text.lstrip('﻿') if page == 1 else text
+
+
+class PageLayoutCache:
+    """按 file_id 缓存分页布局的小型 LRU。"""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, PageLayout]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[PageLayout]:
+        layout = self._items.get(key)
+        if layout is not None:
+            self._items.move_to_end(key)
+        return layout
+
+    def put(self, key: str, layout: PageLayout):
+        self._items[key] = layout
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
@@ -0,0 +1,172 @@
+# astrbot_plugin_GroupFS/tracing.py
+
+import functools
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Iterator, List, Optional
+
+from astrbot.api import logger
+
+# 单个 span 最多记录的子 span 数，超出的只计数（例如遍历大群时成千上万次 API 调用）
+MAX_CHILDREN = 200
+
+_current: ContextVar[Optional["Span"]] = ContextVar("groupfs_current_span", default=None)
+
+
+class Span:
+    __slots__ = ('name', 'attrs', 'tracer', 'started', 'ended', 'error', 'children', 'dropped')
+
+    def __init__(self, name: str, attrs: Dict[str, Any], tracer: "Tracer"):
+        self.name = name
+        self.attrs = attrs
+        self.tracer = tracer
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        self.error: Optional[str] = None
+        self.children: List["Span"] = []
+        self.dropped = 0
+
+    @property
+    def duration(self) -> float:
+        return (self.ended or time.perf_counter()) - self.started
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "name": self.name,
+            "offset_ms": round((self.started - origin) * 1000, 1),
+            "duration_ms": round(self.duration * 1000, 1),
+        }
+        if self.ended is None:
+            data["unfinished"] = True
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.error:
+            data["error"] = self.error
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        if self.dropped:
+            data["dropped_children"] = self.dropped
+        return data
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Optional[Span]]:
+    """
+    在当前 span 下记录一个子 span。没有进行中的追踪时什么也不做，
+    因此可以放在 API 网关、下载等底层代码中，开销只有一次 ContextVar 读取。
+    """
+    parent = _current.get()
+    if parent is None or parent.ended is not None:
+        yield None
+        return
+    child = Span(name, attrs, parent.tracer)
+    if len(parent.children) < MAX_CHILDREN:
+        parent.children.append(child)
+    else:
+        parent.dropped += 1
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.ended = time.perf_counter()
+        _current.reset(token)
+
+
+class Tracer:
+    """
+    以指令处理或后台任务为根的轻量追踪。根 span 耗时达到 slow_ms 时，
+    把整棵 span 树作为一行 JSON 写入按大小轮转的 trace 文件。slow_ms 为 0 时关闭。
+    """
+
+    def __init__(self, path: str, slow_ms: int = 10000, max_bytes: int = 10 * 1024 * 1024, backups: int = 3):
+        self.path = path
+        self.slow_ms = slow_ms
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._logger: Optional[logging.Logger] = None
+
+    @contextmanager
+    def root(self, name: str, **attrs) -> Iterator[Optional[Span]]:
+        """
+        开始一次追踪。已处于进行中的追踪内时作为子 span 记录；
+        由指令处理派生的后台任务（父 span 已结束）则开始新的追踪。
+        """
+        parent = _current.get()
+        if parent is not None and parent.ended is None:
+            with span(name, **attrs) as child:
+                yield child
+            return
+        if self.slow_ms <= 0:
+            yield None
+            return
+        root = Span(name, attrs, self)
+        token = _current.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            root.ended = time.perf_counter()
+            _current.reset(token)
+            if root.duration * 1000 >= self.slow_ms:
+                self._write(root)
+
+    def _get_logger(self) -> logging.Logger:
+        if self._logger is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            trace_logger = logging.getLogger(f"astrbot_plugin_GroupFS.trace.{id(self)}")
+            trace_logger.propagate = False
+            trace_logger.setLevel(logging.INFO)
+            handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding='utf-8')
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            trace_logger.addHandler(handler)
+            self._logger = trace_logger
+        return self._logger
+
+    def _write(self, root: Span):
+        record = {"ts": time.strftime("%Y-%m-%d %H:%M:%S"), **root.to_dict(root.started)}
+        try:
+            self._get_logger().info(json.dumps(record, ensure_ascii=False, default=str))
+            logger.info(f"[追踪] {root.name} 耗时 {root.duration:.1f} 秒，超过阈值，调用树已写入 {self.path}")
+        except Exception as e:
+            logger.error(f"[追踪] 写入 trace 文件失败: {e}")
+
+    def close(self):
+        if self._logger is not None:
+            for handler in list(self._logger.handlers):
+                handler.close()
+                self._logger.removeHandler(handler)
+            self._logger = None
+
+
+def traced(name: str):
+    """
+    装饰插件的指令处理函数与后台任务，以其为根开始追踪。
+    通过 self.tracer 取得 Tracer，首个位置参数若是消息事件或群号则记录群号。
+    trace 文件可能被转发给他人排查问题，不记录发送者与消息原文，指令名即 span 名。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            attrs = {}
+            event = args[0] if args else None
+            if hasattr(event, 'get_group_id'):
+                attrs = {"group_id": event.get_group_id()}
+            elif isinstance(event, int):
+                attrs = {"group_id": event}
+            with self.tracer.root(name, **attrs):
+                return await func(self, *args, **kwargs)
+        return wrapper
+    return decorator
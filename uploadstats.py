@@ -0,0 +1,86 @@
+# astrbot_plugin_GroupFS/uploadstats.py
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict
+
+MB = 1024 * 1024
+
+# 一次上传的结果：成功（含无返回等「大概率已送达」的情况）、调用异常或超时（可重试），
+# 或被 NTQQ 明确拒绝（retcode 1200，重试无益）
+UPLOAD_OK = "ok"
+UPLOAD_FAILED = "failed"
+UPLOAD_REJECTED = "rejected"
+
+
+@dataclass
+class TargetStats:
+    """某个发送目标（群或私聊）的上传表现，均为指数移动平均。"""
+    throughput: float = 0.0     # 成功上传的字节/秒
+    failure_rate: float = 0.0   # 0~1
+    uploads: int = 0
+    failures: int = 0
+    updated_at: float = 0.0
+
+
+class UploadStatsStore:
+    """
+    按发送目标记录上传吞吐量与失败率，并据此选择分卷大小：
+    让一个分卷大致能在 target_seconds 内传完，失败率越高分卷越小，
+    使一次失败浪费的字节有上限。没有历史数据时使用默认分卷大小。
+    """
+
+    ALPHA = 0.3
+
+    def __init__(self, path: str, default_volume_mb: int = 512, min_volume_mb: int = 32, target_seconds: float = 240):
+        self.path = path
+        self.default_volume_mb = default_volume_mb
+        self.min_volume_mb = min(min_volume_mb, default_volume_mb)
+        self.target_seconds = target_seconds
+        self._stats: Dict[str, TargetStats] = {}
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._stats = {key: TargetStats(**value) for key, value in json.load(f).items()}
+        except (OSError, ValueError, TypeError):
+            self._stats = {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({key: asdict(value) for key, value in self._stats.items()}, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, target: str) -> TargetStats:
+        self._load()
+        return self._stats.get(target) or TargetStats()
+
+    def record(self, target: str, size: int, seconds: float, success: bool):
+        self._load()
+        stats = self._stats.setdefault(target, TargetStats())
+        stats.uploads += 1
+        stats.failure_rate = (1 - self.ALPHA) * stats.failure_rate + self.ALPHA * (0.0 if success else 1.0)
+        if success and seconds > 0:
+            speed = size / seconds
+            stats.throughput = speed if stats.throughput <= 0 else (1 - self.ALPHA) * stats.throughput + self.ALPHA * speed
+        if not success:
+            stats.failures += 1
+        stats.updated_at = time.time()
+        self._save()
+
+    def volume_size_mb(self, target: str) -> int:
+        stats = self.get(target)
+        size_mb = float(self.default_volume_mb)
+        if stats.throughput > 0:
+            size_mb = min(size_mb, stats.throughput * self.target_seconds / MB)
+        # 失败率 0.5 时分卷减半，依此类推
+        size_mb *= 1 - stats.failure_rate
+        return int(max(self.min_volume_mb, min(self.default_volume_mb, size_mb)))